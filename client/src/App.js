@@ -33,6 +33,32 @@ function appendSnippet(prev, snippet) {
   const base = ensureWrapped(prev);
   return base.replace(/@enduml\s*$/i, `${snippet}\n@enduml`);
 }
+// Minimal SSE reader for POST responses; resolves with the `done` payload
+async function readEventStream(res, handlers = {}) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message", data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      const payload = data ? JSON.parse(data) : {};
+      if (event === "done") return payload;
+      if (event === "error") throw new Error(payload.explanation || "Generation failed");
+      if (handlers[event]) handlers[event](payload);
+    }
+  }
+  throw new Error("Stream ended unexpectedly");
+}
 function sanitize(s) { return String(s || "").replace(/[^A-Za-z0-9_]/g, "_"); }
 function escapeRegExp(s) { return String(s).replace(/[.*+?^${}()|[\]\\]/g, "\\$&"); }
 
@@ -116,7 +142,7 @@ const PlantUMLViewer = ({ code }) => {
   const encodedUrl = useMemo(() => {
     const payload = code && code.includes("@startuml") ? code : "@startuml\n@enduml";
     const enc = plantumlEncoder.encode(payload);
-    return `https://www.plantuml.com/plantuml/svg/${enc}`;
+    return `${process.env.REACT_APP_API_URL || "http://127.0.0.1:5000"}/api/render/svg/${enc}`;
   }, [code]);
 
   if (!code) {
@@ -218,7 +244,7 @@ const DiagramExport = ({ plantumlCode, diagramSelector, chatMessages, onClose })
     catch { showStatus("Copy failed", true); }
   };
   const openOnline = () => {
-    try { const enc = plantumlEncoder.encode(plantumlCode || "@startuml\n@enduml"); window.open(`https://www.plantuml.com/plantuml/svg/${enc}`, "_blank"); }
+    try { const enc = plantumlEncoder.encode(plantumlCode || "@startuml\n@enduml"); window.open(`${process.env.REACT_APP_API_URL || "http://127.0.0.1:5000"}/api/render/svg/${enc}`, "_blank"); }
     catch { showStatus("Open online failed", true); }
   };
 
@@ -460,7 +486,7 @@ const ProToolbar = ({
 /* ----------------------------------------
    HistoryDrawer (inline)
 ----------------------------------------- */
-const HistoryDrawer = ({ onClose, diagrams, loadDiagram, snapshots, onRevert }) => {
+const HistoryDrawer = ({ onClose, diagrams, loadDiagram, onLoadMore, snapshots, onRevert }) => {
   const styles = {
     wrap: { position: "fixed", top: 0, right: 0, bottom: 0, width: 420, background: "#ffffff", borderLeft: "1px solid #e5e7eb", boxShadow: "-8px 0 24px rgba(0,0,0,.06)", display: "flex", flexDirection: "column", zIndex: 40 },
     header: { display: "flex", alignItems: "center", justifyContent: "space-between", padding: 16, borderBottom: "1px solid #e5e7eb" },
@@ -490,6 +516,7 @@ const HistoryDrawer = ({ onClose, diagrams, loadDiagram, snapshots, onRevert })
               <button onClick={() => loadDiagram(d.id)} style={styles.btn}>Load</button>
             </div>
           ))}
+          {onLoadMore && <button onClick={onLoadMore} style={styles.btn}>Load more</button>}
         </div>
       </div>
 
@@ -522,6 +549,7 @@ export default function App() {
   const [plantumlCode, setPlantumlCode] = useState("");
 
   const [diagrams, setDiagrams] = useState([]);
+  const [diagramsCursor, setDiagramsCursor] = useState(null); // X-Next-Cursor of the last page loaded
   const [currentDiagramId, setCurrentDiagramId] = useState(null);
 
   const [showExport, setShowExport] = useState(false);
@@ -549,12 +577,16 @@ export default function App() {
     }
   }, [plantumlCode]);
 
-  const fetchDiagrams = useCallback(async () => {
+  // The list is paged (newest first): no cursor reloads the first page, a cursor appends the next one
+  const fetchDiagrams = useCallback(async (cursor = null) => {
     try {
-      const res = await fetch(`${backendUrl}/api/diagrams`, { credentials: "include" });
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      const res = await fetch(`${backendUrl}/api/diagrams${query}`, { credentials: "include" });
       if (!res.ok) throw new Error(`HTTP ${res.status}`);
       const data = await res.json();
-      setDiagrams(Array.isArray(data) ? data : []);
+      const page = Array.isArray(data) ? data : [];
+      setDiagrams((prev) => (cursor ? [...prev, ...page] : page));
+      setDiagramsCursor(res.headers.get("X-Next-Cursor"));
     } catch (err) {
       setMessages((p) => [...p, { message: `❌ Couldn't load diagrams (${err.message}). Check server & CORS.`, sender: "UMLBot", direction: "incoming", type: "text" }]);
     }
@@ -616,14 +648,17 @@ export default function App() {
     setMessages((prev) => [...prev, { message: input, sender: "user", direction: "outgoing", type: "text" }]);
     setIsTyping(true);
     try {
-      const res = await fetch(`${backendUrl}/api/generate`, {
+      const res = await fetch(`${backendUrl}/api/generate/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         credentials: "include",
         body: JSON.stringify({ text: input, type: diagramType, diagram_id: currentDiagramId }),
       });
       if (!res.ok) throw new Error(`HTTP ${res.status}`);
-      const data = await res.json();
+      // show the diagram as soon as it closes in the stream; `done` carries the persisted result
+      const data = await readEventStream(res, {
+        plantuml: (evt) => { if (evt.plantuml) setPlantumlCode(ensureWrapped(evt.plantuml)); },
+      });
       if (data.plantuml) setPlantumlCode(ensureWrapped(data.plantuml));
       if (!currentDiagramId && data.diagram_id) setCurrentDiagramId(data.diagram_id);
       else if (!currentDiagramId && !data.diagram_id && data.plantuml) setCurrentDiagramId(await createDiagram(data.plantuml));
@@ -761,6 +796,7 @@ export default function App() {
           onClose={() => setShowHistory(false)}
           diagrams={diagrams}
           loadDiagram={loadDiagram}
+          onLoadMore={diagramsCursor ? () => fetchDiagrams(diagramsCursor) : null}
           snapshots={undoStack.current}
           onRevert={(snapshot) => { if (!snapshot) return; setPlantumlCode(snapshot.code); setShowHistory(false); }}
         />
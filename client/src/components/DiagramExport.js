@@ -156,7 +156,7 @@ const DiagramExport = ({ plantumlCode, diagramRef, chatMessages, onClose }) => {
   const openInNewTab = () => {
     try {
       const encoded = plantumlEncoder.encode(plantumlCode || "@startuml\n@enduml");
-      window.open(`https://www.plantuml.com/plantuml/svg/${encoded}`, "_blank");
+      window.open(`${process.env.REACT_APP_API_URL || "http://127.0.0.1:5000"}/api/render/svg/${encoded}`, "_blank");
     } catch (e) {
       showStatus("Failed to open PlantUML online", true);
     }
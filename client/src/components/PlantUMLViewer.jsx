@@ -5,7 +5,7 @@ const PlantUMLViewer = ({ code }) => {
   if (!code) return <div style={{ textAlign: "center", padding: "20px" }}>No diagram yet</div>;
 
   const encoded = plantumlEncoder.encode(code);
-  const url = `https://www.plantuml.com/plantuml/svg/${encoded}`;
+  const url = `${process.env.REACT_APP_API_URL || "http://127.0.0.1:5000"}/api/render/svg/${encoded}`;
 
   return (
     <div style={{ textAlign: "center", height: "100%", overflow: "auto" }}>
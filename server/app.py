@@ -1,31 +1,47 @@
 from flask import Flask
 from flask_cors import CORS
-from db import db
+from db import db, configure as configure_db
+from migrations import run_migrations
 from models import Diagram, ConversationSession
 from routes.generate import generate_bp
 from routes.diagrams import diagrams_bp
+from routes.revisions import revisions_bp
+from routes.render import render_bp
+from routes.jobs import jobs_bp
+from routes.metrics import metrics_bp
+from services import metrics, jobs
 
 app = Flask(__name__)
 
 # ✅ Enable CORS with credentials (cookies)
 CORS(app, supports_credentials=True, resources={
     r"/api/*": {
-        "origins": ["http://localhost:3000", "http://127.0.0.1:3000"]
+        "origins": ["http://localhost:3000", "http://127.0.0.1:3000"],
+        "expose_headers": ["X-Next-Cursor", "X-Next-Before", "Location"]
     }
 })
 
-# Database config
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///diagrams.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+# Database config (DATABASE_URL; SQLite tuned for several workers by default)
+configure_db(app)
 
-# Create tables
+# Create tables, then upgrade older databases in place
 with app.app_context():
     db.create_all()
+    run_migrations()
 
 # Register blueprints
 app.register_blueprint(generate_bp, url_prefix='/api')
 app.register_blueprint(diagrams_bp, url_prefix='/api')
+app.register_blueprint(revisions_bp, url_prefix='/api')
+app.register_blueprint(render_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp)
+
+# Per-request stage tracing for /metrics (METRICS_ENABLED=0 turns it off)
+metrics.init_app(app)
+
+# Background generation jobs: requeue those interrupted by a crash
+jobs.init_app(app)
 
 if __name__ == '__main__':
     app.run(debug=True)
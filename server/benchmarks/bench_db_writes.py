@@ -0,0 +1,153 @@
+"""
+Concurrent writers against one database, the way several gunicorn workers hit
+it: each process inserts a diagram plus a conversation turn (generate) or
+rewrites flow_data (save-model) and commits, as fast as it can.
+
+    python -m benchmarks.bench_db_writes --workers 4 --threads 4 --duration 10
+    python -m benchmarks.bench_db_writes --url postgresql://localhost/uml_bench --modes tuned
+
+`default` is a bare create_engine() on the same SQLite file (rollback journal,
+default busy timeout, no PRAGMAs); `tuned` uses db.engine_options/tune_engine.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert, update, func, select
+
+from benchmarks import synthetic
+from benchmarks.loadtest import summarize
+from db import db, engine_options, tune_engine, is_sqlite
+from models import Diagram, ConversationSession, ConversationMessage
+
+PLANTUML = "@startuml\nclass Library {\n  +name\n}\nclass Book {\n  +isbn\n}\nLibrary --> Book\n@enduml"
+
+
+def make_engine(url, mode):
+    if mode == "default":
+        return create_engine(url)
+    return tune_engine(create_engine(url, **engine_options(url)))
+
+
+def generate_write(conn, session_id):
+    """What _persist does for a new diagram: one diagram row, two message rows."""
+    diagram_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    conn.execute(insert(Diagram.__table__).values(
+        id=diagram_id, name="Generated Diagram", diagram_type="class",
+        plantuml_code=PLANTUML, created_at=now, updated_at=now))
+    last = conn.execute(select(func.max(ConversationMessage.__table__.c.seq))
+                        .where(ConversationMessage.__table__.c.session_id == session_id)).scalar() or 0
+    conn.execute(update(ConversationSession.__table__)
+                 .where(ConversationSession.__table__.c.id == session_id)
+                 .values(diagram_id=diagram_id, updated_at=now))
+    for offset, role in enumerate(("user", "assistant"), start=1):
+        conn.execute(insert(ConversationMessage.__table__).values(
+            session_id=session_id, seq=last + offset, role=role, content="A library has books", created_at=now))
+    return diagram_id
+
+
+def save_write(conn, diagram_id, flow_data):
+    conn.execute(update(Diagram.__table__).where(Diagram.__table__.c.id == diagram_id)
+                 .values(flow_data=flow_data, updated_at=datetime.utcnow()))
+
+
+def worker(url, mode, threads, duration, flow_data, results):
+    engine = make_engine(url, mode)
+    latencies, errors = [], {"locked": 0, "other": 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def run():
+        session_id = str(uuid.uuid4())
+        with engine.begin() as conn:
+            conn.execute(insert(ConversationSession.__table__).values(
+                id=session_id, created_at=datetime.utcnow(), updated_at=datetime.utcnow()))
+        diagram_id = None
+        n = 0
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    if diagram_id and n % 3 == 2:
+                        save_write(conn, diagram_id, flow_data)
+                    else:
+                        diagram_id = generate_write(conn, session_id)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+            except Exception as e:
+                with lock:
+                    errors["locked" if "locked" in str(e).lower() else "other"] += 1
+            n += 1
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    engine.dispose()
+    results.put((latencies, errors))
+
+
+def run_mode(url, mode, workers, threads, duration, flow_data):
+    engine = make_engine(url, mode)
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(url, mode, threads, duration, flow_data, results))
+             for _ in range(workers)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - start
+
+    latencies = [l for ls, _ in collected for l in ls]
+    errors = {k: sum(e[k] for _, e in collected) for k in ("locked", "other")}
+    return {
+        "mode": mode,
+        "workers": workers,
+        "threads": threads,
+        "commits": len(latencies),
+        "commits_per_s": round(len(latencies) / wall, 1),
+        "lock_errors": errors["locked"],
+        "other_errors": errors["other"],
+        **{k: v for k, v in summarize(latencies).items() if k != "count"},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="database URL (default: a scratch SQLite file per mode)")
+    parser.add_argument("--modes", nargs="+", choices=["default", "tuned"], default=["default", "tuned"])
+    parser.add_argument("--workers", type=int, default=4, help="processes, like gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="request threads per worker")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--graph-size", type=int, default=200, help="nodes in each save-model flow_data")
+    args = parser.parse_args()
+
+    nodes, edges = synthetic.flow_graph(args.graph_size)
+    flow_data = json.dumps({"nodes": nodes, "edges": edges})
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="uml-dbbench-") as scratch:
+        for mode in args.modes:
+            url = args.url or f"sqlite:///{os.path.join(scratch, mode + '.db')}"
+            if args.url and not is_sqlite(url) and mode == "default":
+                continue  # the PRAGMAs only differ for SQLite
+            results.append(run_mode(url, mode, args.workers, args.threads, args.duration, flow_data))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Single-pass extractor (utils/extract.py) versus the regex cascades it replaced,
+on large, messy GPT-style replies.
+
+    python -m benchmarks.bench_extract --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import random
+import re
+import time
+from utils.extract import extract_json_block, extract_plantuml_blocks, scan_reply, StreamExtractor
+
+# ----------------------------
+# Legacy implementations (verbatim baselines)
+# ----------------------------
+
+def legacy_route_extract_json_block(text: str):
+    match = re.search(r'```json\s*([\s\S]*?)\s*```', text)
+    if match:
+        candidate = match.group(1).strip()
+        try:
+            json.loads(candidate)
+            return candidate
+        except:
+            pass
+    match = re.search(r'```\s*([\s\S]*?)\s*```', text)
+    if match:
+        candidate = match.group(1).strip()
+        try:
+            json.loads(candidate)
+            return candidate
+        except:
+            pass
+    match = re.search(r'(\{[\s\S]*\})', text)
+    if match:
+        candidate = match.group(1).strip()
+        candidate = re.sub(r',\s*([\]}])', r'\1', candidate)
+        try:
+            json.loads(candidate)
+            return candidate
+        except:
+            pass
+    return None
+
+def legacy_parser_extract_json_block(text: str):
+    match = re.search(r"```json\s*(\{[\s\S]*?\})\s*```", text)
+    if match:
+        return match.group(1)
+    match = re.search(r"```[\s\S]*?```", text)
+    if match:
+        return match.group(1).strip("`")
+    match = re.search(r"(\{[\s\S]*\})", text)
+    if match:
+        return match.group(1)
+    return None
+
+def legacy_extract_plantuml_blocks(text: str) -> str:
+    match = re.findall(r'@startuml[\s\S]*?@enduml', text)
+    if match:
+        return "\n".join(match)
+    return ""
+
+def legacy_route_both(text):
+    """What _build_result used to do per reply."""
+    return legacy_extract_plantuml_blocks(text), legacy_route_extract_json_block(text)
+
+def route_both(text):
+    return extract_plantuml_blocks(text), extract_json_block(text)
+
+# ----------------------------
+# Synthetic replies
+# ----------------------------
+
+WORDS = "the system shall allow a member to borrow books and each {item} has an \"id\" field, which".split()
+
+def messy_reply(size, seed=7):
+    """Prose with stray braces and quotes, a fenced JSON model with trailing commas, and PlantUML."""
+    rng = random.Random(seed)
+    classes = []
+    n = max(2, size // 400)
+    for i in range(n):
+        attrs = ", ".join(f'"attr{j}: string"' for j in range(4))
+        classes.append(f'{{"name": "Class{i}", "attributes": [{attrs},], "methods": ["run()",],}}')
+    model = '{"classes": [' + ", ".join(classes) + '], "relationships": [],}'
+    uml = "@startuml\n" + "\n".join(f"class Class{i} {{\n  +id\n}}" for i in range(n // 4 + 1)) + "\n@enduml"
+    prose_len = max(0, size - len(model) - len(uml))
+    prose = []
+    total = 0
+    while total < prose_len:
+        word = rng.choice(WORDS)
+        prose.append(word)
+        total += len(word) + 1
+    half = len(prose) // 2
+    return (" ".join(prose[:half]) + "\n```plantuml\n" + uml + "\n```\n"
+            + "```json\n" + model + "\n```\n" + " ".join(prose[half:]) + " {end}")
+
+# ----------------------------
+# Runner
+# ----------------------------
+
+def timed(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        scan_reply.cache_clear()  # measure the scan, not the memo
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+def stream_all(text, chunk=16):
+    extractor = StreamExtractor()
+    for i in range(0, len(text), chunk):
+        extractor.feed(text[i:i + chunk])
+
+def run(sizes, repeat=5):
+    results = []
+    for size in sizes:
+        text = messy_reply(size)
+        cases = {
+            "legacy_route_extract_json_block": legacy_route_extract_json_block,
+            "legacy_parser_extract_json_block": legacy_parser_extract_json_block,
+            "legacy_extract_plantuml_blocks": legacy_extract_plantuml_blocks,
+            "extract_json_block": extract_json_block,
+            "extract_plantuml_blocks": extract_plantuml_blocks,
+            "legacy_route_both": legacy_route_both,
+            "route_both": route_both,
+        }
+        cases["stream_extractor_16b_chunks"] = stream_all
+        for name, fn in cases.items():
+            results.append({"bench": "extract", "case": name, "size": len(text), "best_ms": timed(fn, text, repeat)})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes, args.repeat), indent=2))
+
+if __name__ == "__main__":
+    main()
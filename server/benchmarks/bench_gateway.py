@@ -0,0 +1,67 @@
+"""
+Connection reuse: one fresh connection per call (the old bare requests.post)
+versus the pooled LLM gateway, both against the local fake OpenAI server.
+
+    python -m benchmarks.bench_gateway --calls 200 --connect-latency 0.05
+
+--connect-latency stands in for the TLS handshake to api.openai.com, which a
+plain-HTTP localhost server does not otherwise have.
+"""
+import argparse
+import http.client
+import json
+import time
+from urllib.parse import urlparse
+from benchmarks.fake_openai import FakeOpenAIServer
+from services.llm_gateway import LLMGateway
+
+MESSAGES = [{"role": "user", "content": "A library has books and members."}]
+
+
+def fresh_connection_call(base_url):
+    url = urlparse(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    body = json.dumps({"model": "gpt-4", "messages": MESSAGES, "temperature": 0.1})
+    conn.request("POST", url.path + "/chat/completions", body, {"Content-Type": "application/json"})
+    data = json.loads(conn.getresponse().read())
+    conn.close()
+    return data
+
+
+def measure(label, server, fn, calls):
+    start_connections = server.connections
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    elapsed = time.perf_counter() - start
+    return {
+        "case": label,
+        "calls": calls,
+        "total_s": round(elapsed, 4),
+        "mean_ms": round(elapsed / calls * 1000, 3),
+        "connections": server.connections - start_connections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--connect-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(latency=args.latency, connect_latency=args.connect_latency).start()
+    gateway = LLMGateway(base_url=server.base_url, api_key="test")
+    try:
+        results = [
+            measure("fresh-connection", server, lambda: fresh_connection_call(server.base_url), args.calls),
+            measure("gateway", server, lambda: gateway.complete(MESSAGES, temperature=0.1), args.calls),
+        ]
+    finally:
+        gateway.close()
+        server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Typed, indexed models (utils/uml_model.py) versus the JSON dict shape on
+synthetic models: retained memory, conversion cost, name/adjacency lookups
+and PlantUML generation (fragment cache cold and warm).
+
+    python -m benchmarks.bench_model --sizes 1000 10000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from benchmarks import synthetic
+from benchmarks.suite import measure
+from utils.plantuml import generate_plantuml, clear_fragment_cache
+from utils.uml_model import from_dict, use_case_id
+
+MODELS = {
+    "class": synthetic.class_model,
+    "usecase": synthetic.usecase_model,
+    "sequence": synthetic.sequence_model,
+}
+
+
+def retained_bytes(build):
+    """Bytes still allocated once build() returns (the object is kept alive meanwhile)."""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+# ----------------------------
+# Lookups: a scan of the dict shape vs the model's index
+# ----------------------------
+
+def _lookups(diagram_type, raw, typed, names):
+    if diagram_type == "class":
+        return {
+            "class_by_name": (
+                lambda: [next((c for c in raw["classes"] if c["name"] == n), None) for n in names],
+                lambda: [typed.get(n) for n in names]),
+            "relationships_from": (
+                lambda: [[r for r in raw["relationships"] if r["from"] == n] for n in names],
+                lambda: [typed.outgoing(n) for n in names]),
+        }
+    if diagram_type == "usecase":
+        return {
+            "use_case_by_name": (
+                lambda: [next((uc for uc in raw["use_cases"] if uc == n), None) for n in names],
+                lambda: [typed.use_case(n) for n in names]),
+            "use_case_by_id": (
+                lambda: [next((uc for uc in raw["use_cases"] if use_case_id(uc) == i), None)
+                         for i in map(use_case_id, names)],
+                lambda: [typed.by_id(i) for i in map(use_case_id, names)]),
+            "associations_of_actor": (
+                lambda: [[a for a in raw["associations"] if a["actor"] == n] for n in raw["actors"][:len(names)]],
+                lambda: [typed.associations_of(n) for n in raw["actors"][:len(names)]]),
+        }
+    return {
+        "participant_by_name": (
+            lambda: [next((p for p in raw["participants"] if p == n), None) for n in names],
+            lambda: [typed.participant(n) for n in names]),
+        "messages_of_participant": (
+            lambda: [[m for m in raw["messages"] if n in (m["from"], m["to"])] for n in names],
+            lambda: [typed.messages_of(n) for n in names]),
+    }
+
+
+def _names(diagram_type, raw, count, rng):
+    if diagram_type == "class":
+        pool = [c["name"] for c in raw["classes"]]
+    else:
+        pool = raw["use_cases"] if diagram_type == "usecase" else raw["participants"]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def run(diagram_type, size, lookups):
+    rng = random.Random(size)
+    payload = json.dumps(MODELS[diagram_type](size))  # models arrive as JSON
+    raw = json.loads(payload)
+    typed = from_dict(raw, diagram_type)
+    names = _names(diagram_type, raw, lookups, rng)
+
+    result = {
+        "type": diagram_type,
+        "elements": size,
+        "dict_bytes": retained_bytes(lambda: json.loads(payload)),
+        "typed_bytes": retained_bytes(lambda: from_dict(json.loads(payload), diagram_type)),
+        "from_dict_ms": measure(lambda: from_dict(raw, diagram_type))[0],
+        "to_dict_ms": measure(typed.to_dict)[0],
+    }
+    result["memory_ratio"] = round(result["typed_bytes"] / result["dict_bytes"], 3)
+
+    for name, (scan, index) in _lookups(diagram_type, raw, typed, names).items():
+        result[f"{name}_scan_ms"] = measure(scan, repeat=3)[0]
+        result[f"{name}_index_ms"] = measure(index)[0]
+
+    def cold(model):
+        def call():
+            clear_fragment_cache()
+            return generate_plantuml(model, diagram_type)
+        return call
+
+    assert generate_plantuml(raw, diagram_type) == generate_plantuml(typed, diagram_type)
+    result["plantuml_cold_dict_ms"] = measure(cold(raw), repeat=3)[0]
+    result["plantuml_cold_typed_ms"] = measure(cold(typed), repeat=3)[0]
+    result["plantuml_warm_dict_ms"] = measure(lambda: generate_plantuml(raw, diagram_type))[0]
+    result["plantuml_warm_typed_ms"] = measure(lambda: generate_plantuml(typed, diagram_type))[0]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--types", default="class,usecase,sequence")
+    parser.add_argument("--lookups", type=int, default=200, help="names looked up per measurement")
+    args = parser.parse_args()
+
+    results = [run(t, size, args.lookups) for t in args.types.split(",") for size in args.sizes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Local-first routing (services/extractor.py): which share of a corpus of
+typical /generate descriptions the rule-based extractor answers on its own
+(confidence >= LOCAL_MIN_CONFIDENCE, so no LLM call), and how long it takes.
+Needs a spaCy pipeline with a parser (SPACY_MODEL, default en_core_web_sm).
+The server only routes requests this way with LOCAL_FIRST=1; this measures
+the extractor either way.
+
+    python -m benchmarks.bench_router --repeat 20 --show
+"""
+import argparse
+import json
+import statistics
+import time
+from services import extractor
+from utils.plantuml import generate_plantuml
+
+CORPUS = [
+    ("class", "A library has many books. Each book has a title and an isbn. A member borrows books. A librarian is a member."),
+    ("class", "A customer places orders. An order contains many order items. Each product has a name and a price."),
+    ("class", "A school has many classrooms. A teacher teaches courses. A student enrolls in courses. Each course has a code."),
+    ("class", "A car has an engine and four wheels. A driver drives the car. A truck is a kind of vehicle."),
+    ("class", "A user can reset the password. Each user has an email and a username. An admin extends user."),
+    ("class", "A bank manages accounts. Each account has a balance. A customer owns accounts. A savings account is an account."),
+    ("class", "If a user is banned, the system should probably hide their posts unless a moderator objects."),
+    ("usecase", "A customer can browse products, add items to the cart and check out. An admin manages the catalog."),
+    ("usecase", "The user logs in. The user uploads photos. The user shares albums with friends."),
+    ("usecase", "A patient books an appointment. A doctor views the schedule. The receptionist cancels appointments."),
+    ("usecase", "Students submit assignments and teachers grade assignments. The system does not email parents."),
+    ("sequence", "The user sends a login request to the server. The server queries the database. The database returns the user record to the server. It replies to the user."),
+    ("sequence", "The client sends an order to the api. The api forwards the order to the payment service. The payment service returns a receipt to the api."),
+    ("sequence", "The browser requests the page from the frontend. The frontend calls the backend. The backend responds to the frontend."),
+    ("sequence", "Somehow the whole thing syncs up eventually, maybe through the queue, depending on load."),
+]
+
+
+def run(repeat, show):
+    rows = []
+    for diagram_type, text in CORPUS:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model, confidence = extractor.extract(text, diagram_type)
+            plantuml = generate_plantuml(model, diagram_type) if model else ""
+            times.append(time.perf_counter() - start)
+        local = confidence >= extractor.LOCAL_MIN_CONFIDENCE
+        row = {
+            "type": diagram_type,
+            "text": text[:60] + ("…" if len(text) > 60 else ""),
+            "confidence": confidence,
+            "local": local,
+            "ms": round(statistics.median(times) * 1000, 2),
+        }
+        if show and local:
+            row["plantuml"] = plantuml
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--show", action="store_true", help="include the PlantUML of locally answered items")
+    args = parser.parse_args()
+
+    if not extractor.can_parse():
+        raise SystemExit(f"spaCy pipeline {extractor.SPACY_MODEL!r} has no dependency parser; "
+                         f"install it (python -m spacy download {extractor.SPACY_MODEL}) to run this benchmark")
+
+    rows = run(args.repeat, args.show)
+    local = [r for r in rows if r["local"]]
+    summary = {
+        "requests": len(rows),
+        "answered_locally": len(local),
+        "local_share": round(len(local) / len(rows), 3),
+        "local_ms_median": round(statistics.median(r["ms"] for r in local), 2) if local else None,
+        "threshold": extractor.LOCAL_MIN_CONFIDENCE,
+    }
+    print(json.dumps({"summary": summary, "items": rows}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+LLM scheduling under upstream throttling: a batch fan-out plus a stream of
+interactive calls against the fake OpenAI server with rate limits, comparing
+  legacy     fixed concurrency, no retries, no priorities (the old gateway)
+  adaptive   AIMD concurrency + backoff honoring Retry-After + priorities
+  buckets    adaptive, plus LLM_RPM_LIMIT set to the upstream's quota
+
+    python -m benchmarks.bench_scheduler --rpm 600 --max-inflight 6 --batch 80 --interactive 20
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from benchmarks.fake_openai import FakeOpenAIServer
+from services import llm_scheduler
+from services.llm_gateway import LLMGateway
+
+MESSAGES = [{"role": "user", "content": "A library has books and members."}]
+
+
+@contextmanager
+def legacy_mode(max_concurrency):
+    """The scheduler reduced to the old semaphore: no retries, no pauses, no reserve, fixed limit."""
+    saved = {name: getattr(llm_scheduler, name)
+             for name in ("MAX_RETRIES", "MIN_CONCURRENCY", "INTERACTIVE_RESERVE", "BACKOFF_CAP")}
+    llm_scheduler.MAX_RETRIES = 0
+    llm_scheduler.MIN_CONCURRENCY = max_concurrency
+    llm_scheduler.INTERACTIVE_RESERVE = 0
+    llm_scheduler.BACKOFF_CAP = 0
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(llm_scheduler, name, value)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+
+def run_mode(mode, args):
+    server = FakeOpenAIServer(latency=args.latency, rpm=args.rpm, max_inflight=args.max_inflight,
+                              load_latency=args.load_latency, seed=1).start()
+    gateway = LLMGateway(base_url=server.base_url, api_key="test", max_concurrency=args.concurrency,
+                         rpm=args.rpm if mode == "buckets" else 0, tpm=0)
+    batch_priority = "interactive" if mode == "legacy" else "batch"
+    interactive_latency, interactive_failed = [], 0
+    batch_ok = batch_failed = 0
+
+    def interactive():
+        nonlocal interactive_failed
+        for _ in range(args.interactive):
+            started = time.perf_counter()
+            try:
+                gateway.complete(MESSAGES, timeout=args.timeout)
+                interactive_latency.append(time.perf_counter() - started)
+            except Exception:
+                interactive_failed += 1
+            time.sleep(args.interactive_gap)
+
+    started = time.perf_counter()
+    try:
+        with legacy_mode(args.concurrency) if mode == "legacy" else contextmanager(lambda: (yield))():
+            user = threading.Thread(target=interactive)
+            user.start()
+            calls = [{"messages": MESSAGES}] * args.batch
+            for _, _, error in gateway.complete_many(calls, args.concurrency, args.timeout, batch_priority):
+                if error is None:
+                    batch_ok += 1
+                else:
+                    batch_failed += 1
+            user.join()
+            scheduler = gateway.stats()
+    finally:
+        gateway.close()
+        server.shutdown()
+
+    return {
+        "mode": mode,
+        "wall_s": round(time.perf_counter() - started, 2),
+        "batch_ok": batch_ok,
+        "batch_failed": batch_failed,
+        "interactive_ok": len(interactive_latency),
+        "interactive_failed": interactive_failed,
+        "interactive_p50_ms": percentile(interactive_latency, 0.5),
+        "interactive_p95_ms": percentile(interactive_latency, 0.95),
+        "interactive_mean_ms": round(statistics.mean(interactive_latency) * 1000, 1) if interactive_latency else None,
+        "upstream_requests": server.requests + server.throttled,
+        "upstream_429s": server.throttled,
+        "final_limit": scheduler.get("limit"),
+        "retries": scheduler.get("retries"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=80)
+    parser.add_argument("--interactive", type=int, default=20)
+    parser.add_argument("--interactive-gap", type=float, default=0.25, help="seconds between interactive calls")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--load-latency", type=float, default=0.25)
+    parser.add_argument("--rpm", type=float, default=600, help="upstream quota (429 beyond)")
+    parser.add_argument("--max-inflight", type=int, default=6, help="upstream concurrency (429 beyond)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--modes", default="legacy,adaptive,buckets")
+    args = parser.parse_args()
+
+    results = [run_mode(mode, args) for mode in args.modes.split(",")]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+/api/diagrams/search latency on a large database: fills a scratch SQLite file
+with synthetic diagrams, backfills the FTS5 index, then times ranked queries
+of different selectivity (one page of 50, warm cache).
+
+    python -m benchmarks.bench_search --diagrams 100000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from benchmarks.suite import measure
+from db import db, configure
+from models import Diagram
+from services import search
+
+NOUNS = ("Library Book Member Loan Fine Author Publisher Shelf Branch Card Reservation Invoice Order "
+         "Customer Product Cart Payment Shipment Warehouse Supplier Employee Department Project Task "
+         "Ticket Flight Passenger Seat Booking Hotel Room Guest Course Student Teacher Exam Grade "
+         "Account Transaction Ledger Patient Doctor Appointment Prescription Vehicle Driver Route").split()
+ATTRS = "id name title email status amount date price quantity code address phone total rating".split()
+
+QUERIES = {
+    "rare_name": "Diagram 4242",
+    "rare_term": "Prescription Seat",
+    "common_term": "Book",
+    "prefix": "Reserv",
+    "two_terms": "Library Loan",
+    "attribute": "email",
+    "camel_case": "BookLoan",
+    "no_match": "zzzz",
+}
+
+
+def class_diagram(rng, n_classes):
+    names = rng.sample(NOUNS, n_classes)
+    lines = ["@startuml"]
+    for name in names:
+        lines.append(f"class {name}{rng.choice(NOUNS)} {{")
+        lines += [f"  +{a}: string" for a in rng.sample(ATTRS, 3)]
+        lines.append("}")
+    lines.append("@enduml")
+    return "\n".join(lines)
+
+
+def populate(n, seed=1, batch=5000):
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    table = Diagram.__table__
+    for start in range(0, n, batch):
+        rows = [{
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": f"Diagram {i}",
+            "diagram_type": "class",
+            "plantuml_code": class_diagram(rng, rng.randint(2, 6)),
+            "created_at": base + timedelta(seconds=i),
+            "updated_at": base + timedelta(seconds=i),
+        } for i in range(start, min(n, start + batch))]
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--diagrams", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="uml-search-") as scratch:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch, 'search.db')}"
+        app = Flask(__name__)
+        configure(app)
+        with app.app_context():
+            db.create_all()
+            search.ensure_index(db.engine)
+
+            start = time.perf_counter()
+            populate(args.diagrams)
+            populate_s = time.perf_counter() - start
+            start = time.perf_counter()
+            indexed = search.backfill()
+            backfill_s = time.perf_counter() - start
+
+            results = []
+            for case, query in QUERIES.items():
+                hits = len(search.search(query, args.limit))
+                ms, loops = measure(lambda q=query: search.search(q, args.limit), args.repeat)
+                results.append({"case": case, "query": query, "page_hits": hits, "best_ms": ms, "loops": loops})
+            for case, query, offset, diagram_type in (("deep_page", "Book", 5000, None),
+                                                       ("type_filter", "Book", 0, "class"),
+                                                       ("type_filter_empty", "Book", 0, "sequence")):
+                run = lambda: search.search(query, args.limit, offset, diagram_type)
+                hits = len(run())
+                ms, loops = measure(run, args.repeat)
+                results.append({"case": case, "query": query, "page_hits": hits, "best_ms": ms, "loops": loops})
+
+    print(json.dumps({
+        "diagrams": args.diagrams,
+        "populate_s": round(populate_s, 2),
+        "backfill_s": round(backfill_s, 2),
+        "indexed": indexed,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
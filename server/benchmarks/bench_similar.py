@@ -0,0 +1,96 @@
+"""
+Near-duplicate lookup (services/similar.py): MinHash/LSH candidates ranked by
+exact Jaccard, versus scanning every stored description. Synthetic
+descriptions of the same few systems in varied wording (as users write them);
+reports lookup latency and how often LSH finds the scan's best match.
+
+    python -m benchmarks.bench_similar --sizes 1000 10000 50000 --queries 200
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from services.similar import Index, shingles, signature, jaccard, near_identical, SIMILAR_EXAMPLE_THRESHOLD
+
+DOMAINS = {
+    "library": ["library", "book", "member", "librarian", "loan", "author", "shelf", "fine", "catalog", "reservation"],
+    "shop": ["shop", "product", "customer", "order", "cart", "payment", "invoice", "supplier", "category", "discount"],
+    "booking": ["hotel", "room", "guest", "booking", "reception", "invoice", "stay", "review", "staff", "payment"],
+    "school": ["school", "student", "teacher", "course", "classroom", "grade", "exam", "timetable", "parent", "subject"],
+    "clinic": ["clinic", "patient", "doctor", "appointment", "prescription", "nurse", "record", "bill", "ward", "treatment"],
+    "bank": ["bank", "account", "customer", "transaction", "loan", "card", "branch", "teller", "statement", "deposit"],
+}
+VERBS = ["has", "manages", "contains", "tracks", "stores", "handles", "offers", "keeps", "lists", "records"]
+FILLER = ["a", "the", "many", "several", "each", "some", "lots of", "multiple"]
+
+
+def description(rng, domain, words):
+    """3-5 short sentences about `words` drawn from one domain."""
+    nouns = DOMAINS[domain]
+    picked = [nouns[0]] + rng.sample(nouns[1:], words - 1)
+    sentences = []
+    for i in range(0, len(picked) - 1, 2):
+        subject, obj = picked[i], picked[i + 1]
+        sentences.append(f"{rng.choice(FILLER)} {subject} {rng.choice(VERBS)} {rng.choice(FILLER)} {obj}s")
+    return ". ".join(s.capitalize() for s in sentences) + "."
+
+
+def corpus(n, rng):
+    return [description(rng, rng.choice(list(DOMAINS)), rng.randint(5, 9)) for _ in range(n)]
+
+
+def scan(entries, query, limit, min_score):
+    scored = [(jaccard(query, s), i) for i, s in enumerate(entries)]
+    return sorted((x for x in scored if x[0] >= min_score), reverse=True)[:limit]
+
+
+def run(size, queries, seed):
+    rng = random.Random(seed)
+    texts = corpus(size, rng)
+
+    started = time.perf_counter()
+    index = Index(max_entries=size)
+    sets = []
+    for i, text in enumerate(texts):
+        shingle_set = shingles(text)
+        sets.append(shingle_set)
+        index.add(i, "class", shingle_set, signature(shingle_set))
+    build_s = time.perf_counter() - started
+
+    lsh_ms, scan_ms, agree, found, reusable = [], [], 0, 0, 0
+    for text in corpus(queries, rng):
+        query = shingles(text)
+        started = time.perf_counter()
+        hits = index.query("class", query, signature(query), 1, SIMILAR_EXAMPLE_THRESHOLD)
+        lsh_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        best = scan(sets, query, 1, SIMILAR_EXAMPLE_THRESHOLD)
+        scan_ms.append((time.perf_counter() - started) * 1000)
+        if best:
+            found += 1
+            agree += bool(hits) and hits[0][0] == best[0][0]
+            reusable += near_identical(query, sets[best[0][1]])
+    return {
+        "stored": size,
+        "build_s": round(build_s, 2),
+        "lsh_ms_median": round(statistics.median(lsh_ms), 3),
+        "scan_ms_median": round(statistics.median(scan_ms), 3),
+        "queries_with_a_match": found,
+        "lsh_found_best_match": round(agree / found, 3) if found else None,
+        "reusable_matches": reusable,
+        "buckets": len(index.buckets),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps([run(size, args.queries, args.seed) for size in args.sizes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Storage size and read latency of diagram content, stored raw vs compressed
+(CompressedText): fills a scratch SQLite file per mode with synthetic
+diagrams whose flow_data has --graph-size nodes, VACUUMs, then times reads.
+
+    python -m benchmarks.bench_storage --diagrams 2000 --graph-size 200
+
+`raw` disables compression (every value below the threshold), which matches
+the size of the old TEXT columns plus one format byte per value.
+"""
+import argparse
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+import db as db_module
+from benchmarks import synthetic
+from benchmarks.suite import measure
+from db import db, configure
+from models import Diagram
+from routes.diagrams import flow_to_plantuml
+
+
+def populate(n, graph_size, batch=500):
+    nodes, edges = synthetic.flow_graph(graph_size)
+    flow_data = json.dumps({"nodes": nodes, "edges": edges})
+    plantuml = flow_to_plantuml(nodes, edges)
+    base = datetime(2024, 1, 1)
+    ids = []
+    for start in range(0, n, batch):
+        rows = [{
+            "id": str(uuid.UUID(int=i + 1)),
+            "name": f"Diagram {i}",
+            "diagram_type": "class",
+            "plantuml_code": plantuml,
+            "flow_data": flow_data,
+            "created_at": base + timedelta(seconds=i),
+            "updated_at": base + timedelta(seconds=i),
+        } for i in range(start, min(n, start + batch))]
+        db.session.execute(Diagram.__table__.insert(), rows)
+        db.session.commit()
+        ids += [r["id"] for r in rows]
+    return ids, len(plantuml), len(flow_data)
+
+
+def run_mode(mode, scratch, args):
+    db_module.COMPRESS_MIN_BYTES = 1 << 62 if mode == "raw" else args.min_bytes
+    path = os.path.join(scratch, mode + ".db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    app = Flask(__name__)
+    configure(app)
+    with app.app_context():
+        db.create_all()
+        ids, plantuml_len, flow_len = populate(args.diagrams, args.graph_size)
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        size = os.path.getsize(path)
+
+        probe = ids[len(ids) // 2]
+
+        def full_read():
+            db.session.expunge_all()
+            return Diagram.get_with_content(probe).to_dict()
+
+        def metadata_read():
+            # delete/rename paths: the row without its content
+            db.session.expunge_all()
+            return Diagram.query.get(probe).name
+
+        def scan():
+            # every flow_data in the table, e.g. an export
+            return sum(len(r[0] or "") for r in db.session.execute(db.select(Diagram.__table__.c.flow_data)))
+
+        result = {
+            "mode": mode,
+            "db_bytes": size,
+            "bytes_per_diagram": round(size / args.diagrams),
+            "raw_content_bytes": plantuml_len + flow_len,
+        }
+        for case, fn in (("get_to_dict", full_read), ("get_without_content", metadata_read), ("scan_flow_data", scan)):
+            ms, loops = measure(fn, args.repeat)
+            result[f"{case}_ms"] = ms
+        db.session.remove()
+        db.engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--diagrams", type=int, default=2000)
+    parser.add_argument("--graph-size", type=int, default=200, help="nodes in each flow_data")
+    parser.add_argument("--min-bytes", type=int, default=db_module.COMPRESS_MIN_BYTES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="uml-storage-") as scratch:
+        results = [run_mode(mode, scratch, args) for mode in ("raw", "compressed")]
+    print(json.dumps({"diagrams": args.diagrams, "graph_size": args.graph_size, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
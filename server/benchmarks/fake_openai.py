@@ -0,0 +1,292 @@
+"""
+Local stand-in for the OpenAI chat-completions API.
+
+    python -m benchmarks.fake_openai --port 8089 --latency 0.8 --error-rate 0.02 --reply-mode mixed
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python app.py
+
+Throttling like the real API: --rpm / --max-inflight answer 429 with
+Retry-After once exceeded, --throttle-rate answers a random share with 429.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_REPLY = """Here is the diagram:
+@startuml
+class Library {
+  +name: string
+}
+class Book {
+  +isbn: string
+  +title: string
+}
+Library o-- Book : holds
+@enduml"""
+
+# Type-aware replies used when the server is not pinned to one `reply`;
+# the requested type is read from the system prompt, as GPT would.
+PLANTUML_REPLIES = {
+    "class": CANNED_REPLY,
+    "usecase": """Here is the diagram:
+@startuml
+actor Member
+actor Librarian
+usecase "Borrow book" as UC1
+usecase "Return book" as UC2
+Member --> UC1
+Member --> UC2
+Librarian --> UC2
+@enduml""",
+    "sequence": """Here is the diagram:
+@startuml
+actor Member
+participant Library
+participant Database
+Member -> Library: borrow(isbn)
+Library -> Database: loadBook(isbn)
+Database --> Library: book
+Library --> Member: receipt
+@enduml""",
+}
+
+JSON_REPLIES = {
+    "class": {
+        "classes": [
+            {"name": "Library", "attributes": ["name: string"], "methods": []},
+            {"name": "Book", "attributes": ["isbn: string", "title: string"], "methods": ["borrow()"]},
+        ],
+        "relationships": [{"from": "Library", "to": "Book", "type": "aggregation", "label": "holds"}],
+    },
+    "usecase": {
+        "actors": ["Member"],
+        "use_cases": ["Borrow book", "Return book"],
+        "associations": [{"actor": "Member", "use_case": "Borrow book"},
+                         {"actor": "Member", "use_case": "Return book"}],
+        "includes": [],
+        "extends": [],
+    },
+    "sequence": {
+        "participants": ["Member", "Library"],
+        "messages": [{"from": "Member", "to": "Library", "message": "borrow(isbn)", "type": "sync"},
+                     {"from": "Library", "to": "Member", "message": "receipt", "type": "return"}],
+        "activations": [],
+    },
+}
+
+REPLY_MODES = ("plantuml", "json", "mixed")
+
+
+def requested_type(messages):
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    if "**Use Case**" in system:
+        return "usecase"
+    if "**Sequence**" in system:
+        return "sequence"
+    return "class"
+
+
+def edit_reply(diagram_type, serial):
+    """EDIT MODE delta reply; names are unique so the ops always apply."""
+    if diagram_type == "usecase":
+        ops = [{"op": "add_use_case", "name": f"Feature {serial}"}]
+    elif diagram_type == "sequence":
+        ops = [{"op": "add_participant", "name": f"Service{serial}"}]
+    else:
+        ops = [{"op": "add_class", "name": f"Entity{serial}", "attributes": ["id: int"]}]
+    return "Updated the diagram:\n```json\n" + json.dumps({"ops": ops}) + "\n```"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # Emulates the TCP + TLS handshake cost paid once per new connection
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        retry_after = server.throttle()
+        if retry_after is not None:
+            payload = json.dumps({"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}})
+            self._send_json(payload.encode("utf-8"), status=429, headers={
+                "Retry-After": str(max(1, round(retry_after))),
+                "retry-after-ms": str(int(retry_after * 1000)),
+            })
+            return
+        try:
+            if server.latency:
+                time.sleep(server.latency * (1 + server.load_latency * max(0, server.inflight - 1)))
+            self._reply(body)
+        finally:
+            with server._counter_lock:
+                server.inflight -= 1
+
+    def _reply(self, body):
+        server = self.server
+        if server.should_fail():
+            payload = json.dumps({"error": {"message": "Injected upstream failure", "type": "server_error"}})
+            self._send_json(payload.encode("utf-8"), status=500)
+            return
+
+        reply = server.reply_for(body.get("messages") or [])
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(reply), 16):
+                chunk = {"choices": [{"delta": {"content": reply[i:i + 16]}}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self._write_chunk("")
+            return
+
+        payload = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": reply}}],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 60, "total_tokens": 110},
+        }).encode("utf-8")
+        self._send_json(payload)
+
+    def _send_json(self, payload, status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, connect_latency=0.0, reply=CANNED_REPLY,
+                 error_rate=0.0, reply_mode="plantuml", seed=None, rpm=0, max_inflight=0, throttle_rate=0.0,
+                 load_latency=0.0):
+        """
+        `reply=None` answers per requested diagram type in `reply_mode` (plantuml, json or mixed).
+        `rpm` (requests per minute, bursting up to a second's worth) and `max_inflight`
+        answer 429 once exceeded; `load_latency` slows each reply by that fraction
+        of `latency` per other request in flight, like an overloaded upstream.
+        """
+        super().__init__((host, port), FakeOpenAIHandler)
+        if reply_mode not in REPLY_MODES:
+            raise ValueError(f"reply_mode must be one of {REPLY_MODES}")
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.reply = reply
+        self.error_rate = error_rate
+        self.reply_mode = reply_mode
+        self.rpm = rpm
+        self.max_inflight = max_inflight
+        self.throttle_rate = throttle_rate
+        self.load_latency = load_latency
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.inflight = 0
+        self._allowance = rpm / 60.0
+        self._allowance_at = time.monotonic()
+        self._rng = random.Random(seed)
+        self._counter_lock = threading.Lock()
+
+    def throttle(self):
+        """None to serve the request (it is then counted in flight), else the Retry-After in seconds."""
+        with self._counter_lock:
+            retry_after = None
+            if self.rpm:
+                rate = self.rpm / 60.0
+                now = time.monotonic()
+                self._allowance = min(rate, self._allowance + (now - self._allowance_at) * rate)
+                self._allowance_at = now
+                if self._allowance < 1:
+                    retry_after = (1 - self._allowance) / rate
+                else:
+                    self._allowance -= 1
+            if retry_after is None and self.max_inflight and self.inflight >= self.max_inflight:
+                retry_after = max(self.latency, 0.05)
+            if retry_after is None and self.throttle_rate and self._rng.random() < self.throttle_rate:
+                retry_after = 0.5
+            if retry_after is None:
+                self.inflight += 1
+            else:
+                self.throttled += 1
+            return retry_after
+
+    def should_fail(self):
+        with self._counter_lock:
+            self.requests += 1
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def reply_for(self, messages):
+        if self.reply is not None:
+            return self.reply
+        diagram_type = requested_type(messages)
+        system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+        with self._counter_lock:
+            serial = self.requests
+            as_json = self.reply_mode == "json" or (self.reply_mode == "mixed" and self._rng.random() < 0.5)
+        if "EDIT MODE" in system:
+            return edit_reply(diagram_type, serial)
+        if as_json:
+            return "Here is the model:\n```json\n" + json.dumps(JSON_REPLIES[diagram_type], indent=2) + "\n```"
+        return PLANTUML_REPLIES[diagram_type]
+
+    def stats(self):
+        return {"connections": self.connections, "requests": self.requests, "errors": self.errors,
+                "throttled": self.throttled}
+
+    def get_request(self):
+        conn = super().get_request()
+        self.connections += 1
+        return conn
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every reply")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="seconds added per new connection")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with a 500")
+    parser.add_argument("--reply-mode", choices=REPLY_MODES, default="plantuml",
+                        help="answer with PlantUML, a JSON model, or a random mix of both")
+    parser.add_argument("--rpm", type=float, default=0, help="requests per minute before answering 429")
+    parser.add_argument("--max-inflight", type=int, default=0, help="concurrent requests before answering 429")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of calls answered with a 429")
+    parser.add_argument("--load-latency", type=float, default=0.0,
+                        help="extra fraction of --latency per other request in flight")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(port=args.port, latency=args.latency, connect_latency=args.connect_latency,
+                              reply=None, error_rate=args.error_rate, reply_mode=args.reply_mode,
+                              rpm=args.rpm, max_inflight=args.max_inflight, throttle_rate=args.throttle_rate,
+                              load_latency=args.load_latency)
+    print(f"🧪 Fake OpenAI listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,315 @@
+"""
+End-to-end load test: virtual users replay a mix of create, edit, save-model and
+list traffic against the Flask app, with the LLM replaced by the local fake
+OpenAI server. Reports throughput, p50/p95/p99 latency per operation and DB
+contention (statement latency and SQLite lock errors).
+
+    python -m benchmarks.loadtest --users 16 --duration 30 --latency 0.8
+    python -m benchmarks.loadtest --mix create=1 edit=1 --error-rate 0.05 --output load.json
+
+By default the app runs in-process on a throwaway SQLite database, so DB
+statements can be timed directly. With --url the driver targets an app that is
+already running (point its OPENAI_BASE_URL at `python -m benchmarks.fake_openai`);
+contention is then inferred from "database is locked" responses only.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks import synthetic
+from benchmarks.fake_openai import FakeOpenAIServer, REPLY_MODES
+
+DEFAULT_MIX = {"create": 40, "edit": 25, "save": 15, "list": 20}
+DIAGRAM_TYPES = ["class", "usecase", "sequence"]
+
+DESCRIPTIONS = {
+    "class": "A library has books and members. Each member can borrow many books",
+    "usecase": "Members borrow and return books while librarians manage the catalogue",
+    "sequence": "A member asks the library to borrow a book and the library checks the database",
+}
+EDITS = [
+    "Add a reservation feature for popular items",
+    "Also track fines for late returns",
+    "Include an audit log for every change",
+]
+
+# ----------------------------
+# Stats
+# ----------------------------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies_s):
+    values = sorted(latencies_s)
+    if not values:
+        return {"count": 0}
+    ms = lambda v: round(v * 1000, 2)
+    return {
+        "count": len(values),
+        "mean_ms": ms(sum(values) / len(values)),
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]),
+    }
+
+
+class Recorder:
+    """Thread-safe per-operation latencies and error counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def record(self, op, elapsed, error=None):
+        with self._lock:
+            self.latencies[op].append(elapsed)
+            if error:
+                self.errors[op][error] += 1
+
+    def report(self, wall_s):
+        ops = {}
+        every = []
+        error_total = 0
+        for op, values in sorted(self.latencies.items()):
+            errors = dict(self.errors.get(op, {}))
+            error_total += sum(errors.values())
+            every.extend(values)
+            ops[op] = {**summarize(values), "throughput_rps": round(len(values) / wall_s, 2), "errors": errors}
+        return {
+            "overall": {**summarize(every), "throughput_rps": round(len(every) / wall_s, 2), "errors": error_total},
+            "operations": ops,
+        }
+
+
+class DBProbe:
+    """Times every statement on the app's engine and counts lock errors (in-process mode)."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reads = []
+        self.writes = []
+        self.lock_errors = 0
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.start = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - self._local.start
+        bucket = self.reads if statement.lstrip()[:6].upper() == "SELECT" else self.writes
+        with self._lock:
+            bucket.append(elapsed)
+
+    def _error(self, context):
+        if "locked" in str(context.original_exception).lower():
+            with self._lock:
+                self.lock_errors += 1
+
+    def report(self):
+        with self._lock:
+            reads, writes = list(self.reads), list(self.writes)
+        return {
+            "statements": len(reads) + len(writes),
+            "db_time_s": round(sum(reads) + sum(writes), 4),
+            "reads": summarize(reads),
+            "writes": summarize(writes),
+            "lock_errors": self.lock_errors,
+        }
+
+# ----------------------------
+# Virtual user
+# ----------------------------
+
+def classify(resp):
+    if resp.status_code < 400:
+        return None
+    body = resp.text
+    if "database is locked" in body:
+        return "db_locked"
+    if "LLM API error" in body or "timed out" in body:
+        return "upstream"
+    return f"http_{resp.status_code}"
+
+
+class VirtualUser:
+    """One browser tab: keeps its session cookie and the diagrams it created."""
+
+    def __init__(self, base_url, recorder, mix, rng, graph_size):
+        self.client = httpx.Client(base_url=base_url, timeout=120)
+        self.recorder = recorder
+        self.ops, self.weights = zip(*mix.items())
+        self.rng = rng
+        self.graph_size = graph_size
+        self.diagrams = []  # (id, type)
+
+    def step(self):
+        op = self.rng.choices(self.ops, self.weights)[0]
+        if op in ("edit", "save") and not self.diagrams:
+            op = "create"  # nothing to edit yet
+        start = time.perf_counter()
+        try:
+            resp = getattr(self, op)()
+            error = classify(resp)
+        except httpx.HTTPError as e:
+            error = f"transport:{type(e).__name__}"
+        self.recorder.record(op, time.perf_counter() - start, error)
+
+    def create(self):
+        diagram_type = self.rng.choice(DIAGRAM_TYPES)
+        text = f"{DESCRIPTIONS[diagram_type]} (variant {self.rng.randrange(10 ** 9)})"
+        resp = self.client.post("/api/generate", json={"text": text, "type": diagram_type})
+        if resp.status_code == 200 and resp.json().get("diagram_id"):
+            self.diagrams.append((resp.json()["diagram_id"], diagram_type))
+        return resp
+
+    def edit(self):
+        diagram_id, diagram_type = self.rng.choice(self.diagrams)
+        text = f"{self.rng.choice(EDITS)} (variant {self.rng.randrange(10 ** 9)})"
+        return self.client.post("/api/generate", json={"text": text, "type": diagram_type, "diagram_id": diagram_id})
+
+    def save(self):
+        diagram_id, _ = self.rng.choice(self.diagrams)
+        nodes, edges = synthetic.flow_graph(self.graph_size, seed=self.rng.randrange(1000))
+        return self.client.post(f"/api/diagrams/{diagram_id}/save-model", json={"nodes": nodes, "edges": edges})
+
+    def list(self):
+        return self.client.get("/api/diagrams", params={"limit": 50})
+
+    def close(self):
+        self.client.close()
+
+# ----------------------------
+# Runner
+# ----------------------------
+
+def start_app(fake, database_url):
+    """Import the app against the fake LLM and a scratch DB; serve it on a threaded server."""
+    os.environ["OPENAI_BASE_URL"] = fake.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "loadtest")
+    os.environ["LLM_CACHE_ENABLED"] = "0"  # every request should reach the (fake) LLM
+    os.environ["DATABASE_URL"] = database_url
+
+    from werkzeug.serving import make_server
+    from app import app
+    from db import db
+
+    with app.app_context():
+        probe = DBProbe(db.engine)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", probe
+
+
+def run(base_url, users, duration, mix, graph_size, seed, recorder):
+    stop = time.monotonic() + duration
+    master = random.Random(seed)
+
+    def worker(rng):
+        user = VirtualUser(base_url, recorder, mix, rng, graph_size)
+        try:
+            while time.monotonic() < stop:
+                user.step()
+        finally:
+            user.close()
+
+    threads = [threading.Thread(target=worker, args=(random.Random(master.random()),)) for _ in range(users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def parse_mix(pairs):
+    mix = {}
+    for pair in pairs:
+        op, _, weight = pair.partition("=")
+        if op not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation '{op}' (expected one of {', '.join(DEFAULT_MIX)})")
+        mix[op] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target an already running app instead of starting one in-process")
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of traffic")
+    parser.add_argument("--mix", nargs="+", metavar="OP=WEIGHT", help="e.g. create=40 edit=25 save=15 list=20")
+    parser.add_argument("--graph-size", type=int, default=50, help="nodes per save-model upload")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM seconds per call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake LLM calls that fail")
+    parser.add_argument("--reply-mode", choices=REPLY_MODES, default="mixed")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix) if args.mix else dict(DEFAULT_MIX)
+
+    fake = server = probe = None
+    scratch = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        fake = FakeOpenAIServer(latency=args.latency, reply=None, error_rate=args.error_rate,
+                                reply_mode=args.reply_mode, seed=args.seed).start()
+        scratch = tempfile.TemporaryDirectory(prefix="uml-loadtest-")
+        server, base_url, probe = start_app(fake, f"sqlite:///{os.path.join(scratch.name, 'loadtest.db')}")
+
+    print(f"🚦 {args.users} users for {args.duration}s against {base_url}", file=sys.stderr)
+    recorder = Recorder()
+    try:
+        wall_s = run(base_url, args.users, args.duration, mix, args.graph_size, args.seed, recorder)
+    finally:
+        if server:
+            server.shutdown()
+        if fake:
+            fake.shutdown()
+
+    report = {
+        "target": args.url or "in-process",
+        "users": args.users,
+        "duration_s": round(wall_s, 2),
+        "mix": mix,
+        **recorder.report(wall_s),
+    }
+    if probe:
+        report["db"] = probe.report()
+    else:
+        report["db"] = {"lock_errors": sum(o["errors"].get("db_locked", 0) for o in report["operations"].values())}
+    if fake:
+        report["fake_llm"] = {**fake.stats(), "latency_s": args.latency, "error_rate": args.error_rate}
+    if scratch:
+        scratch.cleanup()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Offline microbenchmarks for the hot paths: PlantUML generation, reply extraction,
+ReactFlow -> PlantUML and Diagram serialization, on synthetic models of 10..10k
+elements. Emits JSON (with the git commit) so runs can be diffed across commits.
+
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --compare bench.json      # exit 1 on regressions
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks import synthetic
+from benchmarks.bench_extract import legacy_route_extract_json_block, legacy_parser_extract_json_block
+from routes.diagrams import flow_to_plantuml
+from services.flow_patch import apply_flow_patch
+from services.revisions import make_ops, apply_ops
+from utils.extract import extract_json_block, extract_plantuml_blocks, scan_reply
+from utils.plantuml import generate_plantuml, clear_fragment_cache, plantuml_line_diff
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+MIN_RUN_SECONDS = 0.02  # calibrate loops so tiny cases are not timer noise
+
+# ----------------------------
+# Timing
+# ----------------------------
+
+def measure(fn, repeat=5):
+    """Best per-call time in ms over `repeat` runs of an auto-calibrated loop."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_RUN_SECONDS or loops >= 1 << 20:
+            break
+        loops *= 2
+
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return round(best * 1000, 4), loops
+
+# ----------------------------
+# Cases
+# ----------------------------
+
+def _uncached(extract, reply):
+    # scan_reply memoizes per reply; clear it so every call pays for a full scan
+    def call():
+        scan_reply.cache_clear()
+        return extract(reply)
+    return call
+
+
+def cases(size):
+    """Yield (case, callable) for one model size."""
+    for diagram_type, make in synthetic.MODELS.items():
+        model = make(size)
+        yield f"generate_plantuml.{diagram_type}", lambda m=model, t=diagram_type: generate_plantuml(m, t)
+
+    # incremental generation: every fragment rendered (cold) vs one attribute of one class changed
+    model = synthetic.class_model(size)
+    def cold():
+        clear_fragment_cache()
+        return generate_plantuml(model, "class")
+    edited = {**model, "classes": list(model["classes"])}
+    target = size // 2
+    counter = iter(range(1 << 62))
+    def one_edit():
+        edited["classes"][target] = {**model["classes"][target], "attributes": [f"changed{next(counter)}: int"]}
+        return generate_plantuml(edited, "class")
+    previous = generate_plantuml(model, "class")
+    yield "generate_plantuml.cold", cold
+    yield "generate_plantuml.one_edit", one_edit
+    yield "plantuml_line_diff.one_edit", lambda: plantuml_line_diff(previous, one_edit())
+
+    model = synthetic.class_model(size)
+    reply = synthetic.gpt_reply(model, generate_plantuml(model, "class"))
+    yield "extract_json_block", _uncached(extract_json_block, reply)
+    yield "extract_plantuml_blocks", _uncached(extract_plantuml_blocks, reply)
+    yield "legacy_route_extract_json_block", lambda: legacy_route_extract_json_block(reply)
+    yield "legacy_parser_extract_json_block", lambda: legacy_parser_extract_json_block(reply)
+
+    nodes, edges = synthetic.flow_graph(size)
+    yield "flow_to_plantuml", lambda: flow_to_plantuml(nodes, edges)
+
+    # one save-model drag: a single node moved
+    before = json.dumps({"nodes": nodes, "edges": edges})
+    moved = [dict(n, position={**n["position"], "x": n["position"]["x"] + 10}) if i == size // 2 else n
+             for i, n in enumerate(nodes)]
+    after = json.dumps({"nodes": moved, "edges": edges})
+    ops = make_ops(before, after)
+    yield "revision_make_ops", lambda: make_ops(before, after)
+    yield "revision_apply_ops", lambda: apply_ops(before, ops)
+
+    # PATCH save-model server work for the same drag vs a label edit (load, apply, PlantUML, dump)
+    def patch_save(patch):
+        graph = json.loads(before)
+        if apply_flow_patch(graph, patch):
+            flow_to_plantuml(graph["nodes"], graph["edges"])
+        return json.dumps(graph)
+    node_id = nodes[size // 2]["id"]
+    yield "patch_save.drag", lambda: patch_save({"nodes": {"update": [{"id": node_id, "position": {"x": 1, "y": 1}}]}})
+    yield "patch_save.relabel", lambda: patch_save({"nodes": {"update": [{"id": node_id, "data": {"label": "Renamed"}}]}})
+
+    plantuml = flow_to_plantuml(nodes, edges)
+    rows = synthetic.diagram_rows(10, plantuml, {"nodes": nodes, "edges": edges})
+    yield "diagram_to_dict.x10", lambda: [r.to_dict() for r in rows]
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run(sizes, repeat=5, only=None):
+    results = []
+    for size in sizes:
+        for case, fn in cases(size):
+            if only and not any(key in case for key in only):
+                continue
+            ms, loops = measure(fn, repeat)
+            results.append({"case": case, "size": size, "best_ms": ms, "loops": loops})
+            print(f"  {case:<36} n={size:<6} {ms:>10.4f} ms", file=sys.stderr)
+
+    commit, dirty = git_commit()
+    return {
+        "suite": "uml-assistant-micro",
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+# ----------------------------
+# Regression check
+# ----------------------------
+
+def compare(report, baseline, threshold):
+    """Cases slower than baseline * threshold; returns a list of regressions."""
+    previous = {(r["case"], r["size"]): r["best_ms"] for r in baseline.get("results", [])}
+    regressions = []
+    for r in report["results"]:
+        before = previous.get((r["case"], r["size"]))
+        if before and r["best_ms"] > before * threshold:
+            regressions.append({**r, "baseline_ms": before, "ratio": round(r["best_ms"] / before, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="run cases whose name contains any of these")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat, args.only)
+    if args.compare:
+        with open(args.compare) as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if report.get("regressions"):
+        for r in report["regressions"]:
+            print(f"❌ {r['case']} n={r['size']}: {r['baseline_ms']} -> {r['best_ms']} ms ({r['ratio']}x)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
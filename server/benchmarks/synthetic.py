@@ -0,0 +1,99 @@
+"""
+Deterministic synthetic models for the benchmarks. `n` is the number of primary
+elements (classes, use cases, messages, flow nodes); links scale with it.
+"""
+import json
+import random
+from datetime import datetime, timedelta
+
+REL_TYPES = ["association", "inheritance", "composition", "aggregation",
+             "one-to-many", "many-to-one", "many-to-many", "one-to-one"]
+MSG_TYPES = ["sync", "async", "return", "create", "destroy"]
+
+
+def class_model(n, seed=1):
+    rng = random.Random(seed)
+    classes = [{
+        "name": f"Class{i}",
+        "attributes": [f"field{j}: string" for j in range(3)],
+        "methods": [f"action{j}()" for j in range(2)],
+    } for i in range(n)]
+    relationships = [{
+        "from": f"Class{i}",
+        "to": f"Class{rng.randrange(n)}",
+        "type": REL_TYPES[i % len(REL_TYPES)],
+        "label": f"rel{i}" if i % 2 else "",
+    } for i in range(n)]
+    return {"classes": classes, "relationships": relationships}
+
+
+def usecase_model(n, seed=1):
+    rng = random.Random(seed)
+    actors = [f"Actor{i}" for i in range(n // 5 + 1)]
+    use_cases = [f"Use case {i}" for i in range(n)]
+    return {
+        "actors": actors,
+        "use_cases": use_cases,
+        "associations": [{"actor": rng.choice(actors), "use_case": uc} for uc in use_cases],
+        "includes": [{"from": use_cases[i], "to": use_cases[rng.randrange(n)]} for i in range(0, n, 4)],
+        "extends": [{"from": use_cases[i], "to": use_cases[rng.randrange(n)]} for i in range(1, n, 4)],
+    }
+
+
+def sequence_model(n, seed=1):
+    rng = random.Random(seed)
+    participants = ["User", "Database"] + [f"Service{i}" for i in range(n // 10 + 1)]
+    messages = [{
+        "from": rng.choice(participants),
+        "to": rng.choice(participants),
+        "message": f"call{i}()",
+        "type": MSG_TYPES[i % len(MSG_TYPES)],
+    } for i in range(n)]
+    activations = [{"participant": p, "deactivate": True} for p in participants[::2]]
+    return {"participants": participants, "messages": messages, "activations": activations}
+
+
+MODELS = {"class": class_model, "usecase": usecase_model, "sequence": sequence_model}
+
+
+def flow_graph(n, seed=1):
+    """ReactFlow nodes/edges as the client posts them to save-model."""
+    rng = random.Random(seed)
+    nodes = [{
+        "id": f"n{i}",
+        "position": {"x": (i % 20) * 180, "y": (i // 20) * 140},
+        "data": {"label": f"Class{i}", "attributes": [f"field{j}: string" for j in range(3)]},
+    } for i in range(n)]
+    edges = [{
+        "id": f"e{i}",
+        "source": f"Class{i}",
+        "target": f"Class{rng.randrange(n)}",
+        "data": {"label": f"rel{i}" if i % 2 else ""},
+    } for i in range(n)]
+    return nodes, edges
+
+
+def gpt_reply(model, plantuml, prose_words=200, seed=1):
+    """A chatty reply: prose, a fenced PlantUML block, a fenced JSON model, more prose."""
+    rng = random.Random(seed)
+    words = "the system lets a {member} borrow books and each item has an \"id\" field, which".split()
+    prose = " ".join(rng.choice(words) for _ in range(prose_words))
+    return (f"Sure! {prose}\n```plantuml\n{plantuml}\n```\n"
+            f"```json\n{json.dumps(model, indent=2)}\n```\n{prose}")
+
+
+def diagram_rows(n, plantuml, flow_data):
+    """Detached Diagram instances (no session needed) for serialization benchmarks."""
+    from models import Diagram
+
+    base = datetime(2024, 1, 1)
+    encoded = json.dumps(flow_data)
+    return [Diagram(
+        id=f"00000000-0000-0000-0000-{i:012d}",
+        name=f"Diagram {i}",
+        diagram_type="class",
+        plantuml_code=plantuml,
+        flow_data=encoded,
+        created_at=base + timedelta(seconds=i),
+        updated_at=base + timedelta(seconds=i),
+    ) for i in range(n)]
@@ -1,3 +1,130 @@
+import os
+import zlib
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, types
 
 db = SQLAlchemy()
+
+# ----------------------------
+# Config
+# ----------------------------
+
+DEFAULT_DATABASE_URL = "sqlite:///diagrams.db"
+
+# SQLite: WAL lets readers run alongside the single writer; writers wait on the
+# busy timeout instead of failing with "database is locked"
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # durable in WAL mode, fewer fsyncs than FULL
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+
+# Large text columns (CompressedText): values from this size up are stored zlib-compressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "512"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+
+# Per-process pool (each gunicorn worker has its own)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# ----------------------------
+# Engine setup
+# ----------------------------
+
+def database_url(url=None) -> str:
+    """DATABASE_URL (SQLite by default); Heroku-style postgres:// URLs are accepted."""
+    url = url or os.getenv("DATABASE_URL") or DEFAULT_DATABASE_URL
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+def is_sqlite(url) -> bool:
+    return url.startswith("sqlite")
+
+def engine_options(url) -> dict:
+    """create_engine() keyword arguments for the given URL."""
+    if is_sqlite(url):
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            return {}  # single shared in-memory connection; nothing to pool
+        return {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            # pooled connections move between request threads; the pool serializes their use
+            "connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000, "check_same_thread": False},
+        }
+    # Postgres (psycopg2): drop dead connections after failover/idle timeouts
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def tune_engine(engine):
+    """Apply the SQLite PRAGMAs to every new connection of `engine` (no-op for other backends)."""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas)
+    return engine
+
+def configure(app):
+    """Point Flask-SQLAlchemy at DATABASE_URL with the matching engine options."""
+    url = database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        tune_engine(db.engine)  # the pool connects lazily, so no connection predates this
+
+# ----------------------------
+# Compressed text columns
+# ----------------------------
+
+# First byte of a stored value: the format, so it can change without a rewrite
+FORMAT_RAW = b"\x00"   # UTF-8 as is (below COMPRESS_MIN_BYTES, or incompressible)
+FORMAT_ZLIB = b"\x01"  # zlib over UTF-8
+
+def compress_text(value: str) -> bytes:
+    raw = value.encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, COMPRESS_LEVEL)
+        if len(packed) < len(raw):
+            return FORMAT_ZLIB + packed
+    return FORMAT_RAW + raw
+
+def decompress_text(stored) -> str:
+    if isinstance(stored, str):
+        return stored  # legacy TEXT row not yet migrated
+    stored = bytes(stored)
+    fmt, body = stored[:1], stored[1:]
+    if fmt == FORMAT_ZLIB:
+        return zlib.decompress(body).decode("utf-8")
+    if fmt == FORMAT_RAW:
+        return body.decode("utf-8")
+    raise ValueError(f"Unknown compressed text format {fmt!r}")
+
+class CompressedText(types.TypeDecorator):
+    """
+    A str column stored as a BLOB with a leading format byte; large values are
+    zlib-compressed. Reads also accept plain TEXT from before the migration.
+    """
+    impl = types.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decompress_text(value)
@@ -0,0 +1,103 @@
+import json
+from sqlalchemy import inspect, text, or_, update
+from db import db, COMPRESS_MIN_BYTES
+from models import Diagram, ConversationSession, ConversationMessage
+from services import search
+
+# db.create_all() only creates missing tables; these steps upgrade databases
+# created by older versions in place. Every step must be idempotent.
+
+def _ensure_indexes():
+    """Create indexes declared on models that pre-existing tables are missing."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+def _migrate_conversation_blobs():
+    """Move legacy ConversationSession.messages JSON blobs into conversation_messages rows."""
+    sessions = ConversationSession.query.filter(
+        ConversationSession.messages.isnot(None),
+        ConversationSession.messages != ""
+    ).all()
+    if not sessions:
+        return
+
+    moved = 0
+    for session in sessions:
+        try:
+            history = json.loads(session.messages or "[]")
+        except ValueError:
+            history = []
+        seq = 0
+        for message in history:
+            # system prompts are rebuilt per request, never replayed from history
+            if not isinstance(message, dict) or message.get("role") == "system":
+                continue
+            seq += 1
+            db.session.add(ConversationMessage(
+                session_id=session.id,
+                seq=seq,
+                role=message.get("role", "user"),
+                content=message.get("content") or "",
+                created_at=session.updated_at or session.created_at
+            ))
+            moved += 1
+        session.messages = None
+    db.session.commit()
+    print(f"🗄️ Migrated {len(sessions)} conversation blobs ({moved} messages)")
+
+def _ensure_search_index():
+    """Create the FTS5 index and fill it for diagrams saved before it existed."""
+    if search.ensure_index(db.engine):
+        indexed = search.backfill()
+        if indexed:
+            print(f"🔎 Indexed {indexed} diagrams for search")
+
+def _compress_diagram_content(batch_size=500):
+    """Rewrite plantuml_code/flow_data stored as plain TEXT into the CompressedText format."""
+    table = Diagram.__table__
+    content = (table.c.plantuml_code, table.c.flow_data)
+    if db.engine.dialect.name == "sqlite":
+        # dynamic typing: the column already takes BLOBs, legacy rows are still TEXT
+        stale = or_(*(db.func.typeof(c) == "text" for c in content))
+    else:
+        columns = {c["name"]: c["type"] for c in inspect(db.engine).get_columns("diagrams")}
+        if isinstance(columns["plantuml_code"], db.Text) or isinstance(columns["flow_data"], db.Text):
+            # Postgres: TEXT -> BYTEA, prefixed with the raw-format byte so every row stays readable
+            with db.engine.begin() as conn:
+                for name in ("plantuml_code", "flow_data"):
+                    conn.execute(text(
+                        f"ALTER TABLE diagrams ALTER COLUMN {name} TYPE BYTEA "
+                        f"USING decode('00', 'hex') || convert_to({name}, 'UTF8')"
+                    ))
+        # raw rows large enough to be worth compressing
+        stale = or_(*((db.func.octet_length(c) > COMPRESS_MIN_BYTES) & (db.func.get_byte(c, 0) == 0)
+                      for c in content))
+
+    rewritten = 0
+    last = ""
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, *content)
+            .where(stale, table.c.id > last)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            # Core UPDATE: re-encoded by the column type, no revision or search-index events
+            db.session.execute(update(table).where(table.c.id == row.id).values(
+                plantuml_code=row.plantuml_code, flow_data=row.flow_data,
+                updated_at=table.c.updated_at))  # not an edit: keep the onupdate default off
+        db.session.commit()
+        rewritten += len(rows)
+        last = rows[-1].id
+    if rewritten:
+        print(f"🗜️ Compressed content of {rewritten} diagrams")
+
+def run_migrations():
+    _ensure_indexes()
+    _migrate_conversation_blobs()
+    _compress_diagram_content()
+    _ensure_search_index()
@@ -1,5 +1,6 @@
-from db import db
+from db import db, CompressedText
 from datetime import datetime
+from sqlalchemy.orm import deferred, undefer_group
 import json
 
 class Diagram(db.Model):
@@ -8,11 +9,36 @@ class Diagram(db.Model):
     id = db.Column(db.String, primary_key=True)
     name = db.Column(db.String, nullable=False)
     diagram_type = db.Column(db.String, nullable=False)
-    plantuml_code = db.Column(db.Text, nullable=False)
-    flow_data = db.Column(db.Text, nullable=True)   # stored as JSON string
+    # Stored compressed; loaded (and decompressed) on first access, together
+    plantuml_code = deferred(db.Column(CompressedText, nullable=False), group="content")
+    flow_data = deferred(db.Column(CompressedText, nullable=True), group="content")   # JSON string
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # keyset pagination for the sidebar listing (newest first, optional type filter)
+        db.Index('ix_diagrams_created_at_id', 'created_at', 'id'),
+        db.Index('ix_diagrams_type_created_at_id', 'diagram_type', 'created_at', 'id'),
+    )
+
+    # Columns of the listing projection; never touches plantuml_code/flow_data
+    SUMMARY_COLUMNS = ('id', 'name', 'diagram_type', 'created_at', 'updated_at')
+
+    @classmethod
+    def get_with_content(cls, diagram_id):
+        """Diagram with plantuml_code/flow_data loaded in the same query (for to_dict)."""
+        return cls.query.options(undefer_group("content")).get(diagram_id)
+
+    @staticmethod
+    def summary_dict(row):
+        return {
+            "id": row.id,
+            "name": row.name,
+            "diagram_type": row.diagram_type,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None
+        }
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -29,16 +55,176 @@ class ConversationSession(db.Model):
     __tablename__ = 'conversation_sessions'
     
     id = db.Column(db.String, primary_key=True)
-    diagram_id = db.Column(db.String, db.ForeignKey('diagrams.id'))
-    messages = db.Column(db.Text)  # Store as JSON string
+    diagram_id = db.Column(db.String, db.ForeignKey('diagrams.id'), index=True)
+    messages = db.Column(db.Text)  # legacy JSON blob; migrated into conversation_messages
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
+
+    message_rows = db.relationship(
+        'ConversationMessage',
+        lazy='dynamic',
+        cascade='all, delete-orphan',
+        order_by='ConversationMessage.seq'
+    )
+
+    def append_message(self, role, content):
+        """
+        Append one turn: a single small INSERT, never a rewrite of the history.
+        The session row is touched first, which takes its write lock (SQLite's
+        database lock) until commit: concurrent turns on one session queue up
+        here, so each reads a current max(seq) instead of colliding on the index.
+        """
+        db.session.query(ConversationSession).filter_by(id=self.id).update(
+            {"updated_at": datetime.utcnow()}, synchronize_session=False
+        )
+        last_seq = db.session.query(db.func.max(ConversationMessage.seq)).filter(
+            ConversationMessage.session_id == self.id
+        ).scalar()
+        message = ConversationMessage(
+            session_id=self.id,
+            seq=(last_seq or 0) + 1,
+            role=role,
+            content=content
+        )
+        db.session.add(message)
+        return message
+
+    def recent_messages(self, limit=None):
+        """Oldest-first list of the last `limit` turns (all turns if limit is None)."""
+        query = ConversationMessage.query.filter_by(session_id=self.id)
+        if limit is None:
+            rows = query.order_by(ConversationMessage.seq.asc()).all()
+        else:
+            rows = query.order_by(ConversationMessage.seq.desc()).limit(limit).all()
+            rows.reverse()
+        return [r.to_message() for r in rows]
+
     def to_dict(self):
         return {
             "id": self.id,
             "diagram_id": self.diagram_id,
-            "messages": json.loads(self.messages) if self.messages else [],
+            "messages": self.recent_messages(),
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+class ConversationMessage(db.Model):
+    __tablename__ = 'conversation_messages'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    session_id = db.Column(db.String, db.ForeignKey('conversation_sessions.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # position within the session
+    role = db.Column(db.String, nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_conversation_messages_session_seq', 'session_id', 'seq', unique=True),
+    )
+
+    def to_message(self):
+        return {"role": self.role, "content": self.content}
+
+
+class LLMCacheEntry(db.Model):
+    __tablename__ = 'llm_cache'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of the request
+    kind = db.Column(db.String, nullable=False)        # "generate" | "parse"
+    diagram_type = db.Column(db.String)
+    value = db.Column(db.Text, nullable=False)         # raw LLM reply
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class InflightCall(db.Model):
+    """Cross-process single-flight lock: one row per call in progress, plus finished results kept briefly for its followers."""
+    __tablename__ = 'inflight_calls'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of the coalesced request (or of request + leader, for a result)
+    owner = db.Column(db.String, nullable=False)      # host:pid:nonce of the leader
+    result = db.Column(db.Text)                       # JSON, on the result row of a finished call
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class DiagramRevision(db.Model):
+    __tablename__ = 'diagram_revisions'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    diagram_id = db.Column(db.String, db.ForeignKey('diagrams.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)       # 1, 2, ... per diagram
+    kind = db.Column(db.String, nullable=False)       # "snapshot" | "delta"
+    chain = db.Column(db.Integer, nullable=False, default=0)  # deltas since the last snapshot
+    payload = db.Column(db.LargeBinary, nullable=False)       # zlib-compressed JSON
+    checksum = db.Column(db.Integer, nullable=False)  # crc32 of the full state after this revision
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_diagram_revisions_diagram_seq', 'diagram_id', 'seq', unique=True),
+    )
+
+    @staticmethod
+    def summary_dict(row):
+        """Listing row: (seq, kind, size, created_at); size is the stored payload in bytes."""
+        return {
+            "seq": row.seq,
+            "kind": row.kind,
+            "size": row.size,
+            "created_at": row.created_at.isoformat() if row.created_at else None
+        }
+
+
+class GenerationJob(db.Model):
+    __tablename__ = 'generation_jobs'
+
+    id = db.Column(db.String, primary_key=True)
+    kind = db.Column(db.String, nullable=False, default="generate")
+    status = db.Column(db.String, nullable=False, default="queued")  # queued | running | done | error
+    key = db.Column(db.String(64), index=True)        # identical active submissions share a job
+    session_id = db.Column(db.String)
+    params = db.Column(db.Text, nullable=False)       # JSON request
+    result = db.Column(db.Text)                       # JSON response, when done
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    owner = db.Column(db.String)                      # host:pid of the worker running it
+    lease_until = db.Column(db.DateTime)              # renewed while running; expired = worker crashed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_generation_jobs_status_created', 'status', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class DescriptionExample(db.Model):
+    """A past description and the model generated for it, for services.similar."""
+    __tablename__ = 'description_examples'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)  # the index syncs rows above the last id it saw
+    diagram_type = db.Column(db.String, nullable=False)
+    text_hash = db.Column(db.String(64), nullable=False)  # sha256 of the normalized description
+    description = db.Column(db.Text, nullable=False)
+    model = db.Column(CompressedText, nullable=False)     # JSON
+    signature = db.Column(db.LargeBinary, nullable=False)  # MinHash, array('I') bytes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_description_examples_type_hash', 'diagram_type', 'text_hash'),
+    )
@@ -1,12 +1,21 @@
 import uuid
 import json
+import base64
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 from db import db
 from models import Diagram
+from services import metrics, search, revisions
+from services.flow_patch import flow_to_plantuml, apply_flow_patch
+from services.model_patch import PatchError
 
 diagrams_bp = Blueprint('diagrams', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 # Create new diagram
 @diagrams_bp.route('/diagrams', methods=['POST'])
 def create_diagram():
@@ -26,23 +35,27 @@ def create_diagram():
         plantuml_code=plantuml_code,
         flow_data=json.dumps(flow_data) if flow_data else None
     )
-    db.session.add(diagram)
-    db.session.commit()
+    with metrics.stage("commit"):
+        db.session.add(diagram)
+        db.session.commit()
 
-    return jsonify(diagram.to_dict()), 201
+    with metrics.stage("serialize"):
+        return jsonify(diagram.to_dict()), 201
 
 # Get diagram
 @diagrams_bp.route('/diagrams/<string:diagram_id>', methods=['GET'])
 def get_diagram(diagram_id):
-    diagram = Diagram.query.get(diagram_id)
+    with metrics.stage("load"):
+        diagram = Diagram.get_with_content(diagram_id)
     if not diagram:
         return jsonify({"error": "Diagram not found"}), 404
-    return jsonify(diagram.to_dict()), 200
+    with metrics.stage("serialize"):
+        return jsonify({**diagram.to_dict(), "revision": revisions.latest_seq(diagram_id)}), 200
 
 # Update diagram
 @diagrams_bp.route('/diagrams/<string:diagram_id>', methods=['PUT'])
 def update_diagram(diagram_id):
-    diagram = Diagram.query.get(diagram_id)
+    diagram = Diagram.get_with_content(diagram_id)
     if not diagram:
         return jsonify({"error": "Diagram not found"}), 404
 
@@ -53,8 +66,10 @@ def update_diagram(diagram_id):
     if "flow_data" in data:
         diagram.flow_data = json.dumps(data["flow_data"]) if data["flow_data"] else None
 
-    db.session.commit()
-    return jsonify(diagram.to_dict()), 200
+    with metrics.stage("commit"):
+        db.session.commit()
+    with metrics.stage("serialize"):
+        return jsonify({**diagram.to_dict(), "revision": revisions.latest_seq(diagram_id)}), 200
 
 # Delete diagram
 @diagrams_bp.route('/diagrams/<string:diagram_id>', methods=['DELETE'])
@@ -67,11 +82,87 @@ def delete_diagram(diagram_id):
     db.session.commit()
     return jsonify({"message": "Diagram deleted"}), 200
 
-# List all diagrams (newest first)
+def _encode_cursor(row):
+    raw = json.dumps([row.created_at.isoformat(), row.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor):
+    created_at, diagram_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return datetime.fromisoformat(created_at), diagram_id
+
+# List diagrams (newest first), keyset-paginated summaries
 @diagrams_bp.route('/diagrams', methods=['GET'])
 def list_diagrams():
-    diagrams = Diagram.query.order_by(Diagram.created_at.desc()).all()
-    return jsonify([d.to_dict() for d in diagrams]), 200
+    """
+    Query params: limit (default 50, max 200), cursor (from X-Next-Cursor), type.
+    Returns summaries only; full content comes from GET /diagrams/<id>.
+    """
+    try:
+        limit = max(1, min(int(request.args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    columns = [getattr(Diagram, c) for c in Diagram.SUMMARY_COLUMNS]
+    query = db.session.query(*columns)
+
+    diagram_type = request.args.get("type")
+    if diagram_type:
+        query = query.filter(Diagram.diagram_type == diagram_type)
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            created_at, last_id = _decode_cursor(cursor)
+        except Exception:
+            return jsonify({"error": "Invalid cursor"}), 400
+        query = query.filter(tuple_(Diagram.created_at, Diagram.id) < (created_at, last_id))
+
+    with metrics.stage("query"):
+        rows = query.order_by(Diagram.created_at.desc(), Diagram.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+
+    with metrics.stage("serialize"):
+        resp = make_response(jsonify([Diagram.summary_dict(r) for r in page]), 200)
+    if len(rows) > limit and page[-1].created_at:
+        resp.headers["X-Next-Cursor"] = _encode_cursor(page[-1])
+    return resp
+
+# Full-text search over names and diagram identifiers, best match first
+@diagrams_bp.route('/diagrams/search', methods=['GET'])
+def search_diagrams():
+    """
+    Query params: q (required), limit (default 50, max 200), cursor (from X-Next-Cursor), type.
+    Returns the same summaries as the listing, name matches before content
+    matches (`match`: "name" | "content"), best bm25 score first within each.
+    Without FTS5 (e.g. on Postgres) only names are searched, newest first.
+    """
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "Missing q"}), 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    offset = 0
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            offset = max(0, int(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["offset"]))
+        except Exception:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    with metrics.stage("search"):
+        rows = search.search(query, limit + 1, offset, request.args.get("type"))
+    page = rows[:limit]
+
+    resp = make_response(jsonify([
+        {**Diagram.summary_dict(r), "match": "name" if r.tier == 0 else "content"} for r in page
+    ]), 200)
+    if len(rows) > limit:
+        raw = json.dumps({"offset": offset + limit})
+        resp.headers["X-Next-Cursor"] = base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+    return resp
 
 # Save ReactFlow model
 @diagrams_bp.route('/diagrams/<string:diagram_id>/save-model', methods=['POST'])
@@ -84,30 +175,64 @@ def save_model(diagram_id):
     nodes = data.get("nodes", [])
     edges = data.get("edges", [])
 
-    def flow_to_plantuml(nodes, edges):
-        plantuml = "@startuml\n"
-        for node in nodes:
-            label = node.get("data", {}).get("label", node["id"])
-            plantuml += f"class {label} {{\n"
-            for attr in node.get("data", {}).get("attributes", []):
-                plantuml += f"  +{attr}\n"
-            plantuml += "}\n\n"
-        for edge in edges:
-            label = edge.get("data", {}).get("label", "")
-            plantuml += f"{edge['source']} --> {edge['target']}"
-            if label:
-                plantuml += f" : {label}"
-            plantuml += "\n"
-        plantuml += "@enduml"
-        return plantuml
-
-    plantuml_code = flow_to_plantuml(nodes, edges)
+    with metrics.stage("flow_to_plantuml"):
+        plantuml_code = flow_to_plantuml(nodes, edges)
 
     diagram.plantuml_code = plantuml_code
     diagram.flow_data = json.dumps({"nodes": nodes, "edges": edges})
-    db.session.commit()
+    with metrics.stage("commit"):
+        db.session.commit()
+
+    with metrics.stage("serialize"):
+        return jsonify({
+            "message": "Model saved successfully",
+            "diagram": diagram.to_dict(),
+            "revision": revisions.latest_seq(diagram_id)
+        }), 200
+
+# Apply node/edge deltas to the saved ReactFlow model (editor autosave)
+@diagrams_bp.route('/diagrams/<string:diagram_id>/save-model', methods=['PATCH'])
+def patch_model(diagram_id):
+    """
+    Body: {"base_revision": n, "nodes": {"add", "update", "delete"}, "edges": {...}}
+    (see services.flow_patch). base_revision is the "revision" from the last
+    GET/save; if the diagram moved on since, nothing is applied and 409 returns
+    the current revision so the client can reload. Replies with the new
+    revision only, never the whole diagram.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or "base_revision" not in data:
+        return jsonify({"error": "Missing base_revision"}), 400
+
+    diagram = Diagram.get_with_content(diagram_id)
+    if not diagram:
+        return jsonify({"error": "Diagram not found"}), 404
+    current = revisions.latest_seq(diagram_id)
+    if data["base_revision"] != current:
+        return jsonify({"error": "Revision conflict", "revision": current}), 409
+
+    with metrics.stage("apply_patch"):
+        graph = json.loads(diagram.flow_data) if diagram.flow_data else {"nodes": [], "edges": []}
+        try:
+            plantuml_changed = apply_flow_patch(graph, data)
+        except PatchError as e:
+            return jsonify({"error": str(e)}), 400
+
+    if plantuml_changed:
+        with metrics.stage("flow_to_plantuml"):
+            diagram.plantuml_code = flow_to_plantuml(graph["nodes"], graph["edges"])
+    diagram.flow_data = json.dumps(graph)
+    revisions.expect_base(diagram, current)  # re-checked inside the write
+    try:
+        with metrics.stage("commit"):
+            db.session.commit()
+    except (revisions.RevisionConflict, IntegrityError):
+        # another save landed between the check above and this commit
+        db.session.rollback()
+        return jsonify({"error": "Revision conflict", "revision": revisions.latest_seq(diagram_id)}), 409
 
     return jsonify({
-        "message": "Model saved successfully",
-        "diagram": diagram.to_dict()
+        "message": "Model patched",
+        "revision": revisions.latest_seq(diagram_id),
+        "plantuml_changed": plantuml_changed
     }), 200
@@ -1,19 +1,30 @@
-from flask import Blueprint, request, jsonify, make_response
-from openai import OpenAI
-import uuid
+from flask import Blueprint, Response, request, jsonify, make_response, stream_with_context, copy_current_request_context
 import os
-import re
+import uuid
 import json
+import queue
+import threading
 from services.parser import parse_text_to_model
-from utils.plantuml import generate_plantuml
+from services import extractor, llm_cache, metrics, similar, singleflight
+from services.llm_gateway import get_gateway, completion_text
+from services.context import build_context
+from services.model_patch import apply_ops, PatchError
+from utils.plantuml import generate_plantuml, plantuml_line_diff
+from utils.plantuml_parser import parse_plantuml
+from utils.extract import StreamExtractor, extract_plantuml_blocks, extract_json_block
 from models import Diagram, ConversationSession
 from db import db
-from dotenv import load_dotenv
-
-load_dotenv()
 
 generate_bp = Blueprint('generate', __name__)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+GPT_MODEL = "gpt-4"
+GPT_TEMPERATURE = 0.2
+CONTEXT_MAX_MESSAGES = int(os.getenv("CONTEXT_MAX_MESSAGES", "40"))  # rows read; the token budget trims further
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+# Result sources whose models the similarity index learns from: the LLM's own
+# diagram or JSON. Not fallbacks, text heuristics, patches, local answers or reuses.
+LEARN_FROM_SOURCES = ("plantuml", "json")
 
 # ----------------------------
 # Helpers
@@ -53,223 +64,326 @@ def _system_for_type(diagram_type: str, existing_content: str | None) -> str:
         )
     return base
 
-def extract_plantuml_blocks(text: str) -> str:
-    """Extract valid PlantUML (@startuml ... @enduml)."""
-    match = re.findall(r'@startuml[\s\S]*?@enduml', text)
-    if match:
-        return "\n".join(match)
-    return ""
-
-def extract_json_block(text: str):
-    """Extract JSON object from GPT output (fenced, inline, etc.)."""
-    # ```json ... ```
-    match = re.search(r'```json\s*([\s\S]*?)\s*```', text)
-    if match:
-        candidate = match.group(1).strip()
-        try:
-            json.loads(candidate)
-            return candidate
-        except:
-            pass
-    # ``` ... ```
-    match = re.search(r'```\s*([\s\S]*?)\s*```', text)
-    if match:
-        candidate = match.group(1).strip()
-        try:
-            json.loads(candidate)
-            return candidate
-        except:
-            pass
-    # Largest {...}
-    match = re.search(r'(\{[\s\S]*\})', text)
-    if match:
-        candidate = match.group(1).strip()
-        candidate = re.sub(r',\s*([\]}])', r'\1', candidate)  # fix trailing commas
-        try:
-            json.loads(candidate)
-            return candidate
-        except:
-            pass
-    return None
-
-# ----------------------------
-# Route
-# ----------------------------
-
-@generate_bp.route('/generate', methods=['POST'])
-def generate():
-    data = request.get_json() or {}
-    text = data.get("text", "").strip()
-    diagram_type = (data.get("type", "class") or "class").strip().lower()
-    diagram_id = data.get("diagram_id")
-
-    print("📥 Received text:", text)
-    print("📘 Diagram type:", diagram_type)
-    print("📊 Diagram ID:", diagram_id)
+def _plantuml_matches_type(plantuml_code: str, diagram_type: str) -> bool:
+    """🛡️ Type-guard so PlantUML of the wrong type falls back to JSON or parser."""
+    if diagram_type == "sequence":
+        return "participant" in plantuml_code or "actor" in plantuml_code
+    if diagram_type == "usecase":
+        return "usecase" in plantuml_code or "actor" in plantuml_code
+    if diagram_type == "class":
+        return "class" in plantuml_code
+    return True
 
-    session_id = get_session_id(request)
+def _fallback_plantuml(diagram_type: str) -> str:
+    if diagram_type == "usecase":
+        return """@startuml
+actor User
+usecase "Login" as UC1
+User --> UC1
+@enduml"""
+    elif diagram_type == "sequence":
+        return """@startuml
+participant User
+participant System
+User -> System: Login request
+System --> User: Success
+@enduml"""
+    return """@startuml
+class User {
+  +id
+  +name
+  +email
+}
+@enduml"""
 
-    # Load/create conversation container
+def _load_conversation(session_id, diagram_id):
+    """Load/create the conversation container and its recent history for this session."""
     session = ConversationSession.query.get(session_id)
     if session:
-        conversation = json.loads(session.messages or "[]")
+        conversation = session.recent_messages(CONTEXT_MAX_MESSAGES)
     else:
         conversation = []
         session = ConversationSession(
             id=session_id,
-            diagram_id=diagram_id,
-            messages=json.dumps(conversation)
+            diagram_id=diagram_id
         )
         db.session.add(session)
+    return session, conversation
 
-    # If a diagram_id arrives, load its current content for EDIT MODE context
-    existing_content = None
+def _existing_content(diagram_id):
+    """If a diagram_id arrives, load its current content for EDIT MODE context."""
     if diagram_id:
-        diagram = Diagram.query.get(diagram_id)
+        diagram = Diagram.get_with_content(diagram_id)
         if diagram:
-            existing_content = diagram.plantuml_code
+            return diagram.plantuml_code
+    return None
 
+def _prepare_conversation(conversation, diagram_type, existing_content, text):
+    """Budgeted prompt for this request; returns (messages, context stats)."""
     # 🔧 CRITICAL FIX:
-    # Always replace ANY existing system messages with the correct, fresh one for THIS request type.
-    conversation = [m for m in conversation if m.get("role") != "system"]
-    conversation.insert(0, {"role": "system", "content": _system_for_type(diagram_type, existing_content)})
+    # Always use a fresh system message for THIS request type (history never carries one).
+    messages, stats = build_context(
+        _system_for_type(diagram_type, existing_content),
+        conversation,
+        text,
+        model=GPT_MODEL,
+        current_diagram_in_system=bool(existing_content)
+    )
+    print(f"🧮 Context: {stats['tokens']} tokens ({stats['saved']} saved, {stats['dropped_messages']} messages dropped)")
+    return messages, stats
+
+def _build_result(reply, text, diagram_type, existing_content=None):
+    """Turn a GPT reply into (plantuml_code, model, explanation, source) with fallbacks."""
+    with metrics.stage("extract"):
+        plantuml_code = extract_plantuml_blocks(reply)
+        json_block = extract_json_block(reply)
 
-    # Append user message
-    conversation.append({"role": "user", "content": text})
+    if plantuml_code and not _plantuml_matches_type(plantuml_code, diagram_type):
+        print(f"⚠️ Discarding wrong diagram type (not {diagram_type})")
+        plantuml_code = ""
 
-    # Quick validation
-    if len(text.split()) < 3:
-        resp = make_response(jsonify({
-            "plantuml": "",
-            "model": {},
-            "explanation": "❗ Please describe a system.",
-            "diagram_id": diagram_id
-        }), 200)
-        resp.set_cookie("session_id", session_id, httponly=True, samesite='Lax')
-        return resp
+    explanation = reply.strip()
+    model = None
+    source = "plantuml"
 
-    try:
-        # Call GPT
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=conversation,
-            temperature=0.2
-        )
-        reply = response.choices[0].message.content
-        print("🤖 GPT reply:", reply)
-
-        plantuml_code = extract_plantuml_blocks(reply)
-        json_block = extract_json_block(reply)
+    # 1) If we have valid PlantUML of the right type, we're done (model is parsed locally)
+    if plantuml_code:
+        with metrics.stage("parse_plantuml"):
+            model = parse_plantuml(plantuml_code, diagram_type)
 
-        # 🛡️ Type-guard. If PlantUML of wrong type, discard so we fallback to JSON or parser.
-        if plantuml_code:
-            if diagram_type == "sequence" and ("participant" not in plantuml_code and "actor" not in plantuml_code):
-                print("⚠️ Discarding wrong diagram type (not sequence)")
-                plantuml_code = ""
-            elif diagram_type == "usecase" and ("usecase" not in plantuml_code and "actor" not in plantuml_code):
-                print("⚠️ Discarding wrong diagram type (not use case)")
-                plantuml_code = ""
-            elif diagram_type == "class" and "class" not in plantuml_code:
-                print("⚠️ Discarding wrong diagram type (not class)")
-                plantuml_code = ""
-
-        explanation = reply.strip()
-        model = None
-
-        # 1) If we have valid PlantUML of the right type, we're done (optional: also produce model)
-        if plantuml_code:
-            model = parse_text_to_model(text, diagram_type)
-
-        # 2) If we got JSON, convert to PlantUML (forced to the requested type)
-        if not plantuml_code and json_block:
-            print("✅ Extracted JSON block:\n", json_block)
-            try:
-                model = json.loads(json_block)
+    # 2) If we got JSON, convert to PlantUML (forced to the requested type)
+    if not plantuml_code and json_block:
+        print("✅ Extracted JSON block:\n", json_block)
+        try:
+            model = json.loads(json_block)
+            source = "json"
+            if isinstance(model, dict) and "ops" in model:
+                # delta reply: patch the current diagram's model locally
+                source = "ops"
+                if not existing_content:
+                    raise PatchError("edit operations, but there is no diagram to apply them to")
+                with metrics.stage("apply_ops"):
+                    model = apply_ops(parse_plantuml(existing_content, diagram_type), model["ops"], diagram_type)
+            with metrics.stage("generate_plantuml"):
                 plantuml_code = generate_plantuml(model, diagram_type)
-                explanation += "\n\n✅ Generated PlantUML from JSON model."
-            except Exception as e:
-                print("❌ JSON parse error:", e)
-
-        # 3) If still nothing, parse text → model → PlantUML
-        if not plantuml_code:
+            explanation += "\n\n✅ Generated PlantUML from JSON model."
+        except PatchError as e:
+            print("❌ Edit operations rejected:", e)
+            model = None  # never the raw {"ops": ...} object; step 3 starts from the current diagram
+        except Exception as e:
+            print("❌ JSON parse error:", e)
+            model = None
+
+    # 3) If still nothing, parse text → model → PlantUML
+    #    (editing an existing diagram: its model is parsed locally and patched)
+    if not plantuml_code:
+        source = "parsed_text"
+        if not model and existing_content:
+            with metrics.stage("parse_plantuml"):
+                model = parse_plantuml(existing_content, diagram_type)
+        with metrics.stage("parse_text"):
             model = parse_text_to_model(text, diagram_type, existing_model=model)
-            if model:
+        if model:
+            with metrics.stage("generate_plantuml"):
                 plantuml_code = generate_plantuml(model, diagram_type)
-                explanation += "\n\n✅ Generated PlantUML from parsed text model."
+            explanation += "\n\n✅ Generated PlantUML from parsed text model."
+
+    # 4) Final fallback specific to requested type
+    if not plantuml_code:
+        source = "fallback"
+        explanation += "\n\n⚠️ No UML code detected. Showing fallback example."
+        plantuml_code = _fallback_plantuml(diagram_type)
+
+    metrics.record_source(diagram_type, source)
+    return plantuml_code.strip(), model, explanation.strip(), source
+
+def _local_result(text, diagram_type, existing_content=None):
+    """
+    (plantuml_code, model, explanation) for a new diagram without an LLM call:
+    the stored model of a near-identical earlier description, else the
+    rule-based extractor when it is confident. None sends the request to GPT.
+    Edits always go to GPT: neither can tell what to change.
+    """
+    if existing_content:
+        metrics.record_route(diagram_type, "llm")
+        return None
+    with metrics.stage("similar"):
+        match = similar.reusable(text, diagram_type)
+    if match is not None:
+        with metrics.stage("generate_plantuml"):
+            plantuml_code = generate_plantuml(match.model, diagram_type)
+        metrics.record_route(diagram_type, "reuse")
+        metrics.record_source(diagram_type, "similar")
+        print(f"♻️ Reusing the model of a similar description ({match.score})")
+        return plantuml_code.strip(), match.model, (
+            f"♻️ Started from the diagram of a very similar description ({match.score:.0%} alike): "
+            f"\"{match.description}\"")
+    if not extractor.LOCAL_FIRST:
+        metrics.record_route(diagram_type, "llm")
+        return None
+    with metrics.stage("local_extract"):
+        model, confidence = extractor.extract(text, diagram_type)
+    if confidence < extractor.LOCAL_MIN_CONFIDENCE:
+        metrics.record_route(diagram_type, "llm")
+        return None
+    with metrics.stage("generate_plantuml"):
+        plantuml_code = generate_plantuml(model, diagram_type)
+    metrics.record_route(diagram_type, "local")
+    metrics.record_source(diagram_type, "local")
+    print(f"⚡ Answered locally (confidence {confidence})")
+    return plantuml_code.strip(), model, f"⚡ Generated locally from your description (confidence {confidence:.0%})."
+
+def _persist(session, text, reply, diagram_id, diagram_type, plantuml_code, model=None, source=None):
+    """
+    Persist the new turn and the diagram; returns the (possibly new) diagram id.
+    A new diagram's description and model also go to the similarity index
+    when the model came straight from the LLM's reply (see LEARN_FROM_SOURCES).
+    """
+    session.append_message("user", text)
+    session.append_message("assistant", reply)
+    session.diagram_id = diagram_id  # keep it in sync
+
+    # Create/update diagram
+    diagram = Diagram.query.get(diagram_id) if diagram_id else None
+    if diagram:
+        diagram.plantuml_code = plantuml_code
+        diagram.diagram_type = diagram_type
+    else:
+        # no diagram_id, or diagram_id provided but missing -> create new
+        new_diagram = Diagram(
+            id=str(uuid.uuid4()),
+            name="Generated Diagram",
+            diagram_type=diagram_type,
+            plantuml_code=plantuml_code
+        )
+        db.session.add(new_diagram)
+        db.session.flush()  # get id
+        diagram_id = new_diagram.id
+        session.diagram_id = diagram_id
+        if source in LEARN_FROM_SOURCES:
+            similar.record(text, diagram_type, model)
+
+    with metrics.stage("commit"):
+        db.session.commit()
+    return diagram_id
 
-        # 4) Final fallback specific to requested type
-        if not plantuml_code:
-            explanation += "\n\n⚠️ No UML code detected. Showing fallback example."
-            if diagram_type == "usecase":
-                plantuml_code = """@startuml
-actor User
-usecase "Login" as UC1
-User --> UC1
-@enduml"""
-            elif diagram_type == "sequence":
-                plantuml_code = """@startuml
-participant User
-participant System
-User -> System: Login request
-System --> User: Success
-@enduml"""
-            else:
-                plantuml_code = """@startuml
-class User {
-  +id
-  +name
-  +email
-}
-@enduml"""
+def _read_request(data):
+    text = (data.get("text") or "").strip()
+    diagram_type = (data.get("type", "class") or "class").strip().lower()
+    diagram_id = data.get("diagram_id")
 
-        # Persist conversation and diagram
-        conversation.append({"role": "assistant", "content": reply})
-        session.messages = json.dumps(conversation)
-        session.diagram_id = diagram_id  # keep it in sync
-
-        # Create/update diagram
-        if diagram_id:
-            diagram = Diagram.query.get(diagram_id)
-            if diagram:
-                diagram.plantuml_code = plantuml_code.strip()
-                diagram.diagram_type = diagram_type
-            else:
-                # diagram_id provided but missing -> create new
-                new_diagram = Diagram(
-                    id=str(uuid.uuid4()),
-                    name="Generated Diagram",
-                    diagram_type=diagram_type,
-                    plantuml_code=plantuml_code.strip()
+    print("📥 Received text:", text)
+    print("📘 Diagram type:", diagram_type)
+    print("📊 Diagram ID:", diagram_id)
+    return text, diagram_type, diagram_id
+
+def _sse(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def _complete(conversation, text, diagram_type, existing_content):
+    """Call GPT (or replay an identical earlier request from the cache); returns the reply text."""
+    cache_key = llm_cache.make_key("generate", diagram_type, text, existing_content, GPT_MODEL, GPT_TEMPERATURE)
+    with metrics.stage("cache"):
+        reply = llm_cache.get(cache_key)
+    if reply is not None:
+        print("⚡ Cache hit for GPT reply")
+    else:
+        try:
+            with metrics.stage("llm"):
+                response = get_gateway().complete(
+                    conversation,
+                    model=GPT_MODEL,
+                    temperature=GPT_TEMPERATURE
                 )
-                db.session.add(new_diagram)
-                db.session.flush()
-                diagram_id = new_diagram.id
-                session.diagram_id = diagram_id
-        else:
-            new_diagram = Diagram(
-                id=str(uuid.uuid4()),
-                name="Generated Diagram",
-                diagram_type=diagram_type,
-                plantuml_code=plantuml_code.strip()
-            )
-            db.session.add(new_diagram)
-            db.session.flush()  # get id
-            diagram_id = new_diagram.id
-            session.diagram_id = diagram_id
+        except Exception:
+            metrics.record_llm("generate", outcome="error")
+            raise
+        metrics.record_llm("generate", response)
+        reply = completion_text(response)
+        llm_cache.put(cache_key, reply, kind="generate", diagram_type=diagram_type)
+    print("🤖 GPT reply:", reply)
+    return reply
+
+def generate_payload(session_id, text, diagram_type, diagram_id=None, diff=False):
+    """
+    One /generate request after validation: context, local extractor or LLM
+    (or cache), result and persistence. Returns the response payload; shared by the synchronous
+    route and generation jobs.
+    """
+    with metrics.stage("context"):
+        session, conversation = _load_conversation(session_id, diagram_id)
+        existing_content = _existing_content(diagram_id)
+
+    local = _local_result(text, diagram_type, existing_content)
+    source = None
+    if local is not None:
+        plantuml_code, model, explanation = local
+        reply, context_stats = plantuml_code, None  # later turns see the diagram as the assistant's reply
+    else:
+        with metrics.stage("context"):
+            conversation, context_stats = _prepare_conversation(conversation, diagram_type, existing_content, text)
+        reply = _complete(conversation, text, diagram_type, existing_content)
+        plantuml_code, model, explanation, source = _build_result(reply, text, diagram_type, existing_content)
+    new_id = _persist(session, text, reply, diagram_id, diagram_type, plantuml_code, model, source)
+
+    if diff and existing_content is not None:
+        with metrics.stage("plantuml_diff"):
+            plantuml = {"plantuml_diff": plantuml_line_diff(existing_content, plantuml_code)}
+    else:
+        plantuml = {"plantuml": plantuml_code}
+    return {
+        **plantuml,
+        "model": model or {},
+        "explanation": explanation,
+        "diagram_id": new_id,
+        "context": context_stats
+    }
+
+def coalesced_generate(session_id, text, diagram_type, diagram_id=None, diff=False):
+    """
+    generate_payload(), but double clicks and client retries wait for the
+    identical request already in flight (in this or another process) and
+    get its reply, instead of calling GPT again and racing it to write the
+    same diagram.
+    """
+    key = singleflight.make_key("generate", session_id, diagram_id, diagram_type, text, bool(diff))
+    return singleflight.do(key, lambda: generate_payload(session_id, text, diagram_type, diagram_id, diff))
 
-        db.session.commit()
+# ----------------------------
+# Route
+# ----------------------------
 
+@generate_bp.route('/generate', methods=['POST'])
+def generate():
+    """
+    With "diff": true and a diagram_id, the reply carries `plantuml_diff`
+    (line hunks against the diagram's stored PlantUML, see
+    utils.plantuml.plantuml_line_diff) instead of the full `plantuml`.
+    """
+    data = request.get_json() or {}
+    text, diagram_type, diagram_id = _read_request(data)
+    session_id = get_session_id(request)
+
+    # Quick validation
+    if len(text.split()) < 3:
         resp = make_response(jsonify({
-            "plantuml": plantuml_code.strip(),
-            "model": model or {},
-            "explanation": explanation.strip(),
+            "plantuml": "",
+            "model": {},
+            "explanation": "❗ Please describe a system.",
             "diagram_id": diagram_id
         }), 200)
         resp.set_cookie("session_id", session_id, httponly=True, samesite='Lax')
         return resp
 
+    try:
+        payload = coalesced_generate(session_id, text, diagram_type, diagram_id, bool(data.get("diff")))
+        resp = make_response(jsonify(payload), 200)
+        resp.set_cookie("session_id", session_id, httponly=True, samesite='Lax')
+        return resp
+
     except Exception as e:
         print(f"🔥 Server error: {str(e)}")
+        db.session.rollback()
         return make_response(jsonify({
             "plantuml": "",
             "model": {},
@@ -278,6 +392,283 @@ class User {
         }), 500)
 
 
+def _stream_turn(emit, session_id, text, diagram_type, diagram_id):
+    """
+    One streamed /generate turn: emit(event, payload) sends `token` and
+    `plantuml` events as they happen; returns the final (`done`) payload
+    after persistence.
+    """
+    with metrics.stage("context"):
+        session, conversation = _load_conversation(session_id, diagram_id)
+        existing_content = _existing_content(diagram_id)
+
+    local = _local_result(text, diagram_type, existing_content)
+    if local is not None:
+        plantuml_code, model, explanation = local
+        emit("plantuml", {"plantuml": plantuml_code})
+        diagram_id = _persist(session, text, plantuml_code, diagram_id, diagram_type, plantuml_code, model)
+        return {
+            "plantuml": plantuml_code,
+            "model": model or {},
+            "explanation": explanation,
+            "diagram_id": diagram_id,
+            "context": None
+        }
+
+    with metrics.stage("context"):
+        conversation, context_stats = _prepare_conversation(conversation, diagram_type, existing_content, text)
+
+    cache_key = llm_cache.make_key("generate", diagram_type, text, existing_content, GPT_MODEL, GPT_TEMPERATURE)
+    with metrics.stage("cache"):
+        reply = llm_cache.get(cache_key)
+    early_plantuml = None
+
+    if reply is not None:
+        print("⚡ Cache hit for GPT reply")
+    else:
+        extractor = StreamExtractor()
+        parts = []
+        stream = get_gateway().stream(
+            conversation,
+            model=GPT_MODEL,
+            temperature=GPT_TEMPERATURE
+        )
+        with metrics.stage("llm_stream"):  # includes time spent writing tokens to the client
+            for delta in stream:
+                parts.append(delta)
+                emit("token", {"text": delta})
+
+                if early_plantuml:
+                    continue
+                for kind, block in extractor.feed(delta):
+                    if kind == "plantuml" and _plantuml_matches_type(block, diagram_type):
+                        early_plantuml = block.strip()
+                    elif kind == "json":
+                        try:
+                            early_plantuml = generate_plantuml(json.loads(block), diagram_type)
+                        except Exception as e:
+                            print("❌ JSON parse error:", e)
+                    if early_plantuml:
+                        emit("plantuml", {"plantuml": early_plantuml})
+                        break
+
+        reply = "".join(parts)
+        metrics.record_llm("stream")  # streamed replies carry no usage block
+        llm_cache.put(cache_key, reply, kind="generate", diagram_type=diagram_type)
+    print("🤖 GPT reply:", reply)
+
+    plantuml_code, model, explanation, source = _build_result(reply, text, diagram_type, existing_content)
+    if plantuml_code != early_plantuml:
+        emit("plantuml", {"plantuml": plantuml_code})
+
+    diagram_id = _persist(session, text, reply, diagram_id, diagram_type, plantuml_code, model, source)
+    return {
+        "plantuml": plantuml_code,
+        "model": model or {},
+        "explanation": explanation,
+        "diagram_id": diagram_id,
+        "context": context_stats
+    }
+
+@generate_bp.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """
+    Server-Sent Events variant of /generate.
+    Events: `token` (reply delta), `plantuml` (as soon as a diagram closes),
+    `done` (final payload, after persistence) and `error`.
+    Coalesced like /generate (same key, so across both routes): a duplicate of
+    a turn in flight gets no tokens, just the leader's diagram and `done`.
+    """
+    text, diagram_type, diagram_id = _read_request(request.get_json() or {})
+    session_id = get_session_id(request)
+
+    def events(diagram_id):
+        if len(text.split()) < 3:
+            yield _sse("done", {
+                "plantuml": "",
+                "model": {},
+                "explanation": "❗ Please describe a system.",
+                "diagram_id": diagram_id
+            })
+            return
+
+        # The turn runs on a worker thread inside singleflight.do(); its events come back through a queue
+        out = queue.Queue()
+        led = []
+
+        def lead():
+            led.append(True)
+            return _stream_turn(lambda event, payload: out.put(_sse(event, payload)),
+                                session_id, text, diagram_type, diagram_id)
+
+        @copy_current_request_context
+        def work():
+            key = singleflight.make_key("generate", session_id, diagram_id, diagram_type, text, False)
+            try:
+                payload = singleflight.do(key, lead)
+                if not led:
+                    out.put(_sse("plantuml", {"plantuml": payload["plantuml"]}))
+                out.put(_sse("done", payload))
+            except Exception as e:
+                print(f"🔥 Server error: {str(e)}")
+                db.session.rollback()
+                out.put(_sse("error", {"explanation": f"❌ Error: {str(e)}", "diagram_id": diagram_id}))
+            finally:
+                out.put(None)
+
+        threading.Thread(target=work, name="generate-stream", daemon=True).start()
+        while (chunk := out.get()) is not None:
+            yield chunk
+
+    resp = Response(stream_with_context(events(diagram_id)), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    resp.set_cookie("session_id", session_id, httponly=True, samesite='Lax')
+    return resp
+
+
+@generate_bp.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """
+    Generate many diagrams from a list of {text, type[, name]} items.
+    LLM calls run concurrently (bounded by `concurrency`); each result is streamed
+    as an `item` SSE event when it finishes, and all Diagram rows are written
+    with one bulk insert and a single commit before the final `done` event.
+    """
+    data = request.get_json() or {}
+    items = data.get("items") or []
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 400
+    try:
+        concurrency = max(1, min(int(data.get("concurrency") or BATCH_MAX_CONCURRENCY), BATCH_MAX_CONCURRENCY))
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "Invalid concurrency"}), 400
+
+    jobs = []
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        text = item.get("text") or ""
+        diagram_type = item.get("type") or "class"
+        name = item.get("name") or f"Batch Diagram {index + 1}"
+        for field, value in (("text", text), ("type", diagram_type), ("name", name)):
+            if not isinstance(value, str):
+                return jsonify({"error": f"Invalid items[{index}].{field}: must be a string"}), 400
+        text = text.strip()
+        diagram_type = diagram_type.strip().lower()
+        jobs.append({
+            "index": index,
+            "text": text,
+            "diagram_type": diagram_type,
+            "name": name,
+            "cache_key": llm_cache.make_key("generate", diagram_type, text, None, GPT_MODEL, GPT_TEMPERATURE),
+        })
+
+    def finish(job, reply=None, local=None):
+        if local is not None:
+            plantuml_code, model, explanation = local
+            source = None
+        else:
+            plantuml_code, model, explanation, source = _build_result(reply, job["text"], job["diagram_type"])
+        diagram = Diagram(
+            id=str(uuid.uuid4()),
+            name=job["name"],
+            diagram_type=job["diagram_type"],
+            plantuml_code=plantuml_code
+        )
+        if source in LEARN_FROM_SOURCES:
+            similar.record(job["text"], job["diagram_type"], model)
+        return diagram, {
+            "index": job["index"],
+            "diagram_id": diagram.id,
+            "plantuml": plantuml_code,
+            "model": model or {},
+            "explanation": explanation
+        }
+
+    def events():
+        diagrams = []
+        failed = 0
+        pending = []
+
+        # Invalid, locally answerable and cached items resolve immediately; the rest fan out to the LLM
+        for job in jobs:
+            if len(job["text"].split()) < 3:
+                failed += 1
+                yield _sse("item", {"index": job["index"], "error": "❗ Please describe a system."})
+                continue
+            local = _local_result(job["text"], job["diagram_type"])
+            if local is not None:
+                diagram, result = finish(job, local=local)
+                diagrams.append(diagram)
+                yield _sse("item", result)
+                continue
+            reply = llm_cache.get(job["cache_key"])
+            if reply is not None:
+                diagram, result = finish(job, reply)
+                diagrams.append(diagram)
+                yield _sse("item", result)
+            else:
+                pending.append(job)
+
+        calls = [{
+            "messages": [
+                {"role": "system", "content": _system_for_type(job["diagram_type"], None)},
+                {"role": "user", "content": job["text"]},
+            ],
+            "model": GPT_MODEL,
+            "temperature": GPT_TEMPERATURE,
+        } for job in pending]
+
+        for position, response, error in get_gateway().complete_many(calls, concurrency):
+            job = pending[position]
+            if error is not None:
+                failed += 1
+                metrics.record_llm("batch", outcome="error")
+                print(f"🔥 Batch item {job['index']} failed: {error}")
+                yield _sse("item", {"index": job["index"], "error": f"❌ Error: {error}"})
+                continue
+            metrics.record_llm("batch", response)
+            try:
+                reply = completion_text(response)
+                llm_cache.put(job["cache_key"], reply, kind="generate", diagram_type=job["diagram_type"])
+                diagram, result = finish(job, reply)
+            except Exception as e:
+                failed += 1
+                yield _sse("item", {"index": job["index"], "error": f"❌ Error: {e}"})
+                continue
+            diagrams.append(diagram)
+            yield _sse("item", result)
+
+        try:
+            with metrics.stage("commit"):
+                db.session.add_all(diagrams)
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"🔥 Batch persist error: {e}")
+            yield _sse("error", {"explanation": f"❌ Error: {e}"})
+            return
+
+        yield _sse("done", {
+            "total": len(jobs),
+            "succeeded": len(diagrams),
+            "failed": failed,
+            "diagram_ids": [d.id for d in diagrams]
+        })
+
+    resp = Response(stream_with_context(events()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+
+@generate_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({**llm_cache.stats(), "singleflight": singleflight.stats(), "similar": similar.stats()}), 200
+
+
 @generate_bp.route('/clear-session', methods=['POST'])
 def clear_session():
     session_id = get_session_id(request)
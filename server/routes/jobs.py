@@ -0,0 +1,99 @@
+import time
+from flask import Blueprint, Response, request, jsonify, make_response, stream_with_context
+from db import db
+from models import GenerationJob
+from services import jobs, singleflight
+from routes.generate import coalesced_generate, get_session_id, _read_request, _sse
+
+jobs_bp = Blueprint('jobs', __name__)
+
+MAX_WAIT_SECONDS = 30
+KEEPALIVE_SECONDS = 15
+
+def _run_generate(params, session_id):
+    return coalesced_generate(
+        session_id, params["text"], params["type"], params.get("diagram_id"), params.get("diff", False)
+    )
+
+jobs.register("generate", _run_generate)
+
+# Queue a /generate request; the LLM call and persistence run on the job pool
+@jobs_bp.route('/jobs/generate', methods=['POST'])
+def submit_generate():
+    """
+    Same body as /generate. Answers 202 at once with the job id; poll
+    GET /jobs/<id> (optionally ?wait=<seconds>) or subscribe to
+    GET /jobs/<id>/events. The finished job's `result` is the /generate reply.
+    Resubmitting an identical request while it is queued/running returns
+    the same job.
+    """
+    data = request.get_json() or {}
+    text, diagram_type, diagram_id = _read_request(data)
+    session_id = get_session_id(request)
+
+    if len(text.split()) < 3:
+        return jsonify({"error": "❗ Please describe a system."}), 400
+
+    params = {"text": text, "type": diagram_type, "diagram_id": diagram_id, "diff": bool(data.get("diff"))}
+    key = singleflight.make_key("job:generate", session_id, diagram_id, diagram_type, text, params["diff"])
+    try:
+        job, created = jobs.submit("generate", params, session_id=session_id, key=key)
+    except jobs.QueueFull as e:
+        resp = make_response(jsonify({"error": f"Too many queued jobs ({e})"}), 429)
+        resp.headers["Retry-After"] = "5"
+        return resp
+
+    resp = make_response(jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "created": created
+    }), 202)
+    resp.headers["Location"] = f"/api/jobs/{job.id}"
+    resp.set_cookie("session_id", session_id, httponly=True, samesite='Lax')
+    return resp
+
+# Job status (and result once done); ?wait=N long-polls up to N seconds for it to finish
+@jobs_bp.route('/jobs/<string:job_id>', methods=['GET'])
+def get_job(job_id):
+    try:
+        wait = max(0.0, min(float(request.args.get("wait", 0)), MAX_WAIT_SECONDS))
+    except ValueError:
+        return jsonify({"error": "Invalid wait"}), 400
+    job = jobs.wait(job_id, wait)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+# Server-Sent Events: `status` on every change, then `done` or `error` with the job
+@jobs_bp.route('/jobs/<string:job_id>/events', methods=['GET'])
+def job_events(job_id):
+    if db.session.get(GenerationJob, job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        last_status = None
+        last_sent = time.monotonic()
+        while True:
+            job = jobs.wait(job_id, jobs.JOB_POLL_SECONDS)
+            if job is None:
+                yield _sse("error", {"error": "Job not found"})
+                return
+            if job.status not in jobs.ACTIVE:
+                yield _sse(job.status, job.to_dict())
+                return
+            if job.status != last_status:
+                last_status = job.status
+                yield _sse("status", {"id": job.id, "status": job.status})
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+
+    resp = Response(stream_with_context(events()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+@jobs_bp.route('/jobs/stats', methods=['GET'])
+def job_stats():
+    return jsonify(jobs.stats()), 200
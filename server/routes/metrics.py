@@ -0,0 +1,11 @@
+from flask import Blueprint, Response, jsonify
+from services import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Prometheus scrape target
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,90 @@
+import zlib
+from flask import Blueprint, request, jsonify, make_response
+from services import metrics, renderer
+
+render_bp = Blueprint('render', __name__)
+
+MAX_SOURCE_BYTES = 1024 * 1024
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-_"
+_DECODE = {c: i for i, c in enumerate(_ALPHABET)}
+
+def decode_plantuml(encoded: str) -> str:
+    """
+    Inverse of the plantuml.com URL encoding (plantuml-encoder on the client):
+    raw deflate, then a base64 variant over 0-9A-Za-z-_.
+    """
+    bits = 0
+    nbits = 0
+    data = bytearray()
+    for c in encoded:
+        bits = (bits << 6) | _DECODE[c]
+        nbits += 6
+        if nbits >= 8:
+            nbits -= 8
+            data.append((bits >> nbits) & 0xFF)
+    # the encoder pads its last group with zero bytes, after the end of the deflate stream
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+    source = inflater.decompress(bytes(data), MAX_SOURCE_BYTES)
+    if inflater.unconsumed_tail:
+        raise ValueError("Diagram too large")
+    return source.decode("utf-8")
+
+def _image(fmt, source, immutable):
+    if fmt not in renderer.FORMATS:
+        return jsonify({"error": f"Unsupported format '{fmt}'"}), 400
+    if not source.strip():
+        return jsonify({"error": "Missing diagram source"}), 400
+    if len(source) > MAX_SOURCE_BYTES:
+        return jsonify({"error": "Diagram too large"}), 413
+
+    try:
+        # a revalidation answered without rendering, even after cache eviction
+        etag = renderer.etag_for(source, fmt)
+        if etag in request.if_none_match:
+            resp = make_response("", 304)
+        else:
+            with metrics.stage("render"):
+                body, etag = renderer.render(source, fmt)
+            resp = make_response(body, 200)
+            resp.mimetype = renderer.FORMATS[fmt]
+    except renderer.RendererUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except renderer.RenderError as e:
+        print("❌ Render error:", e)
+        return jsonify({"error": str(e)}), 502
+
+    resp.set_etag(etag)
+    # GET URLs embed the source, so their image never changes
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable" if immutable else "no-cache"
+    return resp
+
+# ----------------------------
+# Routes
+# ----------------------------
+
+# Render an encoded diagram, same URL scheme as plantuml.com/plantuml/<format>/<encoded>
+@render_bp.route('/render/<string:fmt>/<string:encoded>', methods=['GET'])
+def render_encoded(fmt, encoded):
+    try:
+        source = decode_plantuml(encoded)
+    except (KeyError, ValueError, zlib.error):
+        return jsonify({"error": "Invalid encoded diagram"}), 400
+    return _image(fmt, source, immutable=True)
+
+# Render PlantUML sent as {"plantuml": "..."} or as a text/plain body
+@render_bp.route('/render/<string:fmt>', methods=['POST'])
+def render_posted(fmt):
+    if request.is_json:
+        source = (request.get_json() or {}).get("plantuml") or ""
+    else:
+        source = request.get_data(as_text=True)
+    return _image(fmt, source, immutable=False)
+
+@render_bp.route('/render/stats', methods=['GET'])
+def render_stats():
+    return jsonify(renderer.cache_stats()), 200
@@ -0,0 +1,93 @@
+from flask import Blueprint, request, jsonify, make_response
+from db import db
+from models import Diagram, DiagramRevision
+from services import metrics, revisions
+
+revisions_bp = Blueprint('revisions', __name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def _seq(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# List a diagram's revisions (newest first)
+@revisions_bp.route('/diagrams/<string:diagram_id>/revisions', methods=['GET'])
+def list_revisions(diagram_id):
+    """
+    Query params: limit (default 50, max 200), before (a seq, from X-Next-Before).
+    `size` is the stored bytes of each revision: deltas stay small, snapshots
+    hold the full diagram.
+    """
+    if not db.session.query(Diagram.id).filter(Diagram.id == diagram_id).first():
+        return jsonify({"error": "Diagram not found"}), 404
+    try:
+        limit = max(1, min(int(request.args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    before = request.args.get("before")
+    if before is not None and _seq(before) is None:
+        return jsonify({"error": "Invalid before"}), 400
+
+    with metrics.stage("query"):
+        rows = revisions.list_revisions(diagram_id, limit + 1, _seq(before))
+    page = rows[:limit]
+
+    resp = make_response(jsonify([DiagramRevision.summary_dict(r) for r in page]), 200)
+    if len(rows) > limit:
+        resp.headers["X-Next-Before"] = str(page[-1].seq)
+    return resp
+
+# Diagram content at one revision
+@revisions_bp.route('/diagrams/<string:diagram_id>/revisions/<int:seq>', methods=['GET'])
+def get_revision(diagram_id, seq):
+    with metrics.stage("checkout"):
+        state = revisions.checkout(diagram_id, seq)
+    if state is None:
+        return jsonify({"error": "Revision not found"}), 404
+    return jsonify({"diagram_id": diagram_id, "seq": seq, **state}), 200
+
+# Differences between two revisions (default: the given one vs the current diagram)
+@revisions_bp.route('/diagrams/<string:diagram_id>/revisions/diff', methods=['GET'])
+def diff_revisions(diagram_id):
+    """Query params: from (seq, required), to (seq; omitted = latest)."""
+    old_seq = _seq(request.args.get("from"))
+    if old_seq is None:
+        return jsonify({"error": "Missing from"}), 400
+    new_seq = _seq(request.args.get("to"))
+    if request.args.get("to") is not None and new_seq is None:
+        return jsonify({"error": "Invalid to"}), 400
+    if new_seq is None:
+        new_seq = db.session.query(db.func.max(DiagramRevision.seq)).filter(
+            DiagramRevision.diagram_id == diagram_id).scalar()
+
+    with metrics.stage("checkout"):
+        old = revisions.checkout(diagram_id, old_seq)
+        new = revisions.checkout(diagram_id, new_seq) if new_seq is not None else None
+    if old is None or new is None:
+        return jsonify({"error": "Revision not found"}), 404
+
+    return jsonify({
+        "from": old_seq,
+        "to": new_seq,
+        **revisions.diff(old, new, f"r{old_seq}", f"r{new_seq}")
+    }), 200
+
+# Restore a revision (recorded as a new revision, history is kept)
+@revisions_bp.route('/diagrams/<string:diagram_id>/revisions/<int:seq>/restore', methods=['POST'])
+def restore_revision(diagram_id, seq):
+    diagram = Diagram.query.get(diagram_id)
+    if not diagram:
+        return jsonify({"error": "Diagram not found"}), 404
+    state = revisions.checkout(diagram_id, seq)
+    if state is None:
+        return jsonify({"error": "Revision not found"}), 404
+
+    for field in revisions.FIELDS:
+        setattr(diagram, field, state[field])
+    with metrics.stage("commit"):
+        db.session.commit()
+    return jsonify(diagram.to_dict()), 200
@@ -0,0 +1,129 @@
+import os
+import re
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a local approximation
+    tiktoken = None
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+MESSAGE_OVERHEAD_TOKENS = 4   # role/separator tokens per chat message
+SUMMARY_ITEM_CHARS = 80
+
+_DIAGRAM_BLOCK = re.compile(r'```[\s\S]*?```|@startuml[\s\S]*?@enduml')
+_WORD = re.compile(r"\w+|[^\w\s]")
+_OMITTED = "[earlier diagram omitted - superseded by the current diagram]"
+
+# ----------------------------
+# Token counting
+# ----------------------------
+
+@lru_cache(maxsize=8)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Local token count: tiktoken when installed, otherwise a BPE-like estimate."""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    # ~4 characters per token for words, one token per punctuation mark
+    return sum((len(w) + 3) // 4 for w in _WORD.findall(text))
+
+def message_tokens(message: dict, model: str = "gpt-4") -> int:
+    return MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "", model)
+
+def _total(messages, model):
+    return sum(message_tokens(m, model) for m in messages)
+
+# ----------------------------
+# Context window
+# ----------------------------
+
+def _strip_stale_diagrams(history, keep_latest):
+    """Replace diagrams in old assistant replies; only the latest state matters."""
+    latest = None
+    if keep_latest:
+        for i in range(len(history) - 1, -1, -1):
+            if history[i].get("role") == "assistant" and _DIAGRAM_BLOCK.search(history[i].get("content") or ""):
+                latest = i
+                break
+
+    compacted = []
+    for i, message in enumerate(history):
+        content = message.get("content") or ""
+        if message.get("role") == "assistant" and i != latest:
+            content = _DIAGRAM_BLOCK.sub(_OMITTED, content)
+        compacted.append({"role": message.get("role"), "content": content})
+    return compacted
+
+def _summary_message(dropped):
+    requests = [m["content"].strip().replace("\n", " ") for m in dropped if m.get("role") == "user"]
+    if not requests:
+        return None
+    items = "; ".join(r[:SUMMARY_ITEM_CHARS] + ("…" if len(r) > SUMMARY_ITEM_CHARS else "") for r in requests)
+    return {"role": "system", "content": f"Earlier requests in this session (summarized): {items}"}
+
+def build_context(system_content, history, user_text, budget=None, model="gpt-4",
+                  current_diagram_in_system=False):
+    """
+    Build the messages for one chat call within a token budget.
+    Old assistant diagrams are replaced by a placeholder (the current diagram is
+    already in the system prompt when editing, otherwise the latest one is kept),
+    then the oldest turns are dropped and summarized until the budget fits.
+    Returns (messages, stats) where stats reports tokens sent and saved.
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    system = {"role": "system", "content": system_content}
+    user = {"role": "user", "content": user_text}
+    history = [m for m in history if m.get("role") != "system"]
+
+    naive_tokens = _total([system] + history + [user], model)
+
+    turns = _strip_stale_diagrams(history, keep_latest=not current_diagram_in_system)
+    fixed = message_tokens(system, model) + message_tokens(user, model)
+    turn_tokens = [message_tokens(m, model) for m in turns]
+    used = fixed + sum(turn_tokens)
+
+    dropped = []
+
+    def drop_oldest_turn():
+        nonlocal used
+        dropped.append(turns.pop(0))
+        used -= turn_tokens.pop(0)
+        # keep user/assistant pairs together
+        if turns and turns[0].get("role") == "assistant":
+            dropped.append(turns.pop(0))
+            used -= turn_tokens.pop(0)
+
+    while turns and used > budget:
+        drop_oldest_turn()
+
+    # Dropped requests survive as a one-line summary when it still fits
+    summary = _summary_message(dropped)
+    while summary and turns and used + message_tokens(summary, model) > budget:
+        drop_oldest_turn()
+        summary = _summary_message(dropped)
+    if summary and used + message_tokens(summary, model) > budget:
+        summary = None
+
+    messages = [system]
+    if summary:
+        messages.append(summary)
+    messages.extend(turns)
+    messages.append(user)
+
+    tokens = _total(messages, model)
+    return messages, {
+        "tokens": tokens,
+        "naive_tokens": naive_tokens,
+        "saved": max(naive_tokens - tokens, 0),
+        "dropped_messages": len(dropped),
+        "budget": budget,
+        "exact": tiktoken is not None,
+    }
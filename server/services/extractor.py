@@ -0,0 +1,413 @@
+import os
+import spacy
+
+# ----------------------------
+# Config
+# ----------------------------
+
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+# Answer create requests from the local extraction when it is at least this confident.
+# Off by default: the confidence rules are not yet validated on en_core_web_sm parses
+# (benchmarks/bench_router.py reports them); set LOCAL_FIRST=1 once they are.
+LOCAL_FIRST = os.getenv("LOCAL_FIRST", "0") not in ("0", "false", "False")
+LOCAL_MIN_CONFIDENCE = float(os.getenv("LOCAL_MIN_CONFIDENCE", "0.8"))
+
+# Load spaCy once
+nlp = spacy.load(SPACY_MODEL)
+
+SUBJECTS = {"nsubj", "nsubjpass"}
+OBJECTS = {"dobj", "obj", "attr", "oprd"}
+PRONOUNS = {"it", "they", "he", "she", "them", "this", "that", "which", "who", "one", "we", "you", "i"}
+QUANTIFIERS = {"many", "multiple", "several", "some", "all", "various", "any", "numerous"}
+CONDITIONS = {"if", "unless", "when", "whenever", "until", "while", "whether"}
+
+# "X has Y": Y is an attribute unless it is an entity of its own
+HAS_VERBS = {"have", "own", "hold", "keep", "store", "track", "record"}
+PART_VERBS = {"contain", "comprise", "consist", "include"}
+INHERIT_VERBS = {"extend", "inherit", "specialize", "subclass"}
+KIND_WORDS = {"kind", "type", "sort", "subclass", "subtype", "specialization"}
+ATTRIBUTE_WORDS = {
+    "name", "id", "identifier", "email", "address", "phone", "number", "title", "isbn", "price",
+    "cost", "date", "time", "age", "status", "description", "password", "username", "quantity",
+    "amount", "total", "balance", "code", "color", "colour", "size", "weight", "rating", "score",
+    "salary", "birthday", "year", "url", "location", "level", "count", "capacity", "duration",
+}
+
+NON_ACTORS = {"system", "application", "app", "platform", "website", "site", "software", "program"}
+PARTICIPANT_WORDS = {
+    "user", "client", "server", "database", "db", "system", "service", "api", "gateway", "controller",
+    "app", "application", "browser", "frontend", "backend", "customer", "admin", "cache", "queue",
+    "repository", "manager", "handler", "worker", "bank", "store", "shop", "payment",
+}
+RETURN_VERBS = {"return", "reply", "respond", "answer", "acknowledge"}
+ASYNC_VERBS = {"notify", "publish", "emit", "broadcast", "enqueue"}
+CREATE_VERBS = {"create", "instantiate", "spawn"}
+DESTROY_VERBS = {"destroy", "delete", "kill", "terminate"}
+RECEIVE_VERBS = {"receive", "get"}
+
+# ----------------------------
+# Parse helpers
+# ----------------------------
+
+def _pascal(words):
+    return "".join(w[:1].upper() + w[1:] for w in words if w)
+
+def _camel(words):
+    name = _pascal(words)
+    return name[:1].lower() + name[1:]
+
+def _head_word(tok):
+    """Singular form for nouns, the text as written for names."""
+    if tok.pos_ == "PROPN":
+        return tok.text
+    return (tok.lemma_ or tok.text).lower()
+
+def _compounds(tok):
+    return [c for c in tok.children if c.dep_ == "compound" and c.i < tok.i]
+
+def class_name(tok):
+    return _pascal([_head_word(c) for c in _compounds(tok)] + [_head_word(tok)])
+
+def attribute_name(tok):
+    return _camel([c.text.lower() for c in _compounds(tok)] + [tok.text.lower()])
+
+def phrase(tok):
+    """Object phrase as written, without determiners: "the overdue books" -> "overdue books"."""
+    words = [c for c in tok.children if c.dep_ in ("compound", "amod") and c.i < tok.i]
+    return " ".join([w.text.lower() for w in words] + [tok.text.lower()])
+
+def _plural(tok):
+    if tok.tag_ in ("NNS", "NNPS") or "Plur" in tok.morph.get("Number"):
+        return True
+    return any(c.dep_ in ("det", "amod", "nummod") and c.lower_ in QUANTIFIERS for c in tok.children)
+
+def _expand(tokens):
+    """Tokens plus their coordinated tokens: "books and magazines"."""
+    out = []
+    for tok in tokens:
+        for t in [tok, *tok.conjuncts]:
+            if t not in out and t.pos_ in ("NOUN", "PROPN", "PRON", "VERB"):
+                out.append(t)
+    return out
+
+def _is_pronoun(tok):
+    return tok.pos_ == "PRON" or tok.lower_ in PRONOUNS
+
+def _verbs(sent):
+    """Clause heads in reading order: the root, coordinated verbs and relative clauses."""
+    return [
+        t for t in sent
+        if t.pos_ in ("VERB", "AUX") and (t.dep_ in ("ROOT", "relcl", "xcomp", "advcl") or (t.dep_ == "conj" and t.head.pos_ in ("VERB", "AUX")))
+    ]
+
+def _subjects(verb):
+    subjects = [c for c in verb.children if c.dep_ in SUBJECTS]
+    if not subjects and verb.dep_ in ("conj", "xcomp"):
+        return _subjects(verb.head)  # "can borrow and return": shared subject
+    if not subjects and verb.dep_ == "relcl":
+        return [verb.head]           # "a member who borrows books"
+    return _expand(subjects)
+
+def _objects(verb):
+    """(noun, preposition or None) pairs; "consist of", "send to" give their prepositional objects."""
+    found = [(c, None) for c in verb.children if c.dep_ in OBJECTS]
+    for prep in (c for c in verb.children if c.dep_ in ("prep", "agent", "dative")):
+        found += [(p, prep.lower_) for p in prep.children if p.dep_ == "pobj"]
+        if prep.dep_ == "dative" and prep.pos_ in ("NOUN", "PROPN"):
+            found.append((prep, "to"))  # "sends the user a receipt"
+    expanded = []
+    for tok, prep in found:
+        expanded += [(t, prep) for t in _expand([tok])]
+    if not expanded and verb.dep_ != "conj":
+        # "borrow and return books": the object sits on the last verb
+        for conj in verb.conjuncts:
+            expanded += [(t, p) for t, p in _objects(conj) if p is None]
+            if expanded:
+                break
+    return expanded
+
+def _label(verb):
+    particle = [c.lower_ for c in verb.children if c.dep_ == "prt"]
+    return " ".join([verb.lemma_.lower()] + particle)
+
+def _skipped(sent):
+    """Negated or conditional sentences are beyond simple rules."""
+    return any(t.dep_ == "neg" or (t.dep_ == "mark" and t.lower_ in CONDITIONS) for t in sent)
+
+class _Context:
+    """Pronoun subjects resolve to the previous sentence's subject; each resolution costs confidence."""
+
+    def __init__(self):
+        self.last_subject = None
+        self.guesses = 0
+
+    def resolve(self, tok):
+        if not _is_pronoun(tok):
+            return tok
+        if tok.lower_ in ("it", "they", "he", "she") and self.last_subject is not None:
+            self.guesses += 1
+            return self.last_subject
+        return None
+
+def _confidence(explained, sentences, guesses, enough):
+    if not sentences or not enough:
+        return 0.0
+    score = explained / sentences - 0.1 * guesses
+    return round(max(0.0, min(1.0, score)), 3)
+
+# ----------------------------
+# Class diagrams
+# ----------------------------
+
+def _class_model(doc):
+    sentences = list(doc.sents)
+    context = _Context()
+
+    # Pass 1: which nouns are entities (classes) rather than attributes
+    entities = set()
+    for sent in sentences:
+        for verb in _verbs(sent):
+            lemma = verb.lemma_.lower()
+            for subj in _subjects(verb):
+                subj = context.resolve(subj)
+                if subj is not None:
+                    entities.add(class_name(subj))
+                    context.last_subject = subj
+            for obj, prep in _objects(verb):
+                if _is_pronoun(obj) or obj.pos_ == "VERB":
+                    continue
+                if lemma in HAS_VERBS | PART_VERBS:
+                    if _plural(obj) and obj.lemma_.lower() not in ATTRIBUTE_WORDS:
+                        entities.add(class_name(obj))
+                elif lemma == "be" or lemma in INHERIT_VERBS or obj.lemma_.lower() not in ATTRIBUTE_WORDS:
+                    entities.add(class_name(obj))
+
+    classes = {}
+    relationships = []
+    seen_rels = set()
+
+    def cls(name):
+        return classes.setdefault(name, {"name": name, "attributes": [], "methods": []})
+
+    def relate(source, target, rel_type, label=""):
+        key = (source, target, rel_type)
+        if source != target and key not in seen_rels:
+            seen_rels.add(key)
+            relationships.append({"from": source, "to": target, "type": rel_type, "label": label})
+
+    # Pass 2: attributes, methods and relationships
+    context = _Context()
+    explained = 0
+    for sent in sentences:
+        if _skipped(sent):
+            continue
+        fired = False
+        for verb in _verbs(sent):
+            lemma = verb.lemma_.lower()
+            subjects = [s for s in (context.resolve(t) for t in _subjects(verb)) if s is not None]
+            if not subjects:
+                continue
+            context.last_subject = subjects[0]
+            objects = [(o, p) for o, p in _objects(verb) if not _is_pronoun(o) and o.pos_ != "VERB"]
+
+            for subj in subjects:
+                source = cls(class_name(subj))["name"]
+
+                # "A manager is an employee" / "is a kind of employee" / "extends Employee"
+                if lemma == "be" or lemma in INHERIT_VERBS:
+                    for obj, prep in objects:
+                        if obj.dep_ == "attr" or lemma in INHERIT_VERBS:
+                            kind_of = [p for p in obj.children if p.dep_ == "prep" and p.lower_ == "of"]
+                            if obj.lemma_.lower() in KIND_WORDS and kind_of:
+                                targets = [p for p in kind_of[0].children if p.dep_ == "pobj"]
+                                if not targets:
+                                    continue
+                                obj = targets[0]
+                            relate(source, cls(class_name(obj))["name"], "inheritance")
+                            fired = True
+                    continue
+
+                if lemma in HAS_VERBS | PART_VERBS:
+                    for obj, prep in objects:
+                        name = class_name(obj)
+                        if name in entities:
+                            target = cls(name)["name"]
+                            if lemma in PART_VERBS:
+                                relate(source, target, "composition", "contains")
+                            elif _plural(obj):
+                                relate(source, target, "one-to-many", "has")
+                            else:
+                                relate(source, target, "association", "has")
+                        else:
+                            attribute = attribute_name(obj)
+                            if attribute not in classes[source]["attributes"]:
+                                classes[source]["attributes"].append(attribute)
+                        fired = True
+                    continue
+
+                # Any other verb: an association to entity objects, else a method
+                targets = [(o, p) for o, p in objects if class_name(o) in entities]
+                for obj, prep in targets:
+                    relate(source, cls(class_name(obj))["name"], "one-to-many" if _plural(obj) else "association", verb.lower_ if verb.tag_ == "VBZ" else _label(verb))
+                    fired = True
+                if not targets:
+                    words = _label(verb).split() + [attribute_name(o) for o, p in objects[:1] if p is None]
+                    method = _camel(words) + "()"
+                    if method not in classes[source]["methods"]:
+                        classes[source]["methods"].append(method)
+                    fired = True
+        explained += fired
+
+    model = {"classes": list(classes.values()), "relationships": relationships}
+    enough = len(classes) >= 2 or any(c["attributes"] or c["methods"] for c in classes.values())
+    return model, _confidence(explained, len(sentences), context.guesses, enough)
+
+# ----------------------------
+# Use case diagrams
+# ----------------------------
+
+def _usecase_model(doc):
+    sentences = list(doc.sents)
+    context = _Context()
+    actors, use_cases, associations = [], [], []
+    explained = 0
+
+    for sent in sentences:
+        if _skipped(sent):
+            continue
+        fired = False
+        for verb in _verbs(sent):
+            if verb.lemma_.lower() == "be":
+                continue
+            subjects = [s for s in (context.resolve(t) for t in _subjects(verb)) if s is not None]
+            actor_toks = [s for s in subjects if s.lemma_.lower() not in NON_ACTORS]
+            if not actor_toks:
+                continue
+            context.last_subject = actor_toks[0]
+            objects = [o for o, p in _objects(verb) if p is None and not _is_pronoun(o)]
+            label = _label(verb)
+            names = [f"{label} {phrase(o)}" for o in objects] or [label]
+            names = [n[:1].upper() + n[1:] for n in names]
+            for actor_tok in actor_toks:
+                actor = class_name(actor_tok)
+                if actor not in actors:
+                    actors.append(actor)
+                for name in names:
+                    if name not in use_cases:
+                        use_cases.append(name)
+                    association = {"actor": actor, "use_case": name}
+                    if association not in associations:
+                        associations.append(association)
+                fired = True
+        explained += fired
+
+    model = {"actors": actors, "use_cases": use_cases, "associations": associations, "includes": [], "extends": []}
+    return model, _confidence(explained, len(sentences), context.guesses, bool(actors and use_cases))
+
+# ----------------------------
+# Sequence diagrams
+# ----------------------------
+
+def _message_type(lemma):
+    if lemma in RETURN_VERBS:
+        return "return"
+    if lemma in ASYNC_VERBS:
+        return "async"
+    if lemma in CREATE_VERBS:
+        return "create"
+    if lemma in DESTROY_VERBS:
+        return "destroy"
+    return "sync"
+
+def _sequence_model(doc):
+    sentences = list(doc.sents)
+    context = _Context()
+
+    # Participants: every subject, and every object named like one
+    known = set()
+    for sent in sentences:
+        for verb in _verbs(sent):
+            for subj in _subjects(verb):
+                if not _is_pronoun(subj):
+                    known.add(class_name(subj))
+
+    def is_participant(tok):
+        return class_name(tok) in known or tok.lemma_.lower() in PARTICIPANT_WORDS or tok.pos_ == "PROPN"
+
+    participants, messages = [], []
+    explained = 0
+
+    def participant(tok):
+        name = class_name(tok)
+        if name not in participants:
+            participants.append(name)
+        return name
+
+    for sent in sentences:
+        if _skipped(sent):
+            continue
+        fired = False
+        for verb in _verbs(sent):
+            lemma = verb.lemma_.lower()
+            if lemma == "be":
+                continue
+            subjects = [s for s in (context.resolve(t) for t in _subjects(verb)) if s is not None]
+            if not subjects:
+                continue
+            sender = subjects[0]
+            objects = _objects(verb)
+            payload = [o for o, p in objects if p is None and not is_participant(o)]
+            recipients = [o for o, p in objects if p in ("to", "from", "with") and is_participant(o)]
+            if not recipients:
+                # "The server queries the database": the direct object is the receiver
+                recipients = [o for o, p in objects if p is None and is_participant(o)]
+                payload += [o for o, p in objects if p == "for" and not is_participant(o)]
+            if not recipients:
+                continue
+
+            text = " ".join([_label(verb)] + [phrase(o) for o in payload[:1]])
+            for recipient in recipients[:1]:
+                source, target = participant(sender), participant(recipient)
+                prep = next((p for o, p in objects if o is recipient), None)
+                if lemma in RECEIVE_VERBS and prep == "from":
+                    # "The client receives a token from the server"
+                    source, target = target, source
+                    text = " ".join(phrase(o) for o in payload[:1]) or _label(verb)
+                messages.append({"from": source, "to": target, "message": text, "type": _message_type(lemma)})
+                # "... to the server. It replies ...": whoever just received acts next
+                context.last_subject = recipient if target == class_name(recipient) else sender
+                fired = True
+        explained += fired
+
+    model = {"participants": participants, "messages": messages, "activations": []}
+    return model, _confidence(explained, len(sentences), context.guesses, len(participants) >= 2 and bool(messages))
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+_EXTRACTORS = {
+    "class": _class_model,
+    "usecase": _usecase_model,
+    "sequence": _sequence_model,
+}
+
+def can_parse() -> bool:
+    """False when the loaded pipeline has no dependency parser (e.g. a blank model)."""
+    return nlp.has_pipe("parser")
+
+def extract_doc(doc, diagram_type="class"):
+    build = _EXTRACTORS.get(diagram_type)
+    if build is None:
+        return {}, 0.0
+    return build(doc)
+
+def extract(text, diagram_type="class"):
+    """
+    Rule-based UML model from the dependency parse of `text`, with a 0..1
+    confidence: the share of sentences the rules fully explained, less a
+    little per guessed pronoun; 0 when the result is too thin to be a diagram.
+    """
+    if not text or not can_parse():
+        return {}, 0.0
+    return extract_doc(nlp(text), diagram_type)
@@ -0,0 +1,109 @@
+from functools import lru_cache
+from services.model_patch import PatchError
+
+# ----------------------------
+# PlantUML from a ReactFlow graph
+# ----------------------------
+
+@lru_cache(maxsize=1 << 16)
+def _class_block(label, attributes):
+    return f"class {label} {{\n" + "".join(f"  +{attr}\n" for attr in attributes) + "}\n\n"
+
+@lru_cache(maxsize=1 << 16)
+def _edge_line(source, target, label):
+    return f"{source} --> {target}" + (f" : {label}" if label else "") + "\n"
+
+def node_block(node):
+    data = node.get("data", {})
+    return _class_block(data.get("label", node["id"]), tuple(data.get("attributes", [])))
+
+def edge_line(edge):
+    return _edge_line(edge["source"], edge["target"], edge.get("data", {}).get("label", ""))
+
+def flow_to_plantuml(nodes, edges):
+    """
+    PlantUML class diagram for a ReactFlow graph (nodes are classes, edges
+    associations). Fragments are memoized, so after a small edit only the
+    touched nodes/edges are rendered again; the rest is one join.
+    """
+    return "".join(["@startuml\n", *map(node_block, nodes), *map(edge_line, edges), "@enduml"])
+
+# ----------------------------
+# Node / edge deltas
+# ----------------------------
+
+# Keys whose change can alter the PlantUML (position, size, selection... cannot)
+_NODE_PLANTUML_KEYS = ("id", "data")
+_EDGE_PLANTUML_KEYS = ("source", "target", "data")
+
+def _section(patch, name):
+    section = patch.get(name) or {}
+    if not isinstance(section, dict):
+        raise PatchError(f"{name} must be an object with add/update/delete")
+    for key in ("add", "update", "delete"):
+        if not isinstance(section.get(key, []), list):
+            raise PatchError(f"{name}.{key} must be a list")
+    return section
+
+def _apply_section(items, section, what, required=("id",)):
+    """Apply add/update/delete to `items` in place; returns the ids whose PlantUML-relevant fields changed."""
+    index = {item.get("id"): i for i, item in enumerate(items)}
+    touched = set()
+
+    for item_id in section.get("delete", []):
+        if item_id not in index:
+            raise PatchError(f"{what} '{item_id}' not found")
+        items[index.pop(item_id)] = None
+        touched.add(item_id)
+
+    relevant = _NODE_PLANTUML_KEYS if what == "Node" else _EDGE_PLANTUML_KEYS
+    for change in section.get("update", []):
+        item_id = change.get("id") if isinstance(change, dict) else None
+        if item_id not in index:
+            raise PatchError(f"{what} '{item_id}' not found")
+        item = items[index[item_id]]
+        # top-level keys are replaced: send the whole "data"/"position" object that changed
+        if any(key in change and change[key] != item.get(key) for key in relevant):
+            touched.add(item_id)
+        item.update(change)
+
+    for item in section.get("add", []):
+        missing = [f for f in required if not isinstance(item, dict) or item.get(f) in (None, "")]
+        if missing:
+            raise PatchError(f"{what} to add is missing {', '.join(missing)}")
+        if item["id"] in index:
+            raise PatchError(f"{what} '{item['id']}' already exists")
+        index[item["id"]] = len(items)
+        items.append(dict(item))
+        touched.add(item["id"])
+
+    items[:] = [item for item in items if item is not None]
+    return touched
+
+def apply_flow_patch(graph, patch):
+    """
+    Apply node/edge deltas to a stored graph ({"nodes": [...], "edges": [...]})
+    in place. Returns True when the PlantUML needs regenerating, False for
+    layout-only changes such as drags.
+
+    patch: {"nodes": {"add": [node], "update": [{"id", ...changed keys}], "delete": [id]},
+            "edges": {...same...}}
+    Deleting a node also deletes the edges attached to its class.
+    """
+    nodes = graph.setdefault("nodes", [])
+    edges = graph.setdefault("edges", [])
+    node_section = _section(patch, "nodes")
+    edge_section = _section(patch, "edges")
+
+    labels = {n.get("id"): n.get("data", {}).get("label", n.get("id")) for n in nodes}
+    touched_nodes = _apply_section(nodes, node_section, "Node")
+
+    # edges may point at the node id (ReactFlow) or the class label (flow_to_plantuml output)
+    removed = {ref for i in node_section.get("delete", []) for ref in (i, labels[i])}
+    dangling = [e.get("id") for e in edges if e.get("source") in removed or e.get("target") in removed]
+    if dangling:
+        edge_section = {**edge_section, "delete": list(dict.fromkeys(edge_section.get("delete", []) + dangling))}
+        edge_section["update"] = [u for u in edge_section.get("update", []) if u.get("id") not in dangling]
+
+    touched_edges = _apply_section(edges, edge_section, "Edge", required=("id", "source", "target"))
+    return bool(touched_nodes or touched_edges)
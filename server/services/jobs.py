@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, delete
+from sqlalchemy.orm import aliased
+from db import db
+from models import GenerationJob
+from services import llm_scheduler
+
+# ----------------------------
+# Config
+# ----------------------------
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))                  # jobs run at once per process
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))        # idle check for jobs queued elsewhere
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))     # running jobs not renewed for this long are recovered
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))          # runs per job, counting recovered ones
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))  # finished jobs are deleted after this
+
+ACTIVE = ("queued", "running")
+_HOST = socket.gethostname()
+_OWNER = f"{_HOST}:{os.getpid()}"
+
+class QueueFull(Exception):
+    pass
+
+_handlers = {}
+
+def register(kind, handler):
+    """handler(params: dict, session_id) -> JSON-serializable result; raising marks the job as failed."""
+    _handlers[kind] = handler
+
+# ----------------------------
+# Recovery
+# ----------------------------
+
+def _owner_alive(owner):
+    host, _, pid = (owner or "").rpartition(":")
+    if host != _HOST or not pid.isdigit():
+        return None  # another machine: only its lease tells
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def recover():
+    """
+    Requeue running jobs whose worker is gone: the lease expired, or the owning
+    process on this host no longer exists (e.g. after a crash and restart).
+    Jobs that already used all their attempts are failed instead.
+    """
+    now = datetime.utcnow()
+    running = db.session.query(GenerationJob.id, GenerationJob.owner, GenerationJob.lease_until, GenerationJob.attempts).filter(
+        GenerationJob.status == "running").all()
+    orphaned = [
+        job for job in running
+        if job.owner != _OWNER and ((job.lease_until and job.lease_until < now) or _owner_alive(job.owner) is False)
+    ]
+    for job in orphaned:
+        stale = (GenerationJob.id == job.id, GenerationJob.status == "running", GenerationJob.owner == job.owner)
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            values = {"status": "error", "error": "Worker stopped while running this job", "finished_at": now}
+        else:
+            values = {"status": "queued", "owner": None, "lease_until": None}
+        db.session.execute(update(GenerationJob).where(*stale).values(**values))
+    db.session.commit()
+    if orphaned:
+        print(f"♻️ Recovered {len(orphaned)} interrupted job(s)")
+    return len(orphaned)
+
+def _purge():
+    cutoff = datetime.utcnow() - timedelta(hours=JOB_RETENTION_HOURS)
+    db.session.execute(delete(GenerationJob).where(
+        GenerationJob.status.notin_(ACTIVE), GenerationJob.finished_at < cutoff))
+    db.session.commit()
+
+# ----------------------------
+# Worker pool
+# ----------------------------
+
+class _Pool:
+    """
+    One dispatcher thread claims queued jobs from the table (so jobs submitted
+    to any process sharing the database get run) and hands them to at most
+    JOB_WORKERS worker threads; it also renews the leases of running jobs.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.started = False
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.slots = threading.Semaphore(JOB_WORKERS)
+        self.running = set()
+        self.finished = threading.Condition()
+        self.executor = None
+
+    def start(self, app):
+        with self.lock:
+            if self.started or JOB_WORKERS <= 0:
+                return
+            self.app = app
+            self.executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+            threading.Thread(target=self._dispatch, name="job-dispatcher", daemon=True).start()
+            self.started = True
+            print(f"🧵 Job pool started ({JOB_WORKERS} workers)")
+
+    def _dispatch(self):
+        last_sweep = 0.0
+        while True:
+            try:
+                with self.app.app_context():
+                    if time.monotonic() - last_sweep > min(JOB_LEASE_SECONDS / 3, 60):
+                        self._renew()
+                        recover()
+                        _purge()
+                        last_sweep = time.monotonic()
+                    if not self.slots.acquire(timeout=JOB_POLL_SECONDS):
+                        continue
+                    job_id = self._claim()
+                if job_id is None:
+                    self.slots.release()
+                    self.wake.wait(JOB_POLL_SECONDS)
+                    self.wake.clear()
+                    continue
+                self.executor.submit(self._run, job_id)
+            except Exception as e:
+                print(f"🔥 Job dispatcher error: {e}")
+                time.sleep(JOB_POLL_SECONDS)
+
+    def _claim(self):
+        """
+        Atomically move the oldest runnable queued job to running under this
+        process; None if there is none. A session's jobs run one at a time, in
+        order: each turn is built on the conversation the previous one wrote.
+        """
+        busy = aliased(GenerationJob)
+        session_busy = db.session.query(busy.id).filter(
+            busy.session_id == GenerationJob.session_id, busy.status == "running").exists()
+        candidates = db.session.query(GenerationJob.id, GenerationJob.session_id).filter(
+            GenerationJob.status == "queued", ~session_busy
+        ).order_by(GenerationJob.created_at).limit(20).all()
+        seen = set()
+        for job_id, session_id in candidates:
+            if session_id in seen:
+                continue  # a newer job of a session whose oldest is still queued
+            seen.add(session_id)
+            now = datetime.utcnow()
+            claimed = db.session.execute(update(GenerationJob).where(
+                GenerationJob.id == job_id, GenerationJob.status == "queued",
+                ~db.session.query(busy.id).filter(busy.session_id == session_id, busy.status == "running").exists()
+            ).values(
+                status="running", owner=_OWNER, attempts=GenerationJob.attempts + 1,
+                started_at=now, lease_until=now + timedelta(seconds=JOB_LEASE_SECONDS)
+            )).rowcount
+            db.session.commit()
+            if claimed:
+                with self.lock:
+                    self.running.add(job_id)
+                return job_id
+        return None
+
+    def _renew(self):
+        with self.lock:
+            running = list(self.running)
+        if running:
+            db.session.execute(update(GenerationJob).where(
+                GenerationJob.id.in_(running), GenerationJob.owner == _OWNER, GenerationJob.status == "running"
+            ).values(lease_until=datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)))
+            db.session.commit()
+
+    def _run(self, job_id):
+        try:
+            with self.app.app_context():
+                job = db.session.get(GenerationJob, job_id)
+                values = {"lease_until": None}
+                try:
+                    handler = _handlers[job.kind]
+                    # nobody is blocked on a job's request: interactive calls go first
+                    with llm_scheduler.priority("background"):
+                        result = handler(json.loads(job.params), job.session_id)
+                    values.update(status="done", result=json.dumps(result))
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"🔥 Job {job_id} failed: {e}")
+                    values.update(status="error", error=str(e))
+                values["finished_at"] = datetime.utcnow()
+                # a job recovered by another process meanwhile is theirs now
+                db.session.execute(update(GenerationJob).where(
+                    GenerationJob.id == job_id, GenerationJob.owner == _OWNER, GenerationJob.status == "running"
+                ).values(**values))
+                db.session.commit()
+        except Exception as e:
+            print(f"🔥 Job {job_id} could not be saved: {e}")
+        finally:
+            with self.lock:
+                self.running.discard(job_id)
+            self.slots.release()
+            self.wake.set()
+            with self.finished:
+                self.finished.notify_all()
+
+_pool = _Pool()
+
+def init_app(app):
+    """Recover jobs interrupted by a crash; start the pool now if any are waiting."""
+    with app.app_context():
+        recover()
+        pending = db.session.query(GenerationJob.id).filter(GenerationJob.status == "queued").first()
+    if pending:
+        _pool.start(app)
+
+def stats() -> dict:
+    counts = dict(db.session.query(GenerationJob.status, db.func.count()).group_by(GenerationJob.status).all())
+    with _pool.lock:
+        return {"workers": JOB_WORKERS if _pool.started else 0, "running_here": len(_pool.running), "jobs": counts}
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def submit(kind, params, session_id=None, key=None):
+    """
+    Queue a job; returns (job, created). An active job with the same key is
+    returned instead of queueing a duplicate.
+    """
+    if key:
+        existing = GenerationJob.query.filter(GenerationJob.key == key, GenerationJob.status.in_(ACTIVE)).first()
+        if existing:
+            return existing, False
+    queued = db.session.query(db.func.count(GenerationJob.id)).filter(GenerationJob.status == "queued").scalar()
+    if queued >= JOB_MAX_QUEUED:
+        raise QueueFull(f"{queued} jobs are waiting")
+
+    job = GenerationJob(
+        id=str(uuid.uuid4()),
+        kind=kind,
+        key=key,
+        session_id=session_id,
+        params=json.dumps(params)
+    )
+    db.session.add(job)
+    db.session.commit()
+    _pool.start(current_app._get_current_object())
+    _pool.wake.set()
+    return job, True
+
+def wait(job_id, timeout):
+    """The job once it is no longer active, or as it is when `timeout` seconds have passed; None if unknown."""
+    deadline = time.monotonic() + timeout
+    while True:
+        db.session.rollback()  # fresh read, not the session's cached row
+        job = db.session.get(GenerationJob, job_id)
+        remaining = deadline - time.monotonic()
+        if job is None or job.status not in ACTIVE or remaining <= 0:
+            return job
+        # finished here: woken at once; finished in another process: seen on the next poll
+        with _pool.finished:
+            _pool.finished.wait(min(remaining, JOB_POLL_SECONDS))
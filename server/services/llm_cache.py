@@ -0,0 +1,263 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from flask import has_app_context
+from sqlalchemy import select, update, delete, func
+from db import db, is_sqlite, engine_options
+from models import LLMCacheEntry
+
+# ----------------------------
+# Config
+# ----------------------------
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "256"))
+CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "5000"))
+# Queued stores and hit counts applied per write transaction
+CACHE_WRITE_BATCH = int(os.getenv("LLM_CACHE_WRITE_BATCH", "100"))
+
+_lock = threading.Lock()
+_memory = OrderedDict()  # key -> (value, stored_at)
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "write_errors": 0}
+_table = LLMCacheEntry.__table__
+
+# ----------------------------
+# Keys
+# ----------------------------
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic differences map to the same key."""
+    return " ".join((text or "").split())
+
+def content_hash(value) -> str:
+    """Stable hash of existing PlantUML (str) or model (dict/list)."""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        raw = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    else:
+        raw = str(value).strip()
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def make_key(kind, diagram_type, text, existing=None, model_name="gpt-4", temperature=0.2) -> str:
+    """Content-addressed key for one LLM call."""
+    parts = [
+        kind,
+        diagram_type or "",
+        normalize_text(text),
+        content_hash(existing),
+        model_name,
+        f"{float(temperature):.3f}",
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+# ----------------------------
+# Tiers
+# ----------------------------
+
+def _expired(stored_at: datetime) -> bool:
+    return stored_at < datetime.utcnow() - timedelta(seconds=CACHE_TTL_SECONDS)
+
+def _remember(key, value, stored_at):
+    with _lock:
+        _memory[key] = (value, stored_at)
+        _memory.move_to_end(key)
+        while len(_memory) > CACHE_MEMORY_SIZE:
+            _memory.popitem(last=False)
+
+def _engine():
+    """
+    Engine of the database tier, or None without one: outside an app context,
+    and for in-memory SQLite, which no other process or later run can see.
+    """
+    if not has_app_context():
+        return None
+    url = db.engine.url.render_as_string(hide_password=False)
+    if is_sqlite(url) and not engine_options(url):
+        return None
+    return db.engine
+
+# ----------------------------
+# Writer
+# ----------------------------
+
+class _Writer:
+    """
+    The database tier's writes (stored replies, hit counts) leave the request
+    thread: one daemon thread applies them in short transactions of its own.
+    A request never holds SQLite's write lock for the cache, through the LLM
+    call or a batch stream that follows, nor waits on a lock it holds itself;
+    and a stored reply survives the request rolling back.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.queue = deque()  # (engine, op, key, values)
+        self.busy = False
+        self.thread = None
+
+    def submit(self, engine, op, key, values=None):
+        with self.cond:
+            self.queue.append((engine, op, key, values))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="llm-cache-writer", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def flush(self, timeout=None) -> bool:
+        """Wait until every queued write is applied; False on timeout."""
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.queue and not self.busy, timeout)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.queue)
+                batch = [self.queue.popleft() for _ in range(min(len(self.queue), CACHE_WRITE_BATCH))]
+                self.busy = True
+            try:
+                by_engine = {}
+                for engine, op, key, values in batch:
+                    by_engine.setdefault(engine, []).append((op, key, values))
+                for engine, ops in by_engine.items():
+                    try:
+                        _apply(engine, ops)
+                    except Exception as e:
+                        with _lock:
+                            _stats["write_errors"] += 1
+                        print("⚠️ LLM cache write error:", e)
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+_writer = _Writer()
+
+def _apply(engine, ops):
+    """One transaction: the batch's stores, then its hit counts (summed per key), then eviction."""
+    now = datetime.utcnow()
+    stores, hits = {}, {}
+    for op, key, values in ops:
+        if op == "put":
+            stores[key] = values  # the latest reply for a key wins
+        else:
+            count, _ = hits.get(key, (0, None))
+            hits[key] = (count + 1, values)
+    with engine.begin() as conn:
+        if stores:
+            conn.execute(delete(_table).where(_table.c.key.in_(list(stores))))
+            conn.execute(_table.insert(), list(stores.values()))
+        for key, (count, used_at) in hits.items():
+            conn.execute(update(_table).where(_table.c.key == key).values(
+                hits=_table.c.hits + count, last_used_at=used_at))
+        if stores:
+            _evict(conn, now)
+
+def flush(timeout=None) -> bool:
+    """Wait for queued database writes (tests, shutdown)."""
+    return _writer.flush(timeout)
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def get(key):
+    """Return the cached reply for key, or None. Memory first, then the database."""
+    if not CACHE_ENABLED:
+        return None
+
+    with _lock:
+        entry = _memory.get(key)
+        if entry:
+            value, stored_at = entry
+            if not _expired(stored_at):
+                _memory.move_to_end(key)
+                _stats["memory_hits"] += 1
+                return value
+            del _memory[key]
+
+    engine = _engine()
+    if engine is not None:
+        try:
+            # own connection, read only: the request's session is neither flushed nor locked
+            with engine.connect() as conn:
+                row = conn.execute(
+                    select(_table.c.value, _table.c.created_at).where(_table.c.key == key)
+                ).first()
+            if row and not _expired(row.created_at):
+                _writer.submit(engine, "hit", key, datetime.utcnow())
+                _remember(key, row.value, row.created_at)
+                with _lock:
+                    _stats["db_hits"] += 1
+                return row.value
+        except Exception as e:
+            print("⚠️ LLM cache read error:", e)
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+def put(key, value, kind="", diagram_type=""):
+    """Store a reply in both tiers (the database one asynchronously) and evict expired/oldest rows."""
+    if not CACHE_ENABLED or not value:
+        return
+
+    now = datetime.utcnow()
+    _remember(key, value, now)
+    with _lock:
+        _stats["stores"] += 1
+
+    engine = _engine()
+    if engine is not None:
+        _writer.submit(engine, "put", key, dict(
+            key=key,
+            kind=kind,
+            diagram_type=diagram_type,
+            value=value,
+            hits=0,
+            created_at=now,
+            last_used_at=now,
+        ))
+
+def _evict(conn, now):
+    cutoff = now - timedelta(seconds=CACHE_TTL_SECONDS)
+    removed = conn.execute(delete(_table).where(_table.c.created_at < cutoff)).rowcount or 0
+
+    count = conn.execute(select(func.count()).select_from(_table)).scalar() or 0
+    excess = count - CACHE_MAX_ROWS
+    if excess > 0:
+        oldest = select(_table.c.key).order_by(_table.c.last_used_at.asc()).limit(excess)
+        removed += conn.execute(delete(_table).where(_table.c.key.in_(oldest))).rowcount or 0
+
+    if removed:
+        with _lock:
+            _stats["evictions"] += removed
+
+def clear_memory():
+    with _lock:
+        _memory.clear()
+
+def stats() -> dict:
+    """Hit/miss counters plus tier sizes."""
+    with _lock:
+        result = dict(_stats)
+        result["memory_entries"] = len(_memory)
+    lookups = result["memory_hits"] + result["db_hits"] + result["misses"]
+    result["hit_rate"] = round((result["memory_hits"] + result["db_hits"]) / lookups, 4) if lookups else 0.0
+    result["enabled"] = CACHE_ENABLED
+
+    with _writer.cond:
+        result["pending_writes"] = len(_writer.queue)
+    engine = _engine()
+    result["db_entries"] = None
+    if engine is not None:
+        try:
+            with engine.connect() as conn:
+                result["db_entries"] = conn.execute(select(func.count()).select_from(_table)).scalar()
+        except Exception:
+            pass
+    return result
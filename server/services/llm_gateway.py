@@ -0,0 +1,353 @@
+import os
+import json
+import asyncio
+import threading
+import importlib.util
+import concurrent.futures
+import queue
+from pathlib import Path
+import httpx
+from dotenv import load_dotenv
+from services import llm_scheduler
+from services.llm_scheduler import Scheduler
+
+load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
+
+# ----------------------------
+# Config
+# ----------------------------
+
+API_BASE = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+HTTP2 = os.getenv("LLM_HTTP2", "1") not in ("0", "false", "False") and importlib.util.find_spec("h2") is not None
+
+_STREAM_DONE = object()
+
+
+class LLMError(Exception):
+    """Non-200 reply (or transport failure) from the chat-completions API."""
+
+    def __init__(self, status, body="", retry_after=None):
+        super().__init__(f"LLM API error {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after  # seconds, when the upstream said
+
+
+def completion_text(data: dict) -> str:
+    """Message content of a chat-completions response body."""
+    return data["choices"][0]["message"]["content"] or ""
+
+
+class LLMGateway:
+    """
+    Single pooled entry point for chat-completion calls.
+    One httpx.AsyncClient (keep-alive, HTTP/2 when `h2` is installed) lives on a
+    background event loop; Flask workers call the blocking wrappers, which
+    enforce per-call timeouts and cancel the request on timeout. Every call
+    goes through the loop's Scheduler (rate limits, adaptive concurrency,
+    priorities) and is retried with backoff on 429s and transient errors.
+    """
+
+    def __init__(self, base_url=API_BASE, api_key=None, max_concurrency=MAX_CONCURRENCY,
+                 max_connections=MAX_CONNECTIONS, http2=HTTP2,
+                 rpm=llm_scheduler.RPM_LIMIT, tpm=llm_scheduler.TPM_LIMIT):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY", "")
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._client = None
+        self._scheduler = None
+
+    # ----------------------------
+    # Event loop plumbing
+    # ----------------------------
+
+    def _ensure_started(self):
+        # Recreate after fork (gunicorn preload) - loops and sockets do not survive it
+        if self._loop is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    http2=self.http2,
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    ),
+                    headers={
+                        "Authorization": f"Bearer {self.api_key}",
+                        "Content-Type": "application/json",
+                    },
+                    timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=10.0),
+                )
+                self._scheduler = Scheduler(loop, self.max_concurrency, self.rpm, self.tpm)
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name="llm-gateway", daemon=True).start()
+            ready.wait()
+            self._loop = loop
+            self._pid = os.getpid()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the gateway loop."""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the gateway loop and block for its result; cancels on timeout."""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError("LLM call timed out")
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self):
+        if self._loop is None or self._pid != os.getpid():
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    # ----------------------------
+    # Async API
+    # ----------------------------
+
+    def _body(self, messages, model, temperature, stream=False):
+        body = {"model": model, "messages": messages, "temperature": temperature}
+        if stream:
+            body["stream"] = True
+        return body
+
+    async def _admitted(self, priority, cost, send, deadline):
+        """
+        Run `send()` (one upstream attempt, returning an httpx response) once the
+        scheduler admits it; retry 429s and transient failures with backoff
+        while the deadline allows. Returns (response, latency) for a 200, still
+        holding its slot: the caller must release() it.
+        """
+        scheduler = self._scheduler
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            await scheduler.acquire(priority, cost)
+            started = loop.time()
+            try:
+                resp = await send()
+                error = None if resp.status_code == 200 else LLMError(
+                    resp.status_code, await self._error_text(resp), llm_scheduler.retry_after(resp.headers))
+            except httpx.HTTPError as e:
+                resp, error = None, LLMError(0, str(e))
+            except BaseException:
+                scheduler.release()
+                raise
+            latency = loop.time() - started
+
+            if error is None:
+                return resp, latency
+            scheduler.release()
+            if resp is not None:
+                await resp.aclose()
+            if error.status == 429:
+                scheduler.on_throttled(error.retry_after)
+            if error.status not in llm_scheduler.RETRY_STATUSES or attempt >= llm_scheduler.MAX_RETRIES:
+                raise error
+            delay = llm_scheduler.backoff(attempt, error.retry_after)
+            if loop.time() + delay >= deadline:
+                raise error
+            scheduler.on_retry()
+            print(f"🔁 LLM {error.status or 'transport error'}, retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    async def _error_text(resp):
+        return (await resp.aread()).decode("utf-8", "replace")
+
+    async def acomplete(self, messages, model="gpt-4", temperature=0.2, timeout=None, priority="interactive"):
+        """POST /chat/completions and return the decoded JSON body."""
+        timeout = timeout or DEFAULT_TIMEOUT
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        cost = llm_scheduler.estimate_tokens(messages)
+
+        def send():
+            return self._client.post(
+                "/chat/completions",
+                json=self._body(messages, model, temperature),
+                timeout=max(0.1, deadline - loop.time()),
+            )
+
+        async def call():
+            resp, latency = await self._admitted(priority, cost, send, deadline)
+            try:
+                data = resp.json()
+                self._scheduler.on_success(latency, cost, (data.get("usage") or {}).get("total_tokens"))
+                return data
+            finally:
+                self._scheduler.release()
+
+        return await asyncio.wait_for(call(), timeout)
+
+    async def astream(self, messages, model="gpt-4", temperature=0.2, timeout=None, priority="interactive"):
+        """
+        Yield content deltas from a streamed chat completion. Failures before
+        the first byte are retried like acomplete(); a broken stream is not.
+        """
+        timeout = timeout or DEFAULT_TIMEOUT
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        cost = llm_scheduler.estimate_tokens(messages)
+
+        def send():
+            request = self._client.build_request(
+                "POST",
+                "/chat/completions",
+                json=self._body(messages, model, temperature, stream=True),
+                timeout=max(0.1, deadline - loop.time()),
+            )
+            return self._client.send(request, stream=True)
+
+        resp, latency = await self._admitted(priority, cost, send, deadline)
+        # time to the first byte: a stream's length says nothing about congestion
+        self._scheduler.on_success(latency, cost)
+        try:
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                choices = chunk.get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta:
+                    yield delta
+        except httpx.HTTPError as e:
+            raise LLMError(0, str(e))
+        finally:
+            await resp.aclose()
+            self._scheduler.release()
+
+    def stats(self) -> dict:
+        """Scheduler state: current concurrency limit, queue, throttling counters."""
+        if self._scheduler is None or self._pid != os.getpid():
+            return {}
+        return self.run(self._astats(), 5)
+
+    async def _astats(self):
+        return self._scheduler.stats()
+
+    # ----------------------------
+    # Blocking API (Flask workers)
+    # ----------------------------
+
+    # `priority` defaults to the caller's llm_scheduler.priority() context ("interactive")
+
+    def complete(self, messages, model="gpt-4", temperature=0.2, timeout=None, priority=None) -> dict:
+        timeout = timeout or DEFAULT_TIMEOUT
+        priority = priority or llm_scheduler.current_priority()
+        return self.run(self.acomplete(messages, model, temperature, timeout, priority), timeout + 1)
+
+    def complete_many(self, calls, concurrency=None, timeout=None, priority="batch"):
+        """
+        Fan out many completions at once, at most `concurrency` in flight.
+        `calls` is a list of dicts with messages/model/temperature; yields
+        (index, response_body, error) in completion order. Batch priority:
+        interactive calls are admitted ahead of queued batch items.
+        """
+        concurrency = max(1, min(concurrency or self.max_concurrency, len(calls) or 1))
+        results = queue.Queue()
+
+        async def one(index, call, limit):
+            async with limit:
+                try:
+                    data = await self.acomplete(
+                        call["messages"],
+                        call.get("model", "gpt-4"),
+                        call.get("temperature", 0.2),
+                        timeout,
+                        priority,
+                    )
+                    results.put((index, data, None))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    results.put((index, None, e))
+
+        async def fan_out():
+            limit = asyncio.Semaphore(concurrency)
+            await asyncio.gather(*(one(i, call, limit) for i, call in enumerate(calls)))
+
+        future = self.submit(fan_out())
+        try:
+            for _ in range(len(calls)):
+                yield results.get()
+        finally:
+            future.cancel()
+
+    def stream(self, messages, model="gpt-4", temperature=0.2, timeout=None, priority=None):
+        """
+        Blocking iterator over content deltas. Closing the iterator early
+        (e.g. the SSE client disconnects) cancels the upstream request.
+        """
+        timeout = timeout or DEFAULT_TIMEOUT
+        priority = priority or llm_scheduler.current_priority()
+        deltas = queue.Queue()
+
+        async def pump():
+            try:
+                async for delta in self.astream(messages, model, temperature, timeout, priority):
+                    deltas.put(delta)
+                deltas.put(_STREAM_DONE)
+            except BaseException as e:
+                deltas.put(e)
+                raise
+
+        future = self.submit(pump())
+        try:
+            while True:
+                try:
+                    item = deltas.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError("LLM stream stalled")
+                if item is _STREAM_DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway() -> LLMGateway:
+    """Process-wide gateway instance."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,254 @@
+import os
+import time
+import heapq
+import random
+import itertools
+import contextvars
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# Upstream quota; 0 turns a bucket off (the 429s then drive everything)
+RPM_LIMIT = float(os.getenv("LLM_RPM_LIMIT", "0"))
+TPM_LIMIT = float(os.getenv("LLM_TPM_LIMIT", "0"))
+# Providers enforce per-minute quotas over shorter windows too; bursts stay within this many seconds' worth
+RATE_BURST_SECONDS = float(os.getenv("LLM_RATE_BURST_SECONDS", "1"))
+COMPLETION_TOKENS_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "600"))  # reserved per call, settled from `usage`
+
+MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+# Calls slower than this multiple of the fastest recent ones count as upstream congestion
+LATENCY_TOLERANCE = float(os.getenv("LLM_LATENCY_TOLERANCE", "3"))
+# Slots only interactive calls may take, so they never queue behind batch work
+INTERACTIVE_RESERVE = int(os.getenv("LLM_INTERACTIVE_RESERVE", "1"))
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "20"))
+RETRY_STATUSES = {0, 408, 409, 429, 500, 502, 503, 504}  # 0 = transport error
+
+# Priority classes: lower runs first
+PRIORITIES = {"interactive": 0, "background": 1, "batch": 2}
+
+_priority = contextvars.ContextVar("llm_priority", default="interactive")
+
+@contextmanager
+def priority(name):
+    """`with priority("background"): ...` tags the LLM calls made inside it (this thread/context)."""
+    if name not in PRIORITIES:
+        raise ValueError(f"priority must be one of {tuple(PRIORITIES)}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> str:
+    return _priority.get()
+
+# ----------------------------
+# Retry helpers
+# ----------------------------
+
+def retry_after(headers) -> float | None:
+    """Seconds the upstream asked us to wait (retry-after-ms, Retry-After seconds or HTTP date)."""
+    if headers is None:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff(attempt, hint=None) -> float:
+    """Delay before retry number `attempt` (0-based): the server's hint, else full-jitter exponential."""
+    if hint is not None:
+        return min(hint, BACKOFF_CAP) + random.uniform(0, BACKOFF_BASE)  # jitter spreads the herd
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def estimate_tokens(messages) -> int:
+    """Prompt size by the 4-characters-per-token rule, plus the completion we expect."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + COMPLETION_TOKENS_ESTIMATE
+
+# ----------------------------
+# Token bucket
+# ----------------------------
+
+class TokenBucket:
+    """`per_minute` units, refilled continuously, bursting up to `burst_seconds` worth."""
+
+    def __init__(self, per_minute, clock=time.monotonic, burst_seconds=RATE_BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount) -> float:
+        """Seconds until `amount` can be taken (0 = now). Larger than the capacity waits for a full bucket."""
+        self._refill()
+        needed = min(amount, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+    def settle(self, amount):
+        """Correct an earlier take() by `amount` (negative gives tokens back); may go into debt."""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+# ----------------------------
+# Scheduler
+# ----------------------------
+
+class Scheduler:
+    """
+    Admission control for upstream calls, living on the gateway's event loop
+    (single-threaded, so no locks). A call waits until, in priority order:
+      - the adaptive concurrency limit has a free slot (AIMD: +1 per limit's
+        worth of fast successes, halved on a 429 or a congested reply),
+      - the request and token buckets can pay for it,
+      - any Retry-After pause from the upstream has passed.
+    Interactive calls are admitted before queued background/batch ones and
+    INTERACTIVE_RESERVE slots are kept for them.
+    """
+
+    def __init__(self, loop, max_concurrency, rpm=RPM_LIMIT, tpm=TPM_LIMIT):
+        self.loop = loop
+        self.max_limit = max(MIN_CONCURRENCY, max_concurrency)
+        self.limit = float(self.max_limit)
+        self.inflight = 0
+        self.requests = TokenBucket(rpm, loop.time) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, loop.time) if tpm > 0 else None
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.fastest = None       # decaying minimum latency
+        self.waiters = []         # heap of [priority, seq, cost, future]
+        self._seq = itertools.count()
+        self._timer = None
+        self.counters = {"admitted": 0, "throttled": 0, "congested": 0, "retries": 0}
+
+    # ---- admission ----
+
+    async def acquire(self, priority_name, cost):
+        future = self.loop.create_future()
+        entry = [PRIORITIES.get(priority_name, 0), next(self._seq), cost, future]
+        heapq.heappush(self.waiters, entry)
+        self._pump()
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self.release()  # admitted just as we were cancelled
+            raise
+
+    def release(self):
+        self.inflight -= 1
+        self._pump()
+
+    def _slots(self, priority):
+        limit = max(MIN_CONCURRENCY, int(self.limit))
+        if priority > 0 and limit > INTERACTIVE_RESERVE:
+            limit -= INTERACTIVE_RESERVE
+        return limit
+
+    def _pump(self):
+        while self.waiters:
+            priority, _, cost, future = self.waiters[0]
+            if future.done():  # cancelled while queued
+                heapq.heappop(self.waiters)
+                continue
+            if self.inflight >= self._slots(priority):
+                return  # release() pumps again
+            now = self.loop.time()
+            wait = self.paused_until - now
+            if self.requests is not None:
+                wait = max(wait, self.requests.delay(1))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.delay(cost))
+            if wait > 0:
+                self._wake_in(wait)
+                return
+            heapq.heappop(self.waiters)
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(cost)
+            self.inflight += 1
+            self.counters["admitted"] += 1
+            future.set_result(None)
+
+    def _wake_in(self, delay):
+        when = self.loop.time() + delay
+        if self._timer is not None and self._timer.when() <= when:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self.loop.call_at(when, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._pump()
+
+    # ---- feedback ----
+
+    def on_success(self, latency, cost, used_tokens=None):
+        if self.tokens is not None and used_tokens:
+            self.tokens.settle(used_tokens - cost)
+        # the baseline creeps up so an old, lucky minimum does not stick forever
+        self.fastest = latency if self.fastest is None else min(latency, self.fastest * 1.05)
+        if latency > self.fastest * LATENCY_TOLERANCE and latency > 0.05:
+            self.counters["congested"] += 1
+            self._decrease(0.9)
+        elif self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self._pump()
+
+    def on_throttled(self, hint=None):
+        """A 429: halve the limit and, if the upstream said how long, hold every queued call that long."""
+        self.counters["throttled"] += 1
+        self._decrease(0.5)
+        if hint:
+            self.paused_until = max(self.paused_until, self.loop.time() + min(hint, BACKOFF_CAP))
+
+    def on_retry(self):
+        self.counters["retries"] += 1
+
+    def _decrease(self, factor):
+        # at most once per typical call duration: one burst of 429s is one signal
+        now = self.loop.time()
+        if now - self.last_decrease < (self.fastest or 0.1):
+            return
+        self.last_decrease = now
+        self.limit = max(float(MIN_CONCURRENCY), self.limit * factor)
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "max_limit": self.max_limit,
+            "inflight": self.inflight,
+            "queued": sum(1 for w in self.waiters if not w[3].done()),
+            "paused_for_s": round(max(0.0, self.paused_until - self.loop.time()), 3),
+            **self.counters,
+        }
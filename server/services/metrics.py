@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import threading
+from flask import g, has_request_context, request
+
+# ----------------------------
+# Config
+# ----------------------------
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "False")
+TRACE_LOG = os.getenv("METRICS_TRACE_LOG", "1") not in ("0", "false", "False")
+
+# Prometheus defaults, stretched to cover multi-second LLM calls
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_registry = []
+
+# ----------------------------
+# Instruments
+# ----------------------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, rendered in the Prometheus text format."""
+
+    def __init__(self, name, help, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _labels(self.labelnames, key, [f'le="{_number(bound)}"'])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            inf = _labels(self.labelnames, key, ['le="+Inf"'])
+            lines.append(f"{self.name}_bucket{inf} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "uml_request_duration_seconds", "HTTP request latency.", ("route", "method", "status"))
+STAGE_SECONDS = Histogram(
+    "uml_stage_duration_seconds", "Time spent in one stage of a request.", ("route", "stage"))
+LLM_TOKENS = Counter(
+    "uml_llm_tokens_total", "Tokens reported by the chat-completions API.", ("kind", "direction"))
+LLM_CALLS = Counter(
+    "uml_llm_calls_total", "Chat-completion calls by purpose and outcome.", ("kind", "outcome"))
+RESULT_SOURCE = Counter(
+    "uml_diagram_source_total",
+    "Where the returned diagram came from: similar, local, plantuml, json, ops, parsed_text or fallback.",
+    ("diagram_type", "source"))
+GENERATE_ROUTE = Counter(
+    "uml_generate_route_total",
+    "Generate requests answered from a similar earlier description, by the local extractor, or by the LLM.",
+    ("diagram_type", "route"))
+
+# ----------------------------
+# Per-request tracing
+# ----------------------------
+
+def _route() -> str:
+    return (request.endpoint or "") if has_request_context() else ""
+
+def _trace():
+    return g.get("_metrics_trace") if has_request_context() else None
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, route=_route(), stage=self.name)
+        trace = _trace()
+        if trace is not None:
+            stages = trace["stages"]
+            stages[self.name] = stages.get(self.name, 0) + elapsed
+        return False
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+def stage(name):
+    """`with stage("llm"): ...` times one step of the current request."""
+    return _Stage(name) if METRICS_ENABLED else _NOOP
+
+def record_llm(kind, response=None, outcome="ok"):
+    """Count one LLM call and the token usage from its response body (if any)."""
+    if not METRICS_ENABLED:
+        return
+    LLM_CALLS.inc(kind=kind, outcome=outcome)
+    usage = (response or {}).get("usage") or {}
+    prompt, completion = usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+    if prompt:
+        LLM_TOKENS.inc(prompt, kind=kind, direction="prompt")
+    if completion:
+        LLM_TOKENS.inc(completion, kind=kind, direction="completion")
+    trace = _trace()
+    if trace is not None:
+        trace["tokens"]["prompt"] += prompt
+        trace["tokens"]["completion"] += completion
+
+def record_source(diagram_type, source):
+    """Which path of the PlantUML -> JSON -> parsed text -> canned example cascade produced the diagram."""
+    if not METRICS_ENABLED:
+        return
+    RESULT_SOURCE.inc(diagram_type=diagram_type, source=source)
+    trace = _trace()
+    if trace is not None:
+        trace["source"] = source
+
+def record_route(diagram_type, route):
+    """`reuse` (services.similar), `local` (services.extractor) or `llm`; only `llm` calls the LLM."""
+    if not METRICS_ENABLED:
+        return
+    GENERATE_ROUTE.inc(diagram_type=diagram_type, route=route)
+    trace = _trace()
+    if trace is not None:
+        trace["answered_by"] = route
+
+# ----------------------------
+# Flask wiring
+# ----------------------------
+
+def _start_trace():
+    g._metrics_trace = {"start": time.perf_counter(), "stages": {}, "tokens": {"prompt": 0, "completion": 0}}
+
+def _finish_trace(response):
+    trace = g.pop("_metrics_trace", None)
+    if trace is None:
+        return response
+    elapsed = time.perf_counter() - trace["start"]
+    route = request.endpoint or "unknown"
+    REQUEST_SECONDS.observe(elapsed, route=route, method=request.method, status=response.status_code)
+
+    # Streamed bodies run after this hook; their stages still reach the histograms
+    if trace["stages"]:
+        response.headers["Server-Timing"] = ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace["stages"].items())
+    if TRACE_LOG and route != "metrics.metrics_endpoint":
+        record = {
+            "route": route,
+            "status": response.status_code,
+            "ms": round(elapsed * 1000, 2),
+            "stages": {name: round(seconds * 1000, 2) for name, seconds in trace["stages"].items()},
+        }
+        if any(trace["tokens"].values()):
+            record["tokens"] = trace["tokens"]
+        if "source" in trace:
+            record["source"] = trace["source"]
+        if "answered_by" in trace:
+            record["answered_by"] = trace["answered_by"]
+        print("⏱️ " + json.dumps(record))
+    return response
+
+def init_app(app):
+    """Install the per-request tracing hooks (no-op when METRICS_ENABLED=0)."""
+    if not METRICS_ENABLED:
+        return
+    app.before_request(_start_trace)
+    app.after_request(_finish_trace)
+
+def render() -> str:
+    """All instruments in the Prometheus text exposition format."""
+    with _lock:
+        lines = []
+        for instrument in _registry:
+            lines.extend(instrument.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,291 @@
+import copy
+
+# ----------------------------
+# Errors
+# ----------------------------
+
+class PatchError(ValueError):
+    """An edit operation is malformed or does not apply to the current model."""
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+def _find(items, key, value, what):
+    for item in items:
+        if item.get(key) == value:
+            return item
+    raise PatchError(f"{what} '{value}' not found")
+
+def _require_absent(items, value, what, key=None):
+    for item in items:
+        if (item.get(key) if key else item) == value:
+            raise PatchError(f"{what} '{value}' already exists")
+
+def _remove_value(values, value, what):
+    if value not in values:
+        raise PatchError(f"{what} '{value}' not found")
+    values.remove(value)
+
+def _rename_value(values, value, new_value, what):
+    if value not in values:
+        raise PatchError(f"{what} '{value}' not found")
+    values[values.index(value)] = new_value
+
+def _rename_refs(items, fields, old, new):
+    for item in items:
+        for field in fields:
+            if item.get(field) == old:
+                item[field] = new
+
+# ----------------------------
+# CLASS DIAGRAM
+# ----------------------------
+
+def _add_class(m, op):
+    _require_absent(m["classes"], op["name"], "Class", key="name")
+    m["classes"].append({
+        "name": op["name"],
+        "attributes": list(op.get("attributes") or []),
+        "methods": list(op.get("methods") or []),
+    })
+
+def _remove_class(m, op):
+    m["classes"].remove(_find(m["classes"], "name", op["name"], "Class"))
+    m["relationships"] = [r for r in m["relationships"] if op["name"] not in (r.get("from"), r.get("to"))]
+
+def _rename_class(m, op):
+    _require_absent(m["classes"], op["new_name"], "Class", key="name")
+    _find(m["classes"], "name", op["name"], "Class")["name"] = op["new_name"]
+    _rename_refs(m["relationships"], ("from", "to"), op["name"], op["new_name"])
+
+def _member_op(field, action):
+    what = "Attribute" if field == "attributes" else "Method"
+
+    def apply(m, op):
+        values = _find(m["classes"], "name", op["class"], "Class").setdefault(field, [])
+        if action == "add":
+            _require_absent(values, op["value"], what)
+            values.append(op["value"])
+        elif action == "remove":
+            _remove_value(values, op["value"], what)
+        else:
+            _rename_value(values, op["value"], op["new_value"], what)
+    return apply
+
+def _add_relationship(m, op):
+    m["relationships"].append({
+        "from": op["from"],
+        "to": op["to"],
+        "type": op.get("type", "association"),
+        "label": op.get("label", ""),
+    })
+
+def _matching_relationships(m, op):
+    matches = [r for r in m["relationships"]
+               if r.get("from") == op["from"] and r.get("to") == op["to"]
+               and ("type" not in op or r.get("type") == op["type"])]
+    if not matches:
+        raise PatchError(f"Relationship {op['from']} -> {op['to']} not found")
+    return matches
+
+def _remove_relationship(m, op):
+    for rel in _matching_relationships(m, op):
+        m["relationships"].remove(rel)
+
+def _update_relationship(m, op):
+    rel = _matching_relationships(m, op)[0]
+    for field in ("new_type", "new_label"):
+        if field in op:
+            rel[field[4:]] = op[field]
+
+# ----------------------------
+# USE CASE DIAGRAM
+# ----------------------------
+
+def _add_actor(m, op):
+    _require_absent(m["actors"], op["name"], "Actor")
+    m["actors"].append(op["name"])
+
+def _remove_actor(m, op):
+    _remove_value(m["actors"], op["name"], "Actor")
+    m["associations"] = [a for a in m["associations"] if a.get("actor") != op["name"]]
+
+def _rename_actor(m, op):
+    _require_absent(m["actors"], op["new_name"], "Actor")
+    _rename_value(m["actors"], op["name"], op["new_name"], "Actor")
+    _rename_refs(m["associations"], ("actor",), op["name"], op["new_name"])
+
+def _add_use_case(m, op):
+    _require_absent(m["use_cases"], op["name"], "Use case")
+    m["use_cases"].append(op["name"])
+
+def _remove_use_case(m, op):
+    name = op["name"]
+    _remove_value(m["use_cases"], name, "Use case")
+    m["associations"] = [a for a in m["associations"] if a.get("use_case") != name]
+    m["includes"] = [i for i in m["includes"] if name not in (i.get("from"), i.get("to"))]
+    m["extends"] = [e for e in m["extends"] if name not in (e.get("from"), e.get("to"))]
+
+def _rename_use_case(m, op):
+    _require_absent(m["use_cases"], op["new_name"], "Use case")
+    _rename_value(m["use_cases"], op["name"], op["new_name"], "Use case")
+    _rename_refs(m["associations"], ("use_case",), op["name"], op["new_name"])
+    _rename_refs(m["includes"], ("from", "to"), op["name"], op["new_name"])
+    _rename_refs(m["extends"], ("from", "to"), op["name"], op["new_name"])
+
+def _link_op(field, keys, action):
+    def apply(m, op):
+        link = {k: op[k] for k in keys}
+        if action == "add":
+            if link not in m[field]:
+                m[field].append(link)
+        else:
+            _remove_value(m[field], link, field[:-1].replace("_", " ").capitalize())
+    return apply
+
+# ----------------------------
+# SEQUENCE DIAGRAM
+# ----------------------------
+
+def _add_participant(m, op):
+    _require_absent(m["participants"], op["name"], "Participant")
+    m["participants"].append(op["name"])
+
+def _remove_participant(m, op):
+    _remove_value(m["participants"], op["name"], "Participant")
+    m["messages"] = [msg for msg in m["messages"] if op["name"] not in (msg.get("from"), msg.get("to"))]
+    m["activations"] = [a for a in m["activations"] if a.get("participant") != op["name"]]
+
+def _rename_participant(m, op):
+    _require_absent(m["participants"], op["new_name"], "Participant")
+    _rename_value(m["participants"], op["name"], op["new_name"], "Participant")
+    _rename_refs(m["messages"], ("from", "to"), op["name"], op["new_name"])
+    _rename_refs(m["activations"], ("participant",), op["name"], op["new_name"])
+
+def _message_index(m, op):
+    index = op["index"]
+    if not isinstance(index, int) or not 0 <= index < len(m["messages"]):
+        raise PatchError(f"Message index {index} out of range")
+    return index
+
+def _add_message(m, op):
+    message = {
+        "from": op["from"],
+        "to": op["to"],
+        "message": op.get("message", ""),
+        "type": op.get("type", "sync"),
+    }
+    index = op.get("index")
+    if isinstance(index, int) and 0 <= index <= len(m["messages"]):
+        m["messages"].insert(index, message)
+    else:
+        m["messages"].append(message)
+
+def _remove_message(m, op):
+    del m["messages"][_message_index(m, op)]
+
+def _update_message(m, op):
+    message = m["messages"][_message_index(m, op)]
+    for field in ("from", "to", "message", "type"):
+        if field in op:
+            message[field] = op[field]
+
+# ----------------------------
+# Operation tables: op -> (required fields, handler)
+# ----------------------------
+
+OPERATIONS = {
+    "class": {
+        "add_class": (("name",), _add_class),
+        "remove_class": (("name",), _remove_class),
+        "rename_class": (("name", "new_name"), _rename_class),
+        "add_attribute": (("class", "value"), _member_op("attributes", "add")),
+        "remove_attribute": (("class", "value"), _member_op("attributes", "remove")),
+        "rename_attribute": (("class", "value", "new_value"), _member_op("attributes", "rename")),
+        "add_method": (("class", "value"), _member_op("methods", "add")),
+        "remove_method": (("class", "value"), _member_op("methods", "remove")),
+        "rename_method": (("class", "value", "new_value"), _member_op("methods", "rename")),
+        "add_relationship": (("from", "to"), _add_relationship),
+        "remove_relationship": (("from", "to"), _remove_relationship),
+        "update_relationship": (("from", "to"), _update_relationship),
+    },
+    "usecase": {
+        "add_actor": (("name",), _add_actor),
+        "remove_actor": (("name",), _remove_actor),
+        "rename_actor": (("name", "new_name"), _rename_actor),
+        "add_use_case": (("name",), _add_use_case),
+        "remove_use_case": (("name",), _remove_use_case),
+        "rename_use_case": (("name", "new_name"), _rename_use_case),
+        "add_association": (("actor", "use_case"), _link_op("associations", ("actor", "use_case"), "add")),
+        "remove_association": (("actor", "use_case"), _link_op("associations", ("actor", "use_case"), "remove")),
+        "add_include": (("from", "to"), _link_op("includes", ("from", "to"), "add")),
+        "remove_include": (("from", "to"), _link_op("includes", ("from", "to"), "remove")),
+        "add_extend": (("from", "to"), _link_op("extends", ("from", "to"), "add")),
+        "remove_extend": (("from", "to"), _link_op("extends", ("from", "to"), "remove")),
+    },
+    "sequence": {
+        "add_participant": (("name",), _add_participant),
+        "remove_participant": (("name",), _remove_participant),
+        "rename_participant": (("name", "new_name"), _rename_participant),
+        "add_message": (("from", "to"), _add_message),
+        "remove_message": (("index",), _remove_message),
+        "update_message": (("index",), _update_message),
+    },
+}
+
+_OPTIONAL_FIELDS = {
+    "add_class": "attributes, methods",
+    "add_relationship": "type, label",
+    "remove_relationship": "type",
+    "update_relationship": "type, new_type, new_label",
+    "add_message": "message, type, index",
+    "update_message": "from, to, message, type",
+}
+
+_MODEL_KEYS = {
+    "class": ("classes", "relationships"),
+    "usecase": ("actors", "use_cases", "associations", "includes", "extends"),
+    "sequence": ("participants", "messages", "activations"),
+}
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def describe_operations(diagram_type="class") -> str:
+    """One line per operation, for the EDIT MODE prompt."""
+    lines = []
+    for name, (required, _) in OPERATIONS.get(diagram_type, OPERATIONS["class"]).items():
+        optional = _OPTIONAL_FIELDS.get(name)
+        fields = ", ".join(required) + (f" [, {optional}]" if optional else "")
+        lines.append(f"- {name}({fields})")
+    return "\n".join(lines)
+
+def validate_ops(ops, diagram_type="class"):
+    """Check the operation list is well-formed before touching the model."""
+    table = OPERATIONS.get(diagram_type)
+    if table is None:
+        raise PatchError(f"Unsupported diagram type '{diagram_type}'")
+    if not isinstance(ops, list):
+        raise PatchError("ops must be a list")
+    for i, op in enumerate(ops):
+        if not isinstance(op, dict) or "op" not in op:
+            raise PatchError(f"Operation {i} has no 'op'")
+        if op["op"] not in table:
+            raise PatchError(f"Unknown operation '{op['op']}' for {diagram_type} diagrams")
+        missing = [f for f in table[op["op"]][0] if op.get(f) in (None, "")]
+        if missing:
+            raise PatchError(f"Operation {i} ({op['op']}) is missing {', '.join(missing)}")
+
+def apply_ops(model, ops, diagram_type="class"):
+    """Validate and apply edit operations; returns a new model, leaves `model` untouched."""
+    validate_ops(ops, diagram_type)
+    result = copy.deepcopy(model or {})
+    for key in _MODEL_KEYS[diagram_type]:
+        result.setdefault(key, [])
+
+    table = OPERATIONS[diagram_type]
+    for op in ops:
+        table[op["op"]][1](result, op)
+    return result
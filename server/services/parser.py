@@ -1,56 +1,25 @@
-import os
-import re
 import json
-import requests
-import spacy
 from pathlib import Path
-from collections import defaultdict
 from typing import Dict
 from dotenv import load_dotenv
+from services import extractor, llm_cache, metrics, similar, singleflight
+from services.llm_gateway import get_gateway, completion_text, LLMError
+from services.model_patch import apply_ops, describe_operations, PatchError
+from utils.extract import extract_json_block
 
 load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
 
-API_URL = "https://api.openai.com/v1/chat/completions"
-headers = {
-    "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
-    "Content-Type": "application/json",
-}
-
-# Load spaCy once
-nlp = spacy.load("en_core_web_sm")
+PARSER_MODEL = "gpt-4"
+PARSER_TEMPERATURE = 0.1
 
 # ----------------------------
 # Helpers
 # ----------------------------
 
-def extract_structure_from_text(text: str) -> Dict:
-    """Very simple heuristic extraction of nouns for class diagrams only."""
-    doc = nlp(text)
-    classes = defaultdict(lambda: {"attributes": [], "methods": []})
-    relationships = []
-
-    for token in doc:
-        if token.pos_ in {"NOUN", "PROPN"} and token.text[0].isupper():
-            classes[token.text]  # init
-
-    return {
-        "classes": [{"name": n, "attributes": d["attributes"], "methods": d["methods"]}
-                    for n, d in classes.items()],
-        "relationships": relationships
-    }
-
-def extract_json_block(text: str):
-    """Extract JSON from GPT output (fenced or inline)."""
-    match = re.search(r"```json\s*(\{[\s\S]*?\})\s*```", text)
-    if match:
-        return match.group(1)
-    match = re.search(r"```[\s\S]*?```", text)
-    if match:
-        return match.group(1).strip("`")
-    match = re.search(r"(\{[\s\S]*\})", text)
-    if match:
-        return match.group(1)
-    return None
+def extract_structure_from_text(text: str, diagram_type: str = "class") -> Dict:
+    """Rule-based model from the spaCy parse (see services.extractor); {} when nothing was found."""
+    model, _ = extractor.extract(text, diagram_type)
+    return model
 
 # ----------------------------
 # Main parser
@@ -62,8 +31,14 @@ def parse_text_to_model(text, diagram_type="class", existing_model=None):
     Supports class, usecase, and sequence diagrams.
     If existing_model is provided → EDIT MODE (apply changes).
     """
-    # Heuristic model only makes sense for class
-    heuristic_model = extract_structure_from_text(text) if diagram_type == "class" else {}
+    if existing_model:
+        heuristic_model = {}
+    else:
+        with metrics.stage("parse.local"):
+            heuristic_model, confidence = extractor.extract(text, diagram_type)
+        if extractor.LOCAL_FIRST and confidence >= extractor.LOCAL_MIN_CONFIDENCE:
+            print(f"⚡ Local extraction is confident enough ({confidence}), skipping GPT")
+            return heuristic_model
 
     # Prompt per type
     if diagram_type == "usecase":
@@ -97,7 +72,7 @@ def parse_text_to_model(text, diagram_type="class", existing_model=None):
   ]
 }"""
 
-    # EDIT MODE
+    # EDIT MODE: ask for a compact list of operations, applied locally
     if existing_model:
         prompt = f"""{instruction}
 
@@ -105,16 +80,36 @@ EDIT MODE:
 You are modifying an existing {diagram_type} diagram.
 USER REQUEST: {text}
 CURRENT MODEL (JSON):
-{json.dumps(existing_model, indent=2)}
+{json.dumps(existing_model, separators=(",", ":"))}
+
+Return ONLY a JSON object {{"ops": [...]}} listing the changes, e.g.
+{{"ops":[{{"op":"add_attribute","class":"User","value":"email: string"}}]}}
+Available operations:
+{describe_operations(diagram_type)}
 
 RULES:
-1. Keep all existing elements unless explicitly removed
-2. Apply ONLY requested changes
-3. Return the FULL updated JSON, not just the changes
+1. Apply ONLY the requested changes; everything not mentioned is kept
+2. Do NOT return the full model
 """
     else:
-        # CREATE MODE
-        prompt = f"""{instruction}
+        # CREATE MODE: models of similar past descriptions, if any, show the format
+        # (and a likely shape) in far fewer tokens than the generic skeleton
+        with metrics.stage("parse.similar"):
+            shots = similar.examples(text, diagram_type)
+        if shots:
+            examples = "\n\n".join(f"DESCRIPTION: {description}\nJSON: {model}" for description, model in shots)
+            prompt = f"""{instruction}
+
+Examples of similar descriptions and their models:
+{examples}
+
+USER DESCRIPTION:
+{text}
+
+Return the full JSON model only, in the same format.
+"""
+        else:
+            prompt = f"""{instruction}
 
 USER DESCRIPTION:
 {text}
@@ -125,28 +120,55 @@ Start from this JSON skeleton:
 Return the full JSON model only.
 """
 
-    body = {
-        "model": "gpt-4",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.1
-    }
-
     try:
-        response = requests.post(API_URL, headers=headers, json=body, timeout=30)
-        if response.status_code != 200:
-            print("❌ API Error:", response.status_code, response.text)
-            return existing_model or heuristic_model
-
-        content = response.json()["choices"][0]["message"]["content"]
+        kind = "edit" if existing_model else "parse"
+        cache_key = llm_cache.make_key(kind, diagram_type, text, existing_model, PARSER_MODEL, PARSER_TEMPERATURE)
+        with metrics.stage("parse.cache"):
+            content = llm_cache.get(cache_key)
+        fresh = content is None
+        if fresh:
+            def call():
+                try:
+                    response = get_gateway().complete(
+                        [{"role": "user", "content": prompt}],
+                        model=PARSER_MODEL,
+                        temperature=PARSER_TEMPERATURE,
+                        timeout=30
+                    )
+                except LLMError:
+                    metrics.record_llm(kind, outcome="error")
+                    raise
+                metrics.record_llm(kind, response)
+                return completion_text(response)
+
+            try:
+                # Identical concurrent parses share one call. In-process only: the
+                # enclosing /generate flight already coordinates across processes,
+                # and the request's session may hold the SQLite write lock here.
+                with metrics.stage("parse.llm"):
+                    content = singleflight.do(cache_key, call, cross_process=False)
+            except LLMError as e:
+                print("❌ API Error:", e.status, e.body)
+                return existing_model or heuristic_model
         print("🧠 Raw GPT content:\n", content)
 
-        json_str = extract_json_block(content) or content
-        json_str = json_str.strip()
-        json_str = re.sub(r",\s*([}\]])", r"\1", json_str)  # remove trailing commas
+        with metrics.stage("parse.extract"):
+            json_str = (extract_json_block(content) or content).strip()  # trailing commas repaired
 
         parsed_model = json.loads(json_str)
-
-        # Compatibility check
+        if fresh:
+            llm_cache.put(cache_key, content, kind=kind, diagram_type=diagram_type)
+
+        # Delta reply: validate and apply the operations to the existing model
+        if existing_model and isinstance(parsed_model, dict) and "ops" in parsed_model:
+            try:
+                with metrics.stage("parse.apply_ops"):
+                    return apply_ops(existing_model, parsed_model["ops"], diagram_type)
+            except PatchError as e:
+                print("⚠️ Rejected edit operations, fallback to existing:", e)
+                return existing_model
+
+        # Compatibility check (full model reply)
         if existing_model and not _models_are_compatible(existing_model, parsed_model, diagram_type):
             print("⚠️ Incompatible model, fallback to existing")
             return existing_model
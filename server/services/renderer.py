@@ -0,0 +1,311 @@
+import os
+import html
+import queue
+import shlex
+import hashlib
+import importlib
+import selectors
+import threading
+import subprocess
+import uuid
+from collections import OrderedDict
+from services import singleflight
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# "pipe" (long-lived PlantUML processes), "stub" (text-only SVG stand-in) or "module:factory"
+PLANTUML_RENDERER = os.getenv("PLANTUML_RENDERER", "pipe")
+PLANTUML_JAR = os.getenv("PLANTUML_JAR", "plantuml.jar")
+PLANTUML_COMMAND = os.getenv("PLANTUML_COMMAND", f"java -Djava.awt.headless=true -jar {PLANTUML_JAR}")
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))  # processes per format
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", "30"))
+RENDER_CACHE_BYTES = int(os.getenv("RENDER_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+FORMATS = {
+    "svg": "image/svg+xml",
+    "png": "image/png",
+    "txt": "text/plain; charset=utf-8",
+}
+
+class RenderError(Exception):
+    """The renderer ran but could not produce the image (bad source, timeout, crash)."""
+
+class RendererUnavailable(Exception):
+    """No renderer for this format (not installed, failed to start, or unsupported)."""
+
+def _with_markers(source: str) -> str:
+    source = source.strip()
+    if not source.startswith("@start"):
+        source = "@startuml\n" + source + "\n@enduml"
+    return source
+
+# ----------------------------
+# Pipe backend: long-lived `plantuml -pipe` processes
+# ----------------------------
+
+class _PipeWorker:
+    """
+    One `plantuml -pipe` process for one format. Diagrams go to stdin; each
+    image comes back on stdout followed by a random delimiter line, so the
+    JVM starts once and then renders in milliseconds.
+    """
+
+    def __init__(self, fmt):
+        self.delimiter = uuid.uuid4().hex
+        command = shlex.split(PLANTUML_COMMAND) + [
+            "-pipe", f"-t{fmt}", "-charset", "UTF-8", "-pipedelimitor", self.delimiter
+        ]
+        try:
+            self.proc = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise RendererUnavailable(f"Cannot start PlantUML ({command[0]}): {e}")
+        self.marker = self.delimiter.encode() + b"\n"
+        self.buffer = b""
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def close(self):
+        if self.alive():
+            self.proc.kill()
+        self.proc.wait()
+
+    def render(self, source: str) -> bytes:
+        try:
+            self.proc.stdin.write(_with_markers(source).encode("utf-8") + b"\n")
+            self.proc.stdin.flush()
+        except OSError as e:
+            raise RenderError(f"PlantUML process exited: {e}")
+
+        fd = self.proc.stdout.fileno()
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while self.marker not in self.buffer:
+                if not selector.select(RENDER_TIMEOUT):
+                    self.proc.kill()  # its late output would answer the next diagram
+                    raise RenderError(f"PlantUML did not answer within {RENDER_TIMEOUT:g}s")
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    raise RenderError("PlantUML process exited")
+                self.buffer += chunk
+
+        body, _, self.buffer = self.buffer.partition(self.marker)
+        if body.startswith(b"ERROR\n"):
+            raise RenderError(body.decode("utf-8", "replace").strip())
+        return body
+
+class PipeRenderer:
+    name = "pipe"
+    formats = tuple(FORMATS)
+
+    def __init__(self, workers=RENDER_WORKERS):
+        self.workers = workers
+        self.pools = {fmt: queue.LifoQueue() for fmt in self.formats}
+        self.started = {fmt: 0 for fmt in self.formats}
+        self.lock = threading.Lock()
+
+    def _acquire(self, fmt):
+        pool = self.pools[fmt]
+        try:
+            return pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            spawn = self.started[fmt] < self.workers
+            if spawn:
+                self.started[fmt] += 1
+        if not spawn:
+            try:
+                return pool.get(timeout=RENDER_TIMEOUT)
+            except queue.Empty:
+                raise RenderError("All renderers are busy")
+        try:
+            return _PipeWorker(fmt)
+        except RendererUnavailable:
+            with self.lock:
+                self.started[fmt] -= 1
+            raise
+
+    def _release(self, fmt, worker, healthy):
+        if healthy and worker.alive():
+            self.pools[fmt].put(worker)
+            return
+        # dead or out of sync with its output: replaced on the next acquire
+        worker.close()
+        with self.lock:
+            self.started[fmt] -= 1
+
+    def render(self, source: str, fmt: str) -> bytes:
+        worker = self._acquire(fmt)
+        healthy = False
+        try:
+            body = worker.render(source)
+            healthy = True
+            return body
+        except RenderError:
+            # a syntax error leaves the process usable; a timeout or crash does not
+            healthy = worker.alive()
+            raise
+        finally:
+            self._release(fmt, worker, healthy)
+
+    def close(self):
+        for fmt, pool in self.pools.items():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+            self.started[fmt] = 0
+
+# ----------------------------
+# Stub backend: no Java needed
+# ----------------------------
+
+class StubRenderer:
+    """Stand-in for development and tests: an SVG listing the PlantUML source."""
+    name = "stub"
+    formats = ("svg", "txt")
+
+    def render(self, source: str, fmt: str) -> bytes:
+        lines = _with_markers(source).splitlines()
+        if fmt == "txt":
+            return "\n".join(lines).encode("utf-8")
+        height = 20 * len(lines) + 20
+        width = 10 + 8 * max(len(line) for line in lines)
+        text = "".join(
+            f'<text x="10" y="{20 * (i + 1)}" font-family="monospace" font-size="13">{html.escape(line)}</text>'
+            for i, line in enumerate(lines)
+        )
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">'
+            f'<rect width="100%" height="100%" fill="white"/>{text}</svg>'
+        ).encode("utf-8")
+
+    def close(self):
+        pass
+
+# ----------------------------
+# Backend selection
+# ----------------------------
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def _load_backend(spec):
+    if spec == "pipe":
+        return PipeRenderer()
+    if spec == "stub":
+        return StubRenderer()
+    # "package.module:factory" -> factory() returning an object with render(source, fmt) -> bytes
+    module_name, _, attr = spec.partition(":")
+    backend = getattr(importlib.import_module(module_name), attr or "Renderer")()
+    if not hasattr(backend, "name"):
+        backend.name = spec
+    return backend
+
+def get_renderer():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _load_backend(PLANTUML_RENDERER)
+            print(f"🖼️ PlantUML renderer: {_backend.name}")
+        return _backend
+
+def set_renderer(backend):
+    """Swap the backend (e.g. a stand-in); closes the previous one and empties the cache."""
+    global _backend
+    with _backend_lock:
+        if _backend is not None and hasattr(_backend, "close"):
+            _backend.close()
+        _backend = backend
+    _cache.clear()
+
+# ----------------------------
+# Render cache (LRU, bounded by total bytes)
+# ----------------------------
+
+class _RenderCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+_cache = _RenderCache(RENDER_CACHE_BYTES)
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def _etag(backend, fmt, source):
+    return hashlib.sha256(f"{backend.name}\x1f{fmt}\x1f{source}".encode("utf-8")).hexdigest()
+
+def etag_for(source: str, fmt: str) -> str:
+    """The ETag render() would return, without rendering (for If-None-Match checks)."""
+    return _etag(get_renderer(), fmt, source)
+
+def render(source: str, fmt: str):
+    """
+    (image bytes, etag) for PlantUML `source` in `fmt`. The ETag is a hash
+    of backend, format and source, so it is known before rendering and the
+    same source always maps to the same bytes. Identical renders already
+    in flight are awaited instead of repeated.
+    """
+    backend = get_renderer()
+    if fmt not in getattr(backend, "formats", FORMATS):
+        raise RendererUnavailable(f"Format '{fmt}' is not supported by the {backend.name} renderer")
+
+    etag = _etag(backend, fmt, source)
+    body = _cache.get(etag)
+    if body is None:
+        body = singleflight.do(f"render:{etag}", lambda: backend.render(source, fmt), cross_process=False)
+        _cache.put(etag, body)
+    return body, etag
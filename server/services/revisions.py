@@ -0,0 +1,347 @@
+import os
+import re
+import json
+import zlib
+import bisect
+import difflib
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import event, inspect, select, insert, delete, func
+from db import db
+from models import Diagram, DiagramRevision
+
+# ----------------------------
+# Config
+# ----------------------------
+
+# A full snapshot every N revisions bounds checkout to N - 1 delta replays
+SNAPSHOT_EVERY = max(1, int(os.getenv("REVISION_SNAPSHOT_EVERY", "20")))
+FIELDS = ("name", "diagram_type", "plantuml_code", "flow_data")
+TEXT_FIELDS = ("plantuml_code", "flow_data")
+
+# ----------------------------
+# Delta encoding
+# ----------------------------
+
+# PlantUML changes by line, flow_data (one-line JSON) by value: split after
+# newlines and JSON punctuation so an edit touches only a few tokens
+_DELIMITERS = "\n,{}[]"
+_TOKEN = re.compile(r"[^\n,{}\[\]]*[\n,{}\[\]]|[^\n,{}\[\]]+$")
+
+def tokenize(value: str):
+    return _TOKEN.findall(value)
+
+def _anchors(a, b):
+    """
+    Patience-diff anchors: tokens that occur exactly once on each side, kept in
+    the longest run that appears in the same order in both (O(n log n)).
+    """
+    count_a, count_b = Counter(a), Counter(b)
+    where = {t: i for i, t in enumerate(a) if count_a[t] == 1 and count_b.get(t) == 1}
+    pairs = [(where[t], j) for j, t in enumerate(b) if t in where]
+
+    # longest increasing subsequence of the old positions
+    tails, tail_keys, links = [], [], []
+    for k, (i, _) in enumerate(pairs):
+        pos = bisect.bisect_left(tail_keys, i)
+        links.append(tails[pos - 1] if pos else -1)
+        if pos == len(tails):
+            tails.append(k)
+            tail_keys.append(i)
+        else:
+            tails[pos] = k
+            tail_keys[pos] = i
+    chain, k = [], tails[-1] if tails else -1
+    while k != -1:
+        chain.append(pairs[k])
+        k = links[k]
+    return chain[::-1]
+
+def _diff(a, b, a0, ops, depth=0):
+    """Append token-level ops (["c", index, count] into the old list) turning slice `a` (at a0) into `b`."""
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    if prefix:
+        ops.append(["c", a0, prefix])
+
+    a_mid, b_mid = a[prefix:len(a) - suffix], b[prefix:len(b) - suffix]
+    anchors = _anchors(a_mid, b_mid) if a_mid and b_mid and depth < 32 else []
+    if anchors:
+        i_prev = j_prev = 0
+        for i, j in anchors + [(len(a_mid), len(b_mid))]:
+            _diff(a_mid[i_prev:i], b_mid[j_prev:j], a0 + prefix + i_prev, ops, depth + 1)
+            if i < len(a_mid):
+                ops.append(["c", a0 + prefix + i, 1])
+            i_prev, j_prev = i + 1, j + 1
+    elif b_mid:
+        ops.append(["i", "".join(b_mid)])
+
+    if suffix:
+        ops.append(["c", a0 + len(a) - suffix, suffix])
+
+def _common_prefix(a: str, b: str) -> int:
+    # binary search over slice comparisons: C speed on multi-MB flow_data
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def make_ops(old: str, new: str):
+    """
+    Edit script turning `old` into `new`: ["c", start, length] copies a slice
+    of `old`, ["i", text] inserts. Size is proportional to the change, not the
+    document; only the edited middle is tokenized and diffed.
+    """
+    # unchanged head and tail, cut back to token boundaries
+    prefix = _common_prefix(old, new)
+    while prefix and old[prefix - 1] not in _DELIMITERS:
+        prefix -= 1
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+    while suffix and old[len(old) - suffix - 1] not in _DELIMITERS:
+        suffix -= 1
+
+    a = tokenize(old[prefix:len(old) - suffix])
+    b = tokenize(new[prefix:len(new) - suffix])
+    starts = [prefix]
+    for token in a:
+        starts.append(starts[-1] + len(token))
+
+    raw = [["c", 0, prefix]] if prefix else []
+    token_ops = []
+    _diff(a, b, 0, token_ops)
+    for op in token_ops:
+        raw.append(["c", starts[op[1]], starts[op[1] + op[2]] - starts[op[1]]] if op[0] == "c" else op)
+    if suffix:
+        raw.append(["c", len(old) - suffix, suffix])
+
+    # merge adjacent copies/inserts produced by the recursion
+    ops = []
+    for op in raw:
+        last = ops[-1] if ops else None
+        if last and op[0] == "c" and last[0] == "c" and last[1] + last[2] == op[1]:
+            last[2] += op[2]
+        elif last and op[0] == "i" and last[0] == "i":
+            last[1] += op[1]
+        else:
+            ops.append(op)
+    return ops
+
+def apply_ops(old: str, ops) -> str:
+    return "".join(old[op[1]:op[1] + op[2]] if op[0] == "c" else op[1] for op in ops)
+
+def make_delta(old: dict, new: dict) -> dict:
+    """Per-field changes: plain values for short fields, edit scripts for text bodies."""
+    delta = {}
+    for field in FIELDS:
+        before, after = old.get(field), new.get(field)
+        if before == after:
+            continue
+        if field in TEXT_FIELDS and before is not None and after is not None:
+            delta[field] = {"ops": make_ops(before, after)}
+        else:
+            delta[field] = {"set": after}
+    return delta
+
+def apply_delta(state: dict, delta: dict) -> dict:
+    result = dict(state)
+    for field, change in delta.items():
+        result[field] = change["set"] if "set" in change else apply_ops(result[field], change["ops"])
+    return result
+
+def _rewritten(delta: dict, new: dict) -> bool:
+    """True when most of the new text is new rather than copied; a snapshot is then as small."""
+    inserted = 0
+    for field, change in delta.items():
+        if "set" in change:
+            inserted += len(change["set"] or "") if field in TEXT_FIELDS else 0
+        else:
+            inserted += sum(len(op[1]) for op in change["ops"] if op[0] == "i")
+    total = sum(len(new.get(f) or "") for f in TEXT_FIELDS)
+    return total > 0 and inserted * 2 > total
+
+def _pack(value) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"), 6)
+
+def _unpack(payload: bytes):
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+def checksum(state: dict) -> int:
+    return zlib.crc32(json.dumps([state.get(f) for f in FIELDS]).encode("utf-8"))
+
+# ----------------------------
+# Recording (ORM events)
+# ----------------------------
+
+class RevisionConflict(Exception):
+    """The diagram gained revisions since the one the edit was based on."""
+
+    def __init__(self, current):
+        super().__init__(f"Diagram is at revision {current}")
+        self.current = current
+
+def expect_base(diagram, seq):
+    """Make the next flush of `diagram` fail with RevisionConflict unless its latest revision is still `seq`."""
+    diagram.__dict__["_base_revision"] = seq
+
+_table = DiagramRevision.__table__
+_ANY = object()
+_diagrams = Diagram.__table__
+
+def _state_of(target, stored=None) -> dict:
+    # read the instance dict: touching an unloaded (deferred) column mid-flush would load it
+    loaded = inspect(target).dict
+    return {f: loaded[f] if f in loaded else (stored or {}).get(f) for f in FIELDS}
+
+def _insert(connection, diagram_id, seq, kind, chain, payload, state):
+    connection.execute(insert(_table).values(
+        diagram_id=diagram_id,
+        seq=seq,
+        kind=kind,
+        chain=chain,
+        payload=_pack(payload),
+        checksum=checksum(state),
+        created_at=datetime.utcnow()
+    ))
+
+def record(connection, diagram_id, old, new, base=_ANY):
+    """
+    Append the revision for old -> new. Deltas are written against the latest
+    revision; a snapshot starts a new chain every SNAPSHOT_EVERY revisions, or
+    when the stored row no longer matches the history (changed outside the ORM).
+    With `base`, raises RevisionConflict if the latest revision is another one;
+    the unique (diagram_id, seq) index catches writers racing past this check.
+    """
+    latest = connection.execute(
+        select(_table.c.seq, _table.c.chain, _table.c.checksum)
+        .where(_table.c.diagram_id == diagram_id)
+        .order_by(_table.c.seq.desc())
+        .limit(1)
+    ).first()
+    if base is not _ANY and (latest.seq if latest else None) != base:
+        raise RevisionConflict(latest.seq if latest else None)
+
+    if latest is None or latest.checksum != checksum(old):
+        # first edit of a diagram older than the history: keep its pre-edit state too
+        seq = (latest.seq if latest else 0) + 1
+        _insert(connection, diagram_id, seq, "snapshot", 0, old, old)
+        latest_seq, chain = seq, 0
+    else:
+        latest_seq, chain = latest.seq, latest.chain
+
+    delta = make_delta(old, new)
+    if chain + 1 >= SNAPSHOT_EVERY or _rewritten(delta, new):
+        _insert(connection, diagram_id, latest_seq + 1, "snapshot", 0, new, new)
+    else:
+        _insert(connection, diagram_id, latest_seq + 1, "delta", chain + 1, delta, new)
+
+@event.listens_for(Diagram, "after_insert")
+def _after_insert(mapper, connection, target):
+    state = _state_of(target)
+    _insert(connection, target.id, 1, "snapshot", 0, state, state)
+
+@event.listens_for(Diagram, "before_update")
+def _before_update(mapper, connection, target):
+    base = target.__dict__.pop("_base_revision", _ANY)
+    attrs = inspect(target).attrs
+    if not any(attrs[f].history.has_changes() for f in FIELDS):
+        return  # e.g. only updated_at
+    # the stored row is the base: attribute history is empty for expired attributes
+    row = connection.execute(
+        select(*(_diagrams.c[f] for f in FIELDS)).where(_diagrams.c.id == target.id)
+    ).first()
+    if row is None:
+        return
+    old = dict(row._mapping)
+    new = _state_of(target, old)
+    if old != new:
+        record(connection, target.id, old, new, base)
+
+@event.listens_for(Diagram, "before_delete")
+def _before_delete(mapper, connection, target):
+    connection.execute(delete(_table).where(_table.c.diagram_id == target.id))
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+def list_revisions(diagram_id, limit=50, before=None):
+    """Newest first; `before` is a seq to page from."""
+    query = db.session.query(
+        DiagramRevision.seq,
+        DiagramRevision.kind,
+        func.length(DiagramRevision.payload).label("size"),
+        DiagramRevision.created_at
+    ).filter(DiagramRevision.diagram_id == diagram_id)
+    if before is not None:
+        query = query.filter(DiagramRevision.seq < before)
+    return query.order_by(DiagramRevision.seq.desc()).limit(limit).all()
+
+def latest_seq(diagram_id):
+    """Newest revision number (None before the first recorded edit); clients send it back as base_revision."""
+    return db.session.query(func.max(DiagramRevision.seq)).filter(DiagramRevision.diagram_id == diagram_id).scalar()
+
+def checkout(diagram_id, seq):
+    """Full state at revision `seq` (None if missing): nearest snapshot, then its deltas in order."""
+    snapshot_seq = db.session.query(func.max(DiagramRevision.seq)).filter(
+        DiagramRevision.diagram_id == diagram_id,
+        DiagramRevision.kind == "snapshot",
+        DiagramRevision.seq <= seq
+    ).scalar()
+    if snapshot_seq is None:
+        return None
+
+    rows = db.session.query(DiagramRevision.seq, DiagramRevision.kind, DiagramRevision.payload).filter(
+        DiagramRevision.diagram_id == diagram_id,
+        DiagramRevision.seq >= snapshot_seq,
+        DiagramRevision.seq <= seq
+    ).order_by(DiagramRevision.seq.asc()).all()
+    if not rows or rows[-1].seq != seq:
+        return None
+
+    state = _unpack(rows[0].payload)
+    for row in rows[1:]:
+        state = apply_delta(state, _unpack(row.payload))
+    return state
+
+def _pretty_flow(flow_data):
+    if not flow_data:
+        return []
+    try:
+        return json.dumps(json.loads(flow_data), indent=2, sort_keys=True).splitlines(keepends=True)
+    except ValueError:
+        return flow_data.splitlines(keepends=True)
+
+def diff(old, new, old_label, new_label):
+    """Unified diffs of the PlantUML source and the (pretty-printed) ReactFlow model."""
+    result = {
+        field: {"from": old.get(field), "to": new.get(field)}
+        for field in ("name", "diagram_type") if old.get(field) != new.get(field)
+    }
+    result["plantuml_code"] = "".join(difflib.unified_diff(
+        (old.get("plantuml_code") or "").splitlines(keepends=True),
+        (new.get("plantuml_code") or "").splitlines(keepends=True),
+        old_label, new_label
+    ))
+    result["flow_data"] = "".join(difflib.unified_diff(
+        _pretty_flow(old.get("flow_data")), _pretty_flow(new.get("flow_data")), old_label, new_label
+    ))
+    return result
@@ -0,0 +1,275 @@
+import re
+from collections import namedtuple
+from sqlalchemy import event, inspect, text, table, column, literal, tuple_
+from db import db
+from models import Diagram
+from utils.plantuml_parser import parse_plantuml
+
+# ----------------------------
+# Schema
+# ----------------------------
+
+# diagram_search gives every diagram a stable INTEGER key (diagrams.rowid is not
+# stable across VACUUM); rows of both FTS tables share that key, assigned in
+# creation order so "higher rowid" means "newer diagram". diagram_names_fts
+# holds the names alone, so a name lookup never walks identifier doclists.
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS diagram_search (
+        rowid INTEGER PRIMARY KEY,
+        diagram_id TEXT NOT NULL UNIQUE
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS diagrams_fts USING fts5(
+        name,
+        identifiers,
+        diagram_type,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS diagram_names_fts USING fts5(
+        name,
+        diagram_type,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )""",
+)
+
+_search_map = table("diagram_search", column("rowid"), column("diagram_id"))
+
+SearchHit = namedtuple("SearchHit", Diagram.SUMMARY_COLUMNS + ("tier",))
+
+_fts_ready = False
+
+def ensure_index(engine):
+    """Create the FTS5 tables (SQLite only); returns whether the index is usable."""
+    global _fts_ready
+    if engine.dialect.name != "sqlite":
+        _fts_ready = False
+        return False
+    try:
+        with engine.begin() as conn:
+            for statement in _SCHEMA:
+                conn.execute(text(statement))
+        _fts_ready = True
+    except Exception as e:  # SQLite built without FTS5
+        print("⚠️ Full-text search unavailable, falling back to LIKE:", e)
+        _fts_ready = False
+    return _fts_ready
+
+def fts_enabled() -> bool:
+    return _fts_ready
+
+# ----------------------------
+# Identifier extraction
+# ----------------------------
+
+_WORD = re.compile(r"[A-Za-z_]\w*")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+def _parts(word):
+    """camelCase / snake_case pieces of one identifier (BookLoan -> Book, Loan)."""
+    return [p for chunk in word.split("_") for p in _CAMEL.findall(chunk)]
+
+def _words(value):
+    """
+    Identifiers are indexed as their parts only and searched as phrases, so
+    "BookLoan" matches "book loan" and a prefix like "Book" expands to a handful
+    of real words instead of every identifier that starts with it.
+    """
+    return [part for word in _WORD.findall(value or "") for part in _parts(word)]
+
+def identifiers(plantuml_code, diagram_type) -> str:
+    """Names found in the diagram: classes, members, actors, use cases, participants."""
+    try:
+        model = parse_plantuml(plantuml_code or "", diagram_type)
+    except Exception:
+        model = {}
+
+    values = []
+    if diagram_type == "usecase":
+        values += model.get("actors", [])
+        values += model.get("use_cases", [])
+    elif diagram_type == "sequence":
+        values += model.get("participants", [])
+        values += [m.get("message", "") for m in model.get("messages", [])]
+    else:
+        for cls in model.get("classes", []):
+            values.append(cls.get("name", ""))
+            # "title: string" and "borrow(member)" index the member name only
+            values += [re.split(r"[:(]", a, 1)[0] for a in cls.get("attributes", [])]
+            values += [re.split(r"[:(]", m, 1)[0] for m in cls.get("methods", [])]
+        values += [r.get("label", "") for r in model.get("relationships", [])]
+
+    return " ".join(dict.fromkeys(" ".join(_words(value)) for value in values if value))
+
+# ----------------------------
+# Incremental sync (ORM events)
+# ----------------------------
+
+def _rowid(connection, diagram_id):
+    return connection.execute(
+        text("SELECT rowid FROM diagram_search WHERE diagram_id = :id"), {"id": diagram_id}
+    ).scalar()
+
+def index_diagram(connection, diagram_id, name, plantuml_code, diagram_type):
+    """Insert or replace one diagram's FTS row on `connection` (joins its transaction)."""
+    rowid = _rowid(connection, diagram_id)
+    if rowid is None:
+        rowid = connection.execute(
+            text("INSERT INTO diagram_search (diagram_id) VALUES (:id)"), {"id": diagram_id}
+        ).lastrowid
+    else:
+        _delete_fts_rows(connection, rowid)
+    params = {"rowid": rowid, "name": name or "", "diagram_type": diagram_type or ""}
+    connection.execute(
+        text("INSERT INTO diagrams_fts (rowid, name, identifiers, diagram_type) "
+             "VALUES (:rowid, :name, :identifiers, :diagram_type)"),
+        {**params, "identifiers": identifiers(plantuml_code, diagram_type)}
+    )
+    connection.execute(
+        text("INSERT INTO diagram_names_fts (rowid, name, diagram_type) VALUES (:rowid, :name, :diagram_type)"),
+        params
+    )
+
+def _delete_fts_rows(connection, rowid):
+    connection.execute(text("DELETE FROM diagrams_fts WHERE rowid = :rowid"), {"rowid": rowid})
+    connection.execute(text("DELETE FROM diagram_names_fts WHERE rowid = :rowid"), {"rowid": rowid})
+
+def unindex_diagram(connection, diagram_id):
+    rowid = _rowid(connection, diagram_id)
+    if rowid is not None:
+        _delete_fts_rows(connection, rowid)
+        connection.execute(text("DELETE FROM diagram_search WHERE rowid = :rowid"), {"rowid": rowid})
+
+@event.listens_for(Diagram, "after_insert")
+def _after_insert(mapper, connection, target):
+    if _fts_ready:
+        index_diagram(connection, target.id, target.name, target.plantuml_code, target.diagram_type)
+
+@event.listens_for(Diagram, "after_update")
+def _after_update(mapper, connection, target):
+    if not _fts_ready:
+        return
+    state = inspect(target)
+    # save-model rewrites flow_data on every drag; only re-index when searchable text moved
+    if any(state.attrs[c].history.has_changes() for c in ("name", "plantuml_code", "diagram_type")):
+        plantuml_code = state.dict.get("plantuml_code")
+        if plantuml_code is None:
+            # renamed without loading the (deferred) content: read it on this connection
+            plantuml_code = connection.execute(
+                db.select(Diagram.__table__.c.plantuml_code).where(Diagram.__table__.c.id == target.id)
+            ).scalar()
+        index_diagram(connection, target.id, target.name, plantuml_code, target.diagram_type)
+
+@event.listens_for(Diagram, "after_delete")
+def _after_delete(mapper, connection, target):
+    if _fts_ready:
+        unindex_diagram(connection, target.id)
+
+def backfill(batch_size=1000):
+    """Index diagrams that have no FTS row yet, oldest first (first run on an existing database)."""
+    if not _fts_ready:
+        return 0
+    diagrams = Diagram.__table__
+    indexed = 0
+    last = None
+    while True:
+        query = (
+            db.select(diagrams.c.id, diagrams.c.name, diagrams.c.plantuml_code,
+                      diagrams.c.diagram_type, diagrams.c.created_at)
+            .outerjoin(_search_map, _search_map.c.diagram_id == diagrams.c.id)
+            .where(_search_map.c.diagram_id.is_(None))
+            .order_by(diagrams.c.created_at, diagrams.c.id)
+            .limit(batch_size)
+        )
+        if last:
+            query = query.where(tuple_(diagrams.c.created_at, diagrams.c.id) > last)
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+        connection = db.session.connection()
+        for row in rows:
+            index_diagram(connection, row.id, row.name, row.plantuml_code, row.diagram_type)
+        db.session.commit()
+        indexed += len(rows)
+        last = (rows[-1].created_at, rows[-1].id)
+    return indexed
+
+# ----------------------------
+# Query
+# ----------------------------
+
+def match_query(query):
+    """
+    User input -> FTS5 expression: every word must match (identifiers as
+    phrases of their parts), the last one as a prefix for search-as-you-type.
+    """
+    phrases = list(dict.fromkeys(" ".join(_parts(w) or [w]) for w in re.findall(r"\w+", query or "")))
+    if not phrases:
+        return ""
+    return " ".join(f'"{p}"' for p in phrases[:-1]) + f' "{phrases[-1]}"*'
+
+# bm25() column weights; diagram_type only filters, so it never adds to the score
+_BM25_WEIGHTS = {
+    "diagram_names_fts": "1.0, 0.0",               # name, diagram_type
+    "diagrams_fts": "2.0, 1.0, 0.0",               # name, identifiers, diagram_type
+}
+
+def _matching_rowids(fts_table, expression, limit, offset=0, exclude=()):
+    exclude_sql = f" AND rowid NOT IN ({', '.join(str(int(r)) for r in exclude)})" if exclude else ""
+    return [r[0] for r in db.session.execute(
+        text(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH :match{exclude_sql} "
+             f"ORDER BY bm25({fts_table}, {_BM25_WEIGHTS[fts_table]}), rowid DESC LIMIT :limit OFFSET :offset"),
+        {"match": expression, "limit": limit, "offset": offset}
+    )]
+
+def _ranked_rowids(query, limit, offset, diagram_type=None):
+    """
+    [(rowid, tier)] for one page. Tier 0: the name matches; tier 1: everything
+    else that matches (name and identifiers together). Best bm25() score first
+    within a tier, newest first among equal scores.
+
+    bm25() scores every match before the LIMIT applies, so a page of a common
+    word costs more as the index grows (see benchmarks/bench_search.py).
+    """
+    expression = match_query(query)
+    if not expression:
+        return []
+    if diagram_type:
+        expression = '{diagram_type} : "%s" AND (%s)' % (re.sub(r"\W", "", diagram_type), expression)
+
+    # Tier 0 is read up to the end of the page; when it runs out early its exact size is known
+    names = _matching_rowids("diagram_names_fts", expression, offset + limit)
+    page = [(rowid, 0) for rowid in names[offset:]]
+    if len(page) < limit:
+        rest = _matching_rowids("diagrams_fts", expression, limit - len(page),
+                                max(0, offset - len(names)), exclude=names)
+        page += [(rowid, 1) for rowid in rest]
+    return page
+
+def search(query, limit, offset=0, diagram_type=None):
+    """
+    One page of ranked summaries (SearchHit rows). Without FTS5 (Postgres, or
+    SQLite built without it) this is a LIKE scan over diagram names only, newest
+    first: content is never matched, so every hit is a tier 0 (name) match.
+    """
+    columns = [getattr(Diagram, c) for c in Diagram.SUMMARY_COLUMNS]
+
+    if not _fts_ready:
+        # names only: plantuml_code is stored compressed, so SQL cannot match inside it
+        pattern = f"%{query.strip()}%"
+        q = db.session.query(*columns, literal(0).label("tier")).filter(Diagram.name.ilike(pattern))
+        if diagram_type:
+            q = q.filter(Diagram.diagram_type == diagram_type)
+        return q.order_by(Diagram.created_at.desc(), Diagram.id.desc()).limit(limit).offset(offset).all()
+
+    ranked = _ranked_rowids(query, limit, offset, diagram_type)
+    if not ranked:
+        return []
+    rows = (
+        db.session.query(*columns, _search_map.c.rowid)
+        .join(_search_map, _search_map.c.diagram_id == Diagram.id)
+        .filter(_search_map.c.rowid.in_([rowid for rowid, _ in ranked]))
+        .all()
+    )
+    by_rowid = {r.rowid: r for r in rows}
+    return [SearchHit(*by_rowid[rowid][:-1], tier) for rowid, tier in ranked if rowid in by_rowid]
@@ -0,0 +1,263 @@
+import os
+import re
+import json
+import random
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+from sqlalchemy import select
+from db import db
+from models import DescriptionExample
+from services.llm_cache import normalize_text
+
+# ----------------------------
+# Config
+# ----------------------------
+
+SIMILAR_ENABLED = os.getenv("SIMILAR_ENABLED", "1") not in ("0", "false", "False")
+# Jaccard similarity of the descriptions' shingles at which a stored model is returned
+# as is, provided the new description adds nothing (see near_identical)
+SIMILAR_REUSE_THRESHOLD = float(os.getenv("SIMILAR_REUSE_THRESHOLD", "0.9"))
+# ... and at which it is still a useful few-shot example for the parser prompt
+SIMILAR_EXAMPLE_THRESHOLD = float(os.getenv("SIMILAR_EXAMPLE_THRESHOLD", "0.2"))
+SIMILAR_EXAMPLES = int(os.getenv("SIMILAR_EXAMPLES", "2"))
+SIMILAR_EXAMPLE_MAX_CHARS = int(os.getenv("SIMILAR_EXAMPLE_MAX_CHARS", "1500"))  # compact JSON; larger models are skipped
+SIMILAR_MAX_ENTRIES = int(os.getenv("SIMILAR_MAX_ENTRIES", "50000"))  # indexed per process, newest kept
+MIN_SHINGLES = 3
+
+# MinHash/LSH shape. Fixed, since signatures are stored: 64 bands of 2 rows put
+# pairs at 0.2 Jaccard in a shared bucket ~93% of the time, at 0.3 >99%, at 0.05 ~15%.
+NUM_PERM = 128
+BANDS = 64
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+# Wording that does not change which system is described
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "at", "from", "as",
+    "is", "are", "be", "can", "could", "should", "will", "would", "may", "might", "must", "each",
+    "every", "it", "its", "they", "their", "there", "this", "that", "which", "who", "whom",
+    "many", "multiple", "several", "some", "lots", "lot", "various", "any", "all", "one", "more",
+    "i", "we", "you", "want", "need", "like", "please", "diagram", "system", "also", "has", "have",
+    "create", "make", "draw", "generate", "show", "uml", "class", "sequence", "usecase", "use", "case",
+}
+
+Match = namedtuple("Match", "score id description model")
+_table = DescriptionExample.__table__
+
+# ----------------------------
+# Shingles and signatures
+# ----------------------------
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE = re.compile(r"[.!?;\n]+")
+
+def _stem(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def shingles(text) -> frozenset:
+    """Content words (lowercased, crudely singular) and each adjacent pair of them within a sentence."""
+    out = set()
+    for sentence in _SENTENCE.split((text or "").lower()):
+        words = [_stem(w) for w in _WORD.findall(sentence) if w not in STOPWORDS]
+        out.update(words)
+        out.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return frozenset(out)
+
+def _hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+def signature(shingle_set) -> array:
+    """MinHash of a shingle set: NUM_PERM 32-bit minima."""
+    hashes = [_hash(s) for s in shingle_set]
+    return array("I", (min((a * h + b) % _PRIME for h in hashes) & 0xFFFFFFFF for a, b in _PERMS))
+
+def jaccard(a, b) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def near_identical(query, stored) -> bool:
+    """
+    Whether a stored description's model answers the query as is: nearly the
+    same shingles, and none of the query's missing from it. One added sentence
+    ("Add a Supplier class.") or word ("cannot") changes the diagram, however
+    high the overall score.
+    """
+    return query <= stored and jaccard(query, stored) >= SIMILAR_REUSE_THRESHOLD
+
+def _band_keys(diagram_type, sig):
+    return [(diagram_type, band, tuple(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+# ----------------------------
+# Index
+# ----------------------------
+
+class Index:
+    """
+    LSH buckets over MinHash signatures. Candidates (descriptions sharing at
+    least one band with the query) are ranked by the exact Jaccard of their
+    shingles, so the score does not carry MinHash's estimation error.
+    """
+
+    def __init__(self, max_entries=SIMILAR_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # id -> (shingles, band keys), oldest first
+        self.buckets = {}             # band key -> {id}
+
+    def add(self, entry_id, diagram_type, shingle_set, sig):
+        keys = _band_keys(diagram_type, sig)
+        for key in keys:
+            self.buckets.setdefault(key, set()).add(entry_id)
+        self.entries[entry_id] = (shingle_set, keys)
+        while len(self.entries) > self.max_entries:
+            old_id, (_, old_keys) = self.entries.popitem(last=False)
+            for key in old_keys:
+                bucket = self.buckets[key]
+                bucket.discard(old_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def query(self, diagram_type, shingle_set, sig, limit, min_score):
+        """[(score, id)] best first."""
+        candidates = set()
+        for key in _band_keys(diagram_type, sig):
+            candidates |= self.buckets.get(key, set())
+        scored = [(jaccard(shingle_set, self.entries[i][0]), i) for i in candidates]
+        return sorted((s for s in scored if s[0] >= min_score), reverse=True)[:limit]
+
+def _read(statement):
+    """
+    Rows of a SELECT on a short-lived connection of its own: never the request's
+    session, whose autoflush would take SQLite's write lock for its pending rows.
+    """
+    with db.engine.connect() as conn:
+        return conn.execute(statement).all()
+
+class _Shared:
+    """
+    The process-wide index, kept in step with description_examples. `lock`
+    guards the in-memory state only: no database I/O happens while it is held.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = Index()
+        self.last_id = 0
+        self.stats = {"lookups": 0, "reused": 0, "example_lookups": 0, "examples": 0, "recorded": 0}
+
+    def sync(self):
+        """Fold in rows written since the last call, by this process or any other."""
+        with self.lock:
+            last_id = self.last_id
+        columns = select(_table.c.id, _table.c.diagram_type, _table.c.description, _table.c.signature)
+        if last_id == 0:
+            # first use: the newest rows only, oldest first so eviction order is right
+            rows = _read(columns.order_by(_table.c.id.desc()).limit(self.index.max_entries))
+            rows.reverse()
+        else:
+            rows = _read(columns.where(_table.c.id > last_id).order_by(_table.c.id))
+        entries = []
+        for row in rows:
+            shingle_set = shingles(row.description)
+            sig = array("I")
+            sig.frombytes(row.signature)
+            if len(sig) != NUM_PERM:
+                sig = signature(shingle_set)
+            entries.append((row.id, row.diagram_type, shingle_set, sig))
+        with self.lock:
+            for entry_id, diagram_type, shingle_set, sig in entries:
+                if entry_id > self.last_id:  # another thread may have folded them in meanwhile
+                    self.index.add(entry_id, diagram_type, shingle_set, sig)
+                    self.last_id = entry_id
+
+_shared = _Shared()
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def find(text, diagram_type, limit=SIMILAR_EXAMPLES, min_score=SIMILAR_EXAMPLE_THRESHOLD):
+    """Stored descriptions of the same diagram type similar to `text`, as Matches, best first."""
+    if not SIMILAR_ENABLED:
+        return []
+    shingle_set = shingles(text)
+    if len(shingle_set) < MIN_SHINGLES:
+        return []
+    sig = signature(shingle_set)
+    _shared.sync()
+    with _shared.lock:
+        top = _shared.index.query(diagram_type, shingle_set, sig, limit, min_score)
+    if not top:
+        return []
+    rows = {row.id: row for row in _read(select(_table.c.id, _table.c.description, _table.c.model).where(
+        _table.c.id.in_([i for _, i in top])))}
+    return [
+        Match(round(score, 3), i, rows[i].description, json.loads(rows[i].model))
+        for score, i in top if i in rows
+    ]
+
+def reusable(text, diagram_type):
+    """The Match of a near-identical earlier description, whose model can be returned as is; else None."""
+    query = shingles(text)
+    match = next((m for m in find(text, diagram_type, limit=SIMILAR_EXAMPLES, min_score=SIMILAR_REUSE_THRESHOLD)
+                  if near_identical(query, shingles(m.description))), None)
+    with _shared.lock:
+        _shared.stats["lookups"] += 1
+        _shared.stats["reused"] += match is not None
+    return match
+
+def examples(text, diagram_type):
+    """Up to SIMILAR_EXAMPLES (description, compact model JSON) pairs for a few-shot prompt."""
+    shots = []
+    # near-duplicate descriptions often share one model: show it once
+    for match in find(text, diagram_type, limit=SIMILAR_EXAMPLES * 4):
+        compact = json.dumps(match.model, separators=(",", ":"))
+        if len(compact) <= SIMILAR_EXAMPLE_MAX_CHARS and all(compact != model for _, model in shots):
+            shots.append((match.description, compact))
+            if len(shots) == SIMILAR_EXAMPLES:
+                break
+    with _shared.lock:
+        _shared.stats["example_lookups"] += 1
+        _shared.stats["examples"] += len(shots)
+    return shots
+
+def record(text, diagram_type, model):
+    """
+    Add a (description, type, model) triple to the session; it is indexed on
+    the next lookup after the caller commits. Returns the row, or None when
+    there is nothing worth keeping or the same description is already stored.
+    """
+    if not SIMILAR_ENABLED or not model:
+        return None
+    text = normalize_text(text)
+    shingle_set = shingles(text)
+    if len(shingle_set) < MIN_SHINGLES:
+        return None
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    # no autoflush: a batch records as it goes and should not hold the write lock until it commits
+    if any(isinstance(row, DescriptionExample) and (row.diagram_type, row.text_hash) == (diagram_type, text_hash)
+           for row in db.session.new):
+        return None
+    if _read(select(_table.c.id).where(_table.c.diagram_type == diagram_type, _table.c.text_hash == text_hash).limit(1)):
+        return None
+    row = DescriptionExample(
+        diagram_type=diagram_type,
+        text_hash=text_hash,
+        description=text,
+        model=json.dumps(model, separators=(",", ":")),
+        signature=signature(shingle_set).tobytes()
+    )
+    db.session.add(row)
+    with _shared.lock:
+        _shared.stats["recorded"] += 1
+    return row
+
+def stats() -> dict:
+    with _shared.lock:
+        return {**_shared.stats, "indexed": len(_shared.index.entries), "buckets": len(_shared.index.buckets)}
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from flask import has_app_context
+from sqlalchemy import create_engine, select, insert, delete
+from sqlalchemy.exc import IntegrityError, OperationalError
+from db import db, is_sqlite, engine_options
+from models import InflightCall
+
+# ----------------------------
+# Config
+# ----------------------------
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "1") not in ("0", "false", "False")
+# Longest a follower waits for the leader (and how long a leader's claim is honoured)
+SINGLEFLIGHT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_TIMEOUT", "120"))
+# Grace period in which followers that were already waiting can still collect a
+# finished result; later callers never see it and run the call themselves
+SINGLEFLIGHT_RESULT_TTL = float(os.getenv("SINGLEFLIGHT_RESULT_TTL", "5"))
+SINGLEFLIGHT_POLL_SECONDS = float(os.getenv("SINGLEFLIGHT_POLL_SECONDS", "0.1"))
+# Lock-table statements give up quickly instead of queueing behind a SQLite writer
+SINGLEFLIGHT_DB_TIMEOUT_MS = int(os.getenv("SINGLEFLIGHT_DB_TIMEOUT_MS", "250"))
+
+_OWNER_PREFIX = f"{socket.gethostname()}:{os.getpid()}"
+_table = InflightCall.__table__
+
+def make_key(*parts) -> str:
+    return hashlib.sha256("\x1f".join(str(p or "") for p in parts).encode("utf-8")).hexdigest()
+
+# ----------------------------
+# In-process
+# ----------------------------
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_lock = threading.Lock()
+_flights = {}
+_stats = {"leaders": 0, "local_followers": 0, "remote_followers": 0, "lock_errors": 0}
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "in_flight": len(_flights)}
+
+# ----------------------------
+# Cross-process (lock table)
+# ----------------------------
+
+_engine = None
+_engine_url = None
+
+def _lock_engine():
+    """
+    Own engine for the lock table: its statements autocommit right away and
+    time out fast. None for in-memory SQLite, which no other process can see.
+    """
+    global _engine, _engine_url
+    url = db.engine.url.render_as_string(hide_password=False)
+    if is_sqlite(url) and not engine_options(url):
+        return None
+    if _engine is None or _engine_url != url:
+        if is_sqlite(url):
+            options = {"connect_args": {"timeout": SINGLEFLIGHT_DB_TIMEOUT_MS / 1000, "check_same_thread": False}}
+        else:
+            options = {k: v for k, v in engine_options(url).items() if k != "pool_size"}
+            options["pool_size"] = 2
+        _engine = create_engine(url, isolation_level="AUTOCOMMIT", **options)
+        _engine_url = url
+    return _engine
+
+def _result_key(key, owner):
+    """Row a leader publishes its result under; only followers that saw its claim know the owner."""
+    return make_key("result", key, owner)
+
+def _claim(key, owner):
+    """(True, owner) if this process now leads `key`, else (False, current leader); expired rows are taken over."""
+    now = datetime.utcnow()
+    with _lock_engine().connect() as conn:
+        # expired claims, and results whose grace period is over
+        conn.execute(delete(_table).where(_table.c.expires_at < now))
+        try:
+            conn.execute(insert(_table).values(
+                key=key, owner=owner, created_at=now,
+                expires_at=now + timedelta(seconds=SINGLEFLIGHT_TIMEOUT)
+            ))
+            return True, owner
+        except IntegrityError:
+            leader = conn.execute(select(_table.c.owner).where(_table.c.key == key)).scalar()
+            return False, leader
+
+def _finish(key, owner, result):
+    """Drop the claim, so the next identical call runs afresh; a result is kept briefly for the followers already waiting."""
+    with _lock_engine().connect() as conn:
+        if result is not None:
+            now = datetime.utcnow()
+            conn.execute(insert(_table).values(
+                key=_result_key(key, owner), owner=owner, result=json.dumps(result), created_at=now,
+                expires_at=now + timedelta(seconds=SINGLEFLIGHT_RESULT_TTL)
+            ))
+        # a failed call leaves no result: waiting processes run the call themselves
+        conn.execute(delete(_table).where(_table.c.key == key, _table.c.owner == owner))
+
+def _wait_remote(key, leader, deadline):
+    """Poll `leader`'s claim: (True, result) when it finished, (False, None) when it failed or expired."""
+    delay = SINGLEFLIGHT_POLL_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 1.5, 1.0)
+        with _lock_engine().connect() as conn:
+            row = conn.execute(select(_table.c.owner, _table.c.expires_at).where(_table.c.key == key)).first()
+            if row is not None and row.owner == leader and row.expires_at >= datetime.utcnow():
+                continue
+            # the result row is written before the claim is dropped
+            result = conn.execute(select(_table.c.result).where(_table.c.key == _result_key(key, leader))).scalar()
+        if result is not None:
+            return True, json.loads(result)
+        return False, None
+    return False, None
+
+def _run_shared(key, fn):
+    """Leader within this process: coordinate with other processes through the lock table."""
+    if not has_app_context() or _lock_engine() is None:
+        return fn()
+    owner = f"{_OWNER_PREFIX}:{uuid.uuid4().hex[:8]}"
+    deadline = time.monotonic() + SINGLEFLIGHT_TIMEOUT
+    while True:
+        try:
+            claimed, leader = _claim(key, owner)
+        except OperationalError as e:
+            # database busy: coalescing is an optimisation, never a reason to fail
+            _count("lock_errors")
+            print("⚠️ Single-flight lock unavailable, running uncoordinated:", e)
+            return fn()
+        if claimed:
+            break
+        if leader is None:
+            continue  # the claim was released in between: try again
+        finished, result = _wait_remote(key, leader, deadline)
+        if finished:
+            _count("remote_followers")
+            return result
+        if time.monotonic() >= deadline:
+            return fn()
+
+    result = None
+    try:
+        result = fn()
+        return result
+    finally:
+        try:
+            _finish(key, owner, result)
+        except OperationalError as e:
+            _count("lock_errors")
+            print("⚠️ Single-flight release failed (claim expires on its own):", e)
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def do(key, fn, cross_process=True):
+    """
+    Run fn() once for all concurrent callers with the same key and give each
+    the same result (or exception, within this process). With cross_process,
+    callers in other processes on the same database wait for it too; the
+    result must then be JSON-serializable.
+    """
+    if not SINGLEFLIGHT_ENABLED:
+        return fn()
+
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        _count("local_followers")
+        if not flight.done.wait(SINGLEFLIGHT_TIMEOUT):
+            return fn()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    _count("leaders")
+    try:
+        flight.result = _run_shared(key, fn) if cross_process else fn()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            _flights.pop(key, None)
+        flight.done.set()
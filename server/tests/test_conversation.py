@@ -0,0 +1,51 @@
+import threading
+import pytest
+from flask import Flask
+import db as db_module
+from db import db
+from models import ConversationSession
+
+
+@pytest.fixture
+def app(tmp_path):
+    url = f"sqlite:///{tmp_path}/t.db"
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {**db_module.engine_options(url), "connect_args": {"timeout": 5, "check_same_thread": False}}
+    db.init_app(app)
+    with app.app_context():
+        db_module.tune_engine(db.engine)
+        db.create_all()
+        db.session.add(ConversationSession(id="s1"))
+        db.session.commit()
+    return app
+
+
+def test_concurrent_turns_on_one_session_all_land(app):
+    threads, errors = 6, []
+    barrier = threading.Barrier(threads)
+
+    def turn(n):
+        with app.app_context():
+            try:
+                session = db.session.get(ConversationSession, "s1")
+                barrier.wait(5)
+                session.append_message("user", f"question {n}")
+                session.append_message("assistant", f"answer {n}")
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+                db.session.rollback()
+
+    workers = [threading.Thread(target=turn, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert errors == []
+    with app.app_context():
+        messages = db.session.get(ConversationSession, "s1").recent_messages()
+    assert len(messages) == 2 * threads
+    # each turn's question is directly followed by its answer
+    for question, answer in zip(messages[::2], messages[1::2]):
+        assert question["content"].replace("question", "answer") == answer["content"]
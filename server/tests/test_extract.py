@@ -0,0 +1,63 @@
+import json
+import time
+from utils.extract import StreamExtractor, extract_json_block, extract_plantuml_blocks, scan_reply
+
+UML = "@startuml\nclass User\n@enduml"
+
+
+def _stream(text, size):
+    extractor = StreamExtractor()
+    found = []
+    for i in range(0, len(text), size):
+        found += extractor.feed(text[i:i + size])
+    return found
+
+
+def test_unbalanced_brace_reply_is_linear():
+    # an unclosed "{" used to backtrack exponentially (31 chars: ~12 s)
+    for reply in ('{"op": add_class and a name' + " and more words" * 20,
+                  'Sure! {"ops": [{"op": "add_class", "name": "User"' + " x" * 5000):
+        scan_reply.cache_clear()
+        start = time.perf_counter()
+        assert extract_json_block(reply) is None
+        assert time.perf_counter() - start < 0.5
+        start = time.perf_counter()
+        assert [kind for kind, _ in _stream(reply, 3)] == []
+        assert time.perf_counter() - start < 0.5
+
+
+def test_many_unclosed_objects_are_rescanned_once():
+    reply = '{"a": x ' * 20000 + UML
+    scan_reply.cache_clear()
+    start = time.perf_counter()
+    assert extract_plantuml_blocks(reply) == UML
+    assert time.perf_counter() - start < 1
+
+
+def test_blocks_after_an_unclosed_object_are_found():
+    reply = '{"op": add_class and a name\n' + UML + '\nthen {"a": 1,}'
+    assert extract_plantuml_blocks(reply) == UML
+    assert json.loads(extract_json_block(reply)) == {"a": 1}
+
+
+def test_trailing_commas_repaired_and_json_fence_preferred():
+    reply = 'inline {"x": [1, 2,],} and\n```json\n{"classes": [{"name": "A",},],}\n```'
+    assert json.loads(extract_json_block(reply)) == {"classes": [{"name": "A"}]}
+
+
+def test_stream_matches_whole_reply_for_any_chunking():
+    reply = ("Here you go:\n```plantuml\n" + UML + "\n```\nand the model\n"
+             '```json\n{"classes": [{"name": "User", "attributes": ["id: int",],}], "note": "a } b"}\n```\nDone.')
+    expected = [("plantuml", extract_plantuml_blocks(reply)), ("json", extract_json_block(reply))]
+    for size in (1, 2, 3, 7, 64, len(reply)):
+        assert _stream(reply, size) == expected
+
+
+def test_stream_keeps_only_the_unscanned_tail():
+    extractor = StreamExtractor()
+    prose = "word " * 2000
+    for i in range(0, len(prose), 16):
+        extractor.feed(prose[i:i + 16])
+    assert len(extractor.buffer) < 32
+    extractor.feed('{"a": "' + "x" * 100)  # open object: its text is held, not rescanned
+    assert extractor.feed('"}') == [("json", '{"a": "' + "x" * 100 + '"}')]
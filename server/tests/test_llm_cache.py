@@ -0,0 +1,69 @@
+import time
+import pytest
+from flask import Flask
+import db as db_module
+from db import db
+from models import ConversationSession, LLMCacheEntry
+from services import llm_cache
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    llm_cache.clear_memory()
+    url = f"sqlite:///{tmp_path}/t.db"
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {**db_module.engine_options(url), "connect_args": {"timeout": 2, "check_same_thread": False}}
+    db.init_app(app)
+    with app.app_context():
+        db_module.tune_engine(db.engine)
+        db.create_all()
+        yield app
+    llm_cache.clear_memory()
+
+
+def stored(key):
+    with db.engine.connect() as conn:
+        return conn.execute(db.select(LLMCacheEntry.__table__).where(LLMCacheEntry.key == key)).first()
+
+
+def test_put_survives_the_request_rolling_back(app):
+    key = llm_cache.make_key("generate", "class", "A library has books")
+    db.session.add(ConversationSession(id="s1"))
+    db.session.flush()  # the request holds SQLite's write lock from here on
+    started = time.monotonic()
+    llm_cache.put(key, "reply", kind="generate", diagram_type="class")
+    assert time.monotonic() - started < 0.5
+    db.session.rollback()
+    assert llm_cache.flush(5)
+    assert stored(key).value == "reply"
+
+
+def test_hit_counts_are_written_outside_the_request(app):
+    key = llm_cache.make_key("generate", "class", "A shop sells products")
+    llm_cache.put(key, "reply", kind="generate", diagram_type="class")
+    assert llm_cache.flush(5)
+    llm_cache.clear_memory()  # database tier
+
+    db.session.add(ConversationSession(id="s2"))
+    db.session.flush()
+    for _ in range(3):
+        assert llm_cache.get(key) == "reply"
+        llm_cache.clear_memory()
+    db.session.rollback()
+    assert llm_cache.flush(5)
+    assert stored(key).hits == 3
+
+
+def test_cache_leaves_no_write_lock_with_the_request(app):
+    key = llm_cache.make_key("generate", "class", "A bank has accounts")
+    llm_cache.put(key, "reply")
+    llm_cache.flush(5)
+    llm_cache.clear_memory()
+    assert llm_cache.get(key) == "reply"
+    llm_cache.put(llm_cache.make_key("generate", "class", "A zoo has animals"), "other")
+    # another writer gets in at once, while this request's session is still open
+    with db.engine.begin() as conn:
+        conn.execute(db.insert(ConversationSession.__table__).values(id="other"))
+    assert llm_cache.flush(5)
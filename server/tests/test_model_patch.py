@@ -0,0 +1,33 @@
+import pytest
+from services.model_patch import apply_ops, PatchError
+
+USECASE = {
+    "actors": ["Customer", "Admin"],
+    "use_cases": ["Browse", "Checkout"],
+    "associations": [{"actor": "Customer", "use_case": "Browse"}, {"actor": "Admin", "use_case": "Checkout"}],
+    "includes": [{"from": "Checkout", "to": "Browse"}],
+    "extends": [],
+}
+SEQUENCE = {
+    "participants": ["User", "Server"],
+    "messages": [{"from": "User", "to": "Server", "message": "login", "type": "sync"}],
+    "activations": [],
+}
+
+
+@pytest.mark.parametrize("model, diagram_type, op", [
+    (USECASE, "usecase", {"op": "rename_actor", "name": "Customer", "new_name": "Admin"}),
+    (USECASE, "usecase", {"op": "rename_use_case", "name": "Browse", "new_name": "Checkout"}),
+    (SEQUENCE, "sequence", {"op": "rename_participant", "name": "User", "new_name": "Server"}),
+])
+def test_rename_onto_existing_name_is_rejected(model, diagram_type, op):
+    with pytest.raises(PatchError, match="already exists"):
+        apply_ops(model, [op], diagram_type)
+
+
+def test_rename_use_case_cascades():
+    result = apply_ops(USECASE, [{"op": "rename_use_case", "name": "Browse", "new_name": "Search"}], "usecase")
+    assert result["use_cases"] == ["Search", "Checkout"]
+    assert result["associations"][0] == {"actor": "Customer", "use_case": "Search"}
+    assert result["includes"] == [{"from": "Checkout", "to": "Search"}]
+    assert USECASE["use_cases"] == ["Browse", "Checkout"]
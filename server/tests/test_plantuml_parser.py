@@ -0,0 +1,255 @@
+import pytest
+from utils.plantuml import generate_plantuml
+from utils.plantuml_parser import parse_plantuml
+from utils.uml_model import from_dict
+
+# ----------------------------
+# Round trip: parse(generate(m)) == m for well-formed models
+# ----------------------------
+
+CLASS_MODELS = {
+    "empty": {"classes": [], "relationships": []},
+    "no members": {"classes": [{"name": "Book", "attributes": [], "methods": []}], "relationships": []},
+    "attributes only": {
+        "classes": [{"name": "Book", "attributes": ["title: string", "tags: List<String>", "isbn"], "methods": []}],
+        "relationships": [],
+    },
+    "methods only": {
+        "classes": [{"name": "Library", "attributes": [], "methods": ["open()", "find(isbn: string): Book", "count(): int"]}],
+        "relationships": [],
+    },
+    "attributes and methods": {
+        "classes": [{"name": "Account", "attributes": ["balance: float", "owner: Customer"],
+                     "methods": ["deposit(amount: float)", "withdraw(amount: float): bool"]}],
+        "relationships": [],
+    },
+    "every relationship type": {
+        "classes": [{"name": n, "attributes": [], "methods": []} for n in ("A", "B", "C", "D")],
+        "relationships": [
+            {"from": "B", "to": "A", "type": "inheritance", "label": ""},
+            {"from": "A", "to": "B", "type": "composition", "label": "owns"},
+            {"from": "A", "to": "C", "type": "composition", "label": ""},
+            {"from": "A", "to": "D", "type": "aggregation", "label": "holds"},
+            {"from": "B", "to": "C", "type": "aggregation", "label": ""},
+            {"from": "C", "to": "D", "type": "one-to-many", "label": "has"},
+            {"from": "D", "to": "C", "type": "many-to-one", "label": ""},
+            {"from": "A", "to": "C", "type": "many-to-many", "label": "links"},
+            {"from": "B", "to": "D", "type": "one-to-one", "label": "pairs"},
+            {"from": "C", "to": "A", "type": "association", "label": "uses"},
+            {"from": "D", "to": "A", "type": "association", "label": ""},
+        ],
+    },
+    "self and repeated relationships": {
+        "classes": [{"name": "Employee", "attributes": ["name: string"], "methods": []}],
+        "relationships": [
+            {"from": "Employee", "to": "Employee", "type": "association", "label": "manages"},
+            {"from": "Employee", "to": "Employee", "type": "association", "label": "manages"},
+        ],
+    },
+    "dotted names": {
+        "classes": [{"name": "shop.Order", "attributes": ["id: int"], "methods": []},
+                    {"name": "shop.Item", "attributes": [], "methods": ["total(): float"]}],
+        "relationships": [{"from": "shop.Order", "to": "shop.Item", "type": "composition", "label": "lines"}],
+    },
+}
+
+USECASE_MODELS = {
+    "empty": {"actors": [], "use_cases": [], "associations": [], "includes": [], "extends": []},
+    "actors only": {"actors": ["Customer", "Admin"], "use_cases": [], "associations": [], "includes": [], "extends": []},
+    "use cases only": {"actors": [], "use_cases": ["Browse catalog"], "associations": [], "includes": [], "extends": []},
+    "shop": {
+        "actors": ["Customer", "Admin", "PaymentGateway"],
+        "use_cases": ["Browse catalog", "Check out", "Pay", "Apply coupon", "Manage products", "Log in"],
+        "associations": [
+            {"actor": "Customer", "use_case": "Browse catalog"},
+            {"actor": "Customer", "use_case": "Check out"},
+            {"actor": "PaymentGateway", "use_case": "Pay"},
+            {"actor": "Admin", "use_case": "Manage products"},
+            {"actor": "Admin", "use_case": "Log in"},
+            {"actor": "Customer", "use_case": "Log in"},
+        ],
+        "includes": [{"from": "Check out", "to": "Pay"}, {"from": "Manage products", "to": "Log in"}],
+        "extends": [{"from": "Apply coupon", "to": "Check out"}],
+    },
+}
+
+SEQUENCE_MODELS = {
+    "empty": {"participants": [], "messages": [], "activations": []},
+    "participants only": {"participants": ["User", "Server", "Database"], "messages": [], "activations": []},
+    "every message type": {
+        "participants": ["User", "Frontend", "Api", "Session", "DB"],
+        "messages": [
+            {"from": "User", "to": "Frontend", "message": "open page", "type": "sync"},
+            {"from": "Frontend", "to": "Api", "message": "GET /orders", "type": "async"},
+            {"from": "Api", "to": "Session", "message": "new", "type": "create"},
+            {"from": "Api", "to": "DB", "message": "select orders", "type": "sync"},
+            {"from": "DB", "to": "Api", "message": "rows", "type": "return"},
+            {"from": "Api", "to": "Session", "message": "close", "type": "destroy"},
+            {"from": "Api", "to": "Frontend", "message": "200 OK: 3 orders", "type": "return"},
+        ],
+        "activations": [],
+    },
+    "self and empty messages": {
+        "participants": ["Server"],
+        "messages": [
+            {"from": "Server", "to": "Server", "message": "validate", "type": "sync"},
+            {"from": "Server", "to": "Server", "message": "", "type": "sync"},
+        ],
+        "activations": [],
+    },
+    "activations": {
+        "participants": ["Client", "Server"],
+        "messages": [{"from": "Client", "to": "Server", "message": "ping", "type": "sync"}],
+        "activations": [
+            {"participant": "Server"},
+            {"participant": "Client", "deactivate": True},
+            {"participant": "Server", "deactivate": True},
+        ],
+    },
+}
+
+CORPUS = [
+    *(pytest.param("class", m, id=f"class: {name}") for name, m in CLASS_MODELS.items()),
+    *(pytest.param("usecase", m, id=f"usecase: {name}") for name, m in USECASE_MODELS.items()),
+    *(pytest.param("sequence", m, id=f"sequence: {name}") for name, m in SEQUENCE_MODELS.items()),
+]
+
+
+@pytest.mark.parametrize("diagram_type, model", CORPUS)
+def test_round_trip(diagram_type, model):
+    assert parse_plantuml(generate_plantuml(model, diagram_type), diagram_type) == model
+
+
+@pytest.mark.parametrize("diagram_type, model", CORPUS)
+def test_round_trip_from_typed_model(diagram_type, model):
+    code = generate_plantuml(from_dict(model, diagram_type), diagram_type)
+    assert code == generate_plantuml(model, diagram_type)
+    assert parse_plantuml(code, diagram_type) == model
+
+
+def test_methods_gain_parentheses_once():
+    model = {"classes": [{"name": "Cart", "attributes": [], "methods": ["clear"]}], "relationships": []}
+    parsed = parse_plantuml(generate_plantuml(model, "class"), "class")
+    assert parsed["classes"][0]["methods"] == ["clear()"]
+    assert parse_plantuml(generate_plantuml(parsed, "class"), "class") == parsed
+
+# ----------------------------
+# PlantUML as GPT writes it
+# ----------------------------
+
+def test_class_variations():
+    code = """
+    @startuml
+    ' a comment
+    skinparam class {
+      BackgroundColor White
+    }
+    abstract class "Base Entity" as Base <<Entity>> {
+      -id: int
+      ..
+      #save(): void
+    }
+    interface Payable
+    class Order {
+      +total: float
+      +pay()
+    }
+    Base <|-- Order
+    Order ..|> Payable
+    Order "1" -- "0..*" LineItem : contains >
+    Customer "many" <-- "1" Order : placed by
+    LineItem --* Order
+    Shelf --o Library
+    @enduml
+    """
+    assert parse_plantuml(code, "class") == {
+        "classes": [
+            {"name": "Base", "attributes": ["id: int"], "methods": ["save(): void"]},
+            {"name": "Payable", "attributes": [], "methods": []},
+            {"name": "Order", "attributes": ["total: float"], "methods": ["pay()"]},
+            {"name": "LineItem", "attributes": [], "methods": []},
+            {"name": "Customer", "attributes": [], "methods": []},
+            {"name": "Library", "attributes": [], "methods": []},
+            {"name": "Shelf", "attributes": [], "methods": []},
+        ],
+        "relationships": [
+            {"from": "Order", "to": "Base", "type": "inheritance", "label": ""},
+            {"from": "Order", "to": "Payable", "type": "inheritance", "label": ""},
+            {"from": "Order", "to": "LineItem", "type": "one-to-many", "label": "contains >"},
+            {"from": "Order", "to": "Customer", "type": "one-to-many", "label": "placed by"},
+            {"from": "Order", "to": "LineItem", "type": "composition", "label": ""},
+            {"from": "Library", "to": "Shelf", "type": "aggregation", "label": ""},
+        ],
+    }
+
+
+def test_usecase_variations():
+    code = """
+    @startuml
+    left to right direction
+    actor :Online Customer: as Customer
+    actor Admin
+    package Shop {
+      (Browse catalog)
+      usecase "Check out" as CO
+      usecase Pay
+    }
+    Customer -- (Browse catalog)
+    Customer --> CO
+    CO .> Pay : <<include>>
+    (Apply coupon) <.. CO : <<extend>>
+    Pay <-- Admin
+    @enduml
+    """
+    assert parse_plantuml(code, "usecase") == {
+        "actors": ["Customer", "Admin"],
+        "use_cases": ["Browse catalog", "Check out", "Pay", "Apply coupon"],
+        "associations": [
+            {"actor": "Customer", "use_case": "Browse catalog"},
+            {"actor": "Customer", "use_case": "Check out"},
+            {"actor": "Admin", "use_case": "Pay"},
+        ],
+        "includes": [{"from": "Check out", "to": "Pay"}],
+        "extends": [{"from": "Check out", "to": "Apply coupon"}],  # arrows point from CO
+    }
+
+
+def test_sequence_variations():
+    code = """
+    @startuml
+    autonumber
+    actor "Web User" as User
+    participant Api
+    database DB
+    User -> Api: login
+    activate Api
+    Api -> DB : find user
+    DB --> Api
+    Api ->> Queue : audit
+    deactivate Api
+    User -> Api
+    @enduml
+    """
+    assert parse_plantuml(code, "sequence") == {
+        "participants": ["User", "Api", "DB"],
+        "messages": [
+            {"from": "User", "to": "Api", "message": "login", "type": "sync"},
+            {"from": "Api", "to": "DB", "message": "find user", "type": "sync"},
+            {"from": "DB", "to": "Api", "message": "", "type": "return"},
+            {"from": "Api", "to": "Queue", "message": "audit", "type": "async"},
+            {"from": "User", "to": "Api", "message": "", "type": "sync"},
+        ],
+        "activations": [{"participant": "Api"}],
+    }
+
+
+def test_undeclared_participants_are_collected():
+    code = "@startuml\nAlice -> Bob : hi\nBob --> Alice : hello\nBob -> Carol\n@enduml"
+    assert parse_plantuml(code, "sequence")["participants"] == ["Alice", "Bob", "Carol"]
+
+
+@pytest.mark.parametrize("diagram_type", ["class", "usecase", "sequence"])
+@pytest.mark.parametrize("code", ["", None, "not plantuml at all", "@startuml\n@enduml"])
+def test_empty_or_foreign_input(diagram_type, code):
+    model = parse_plantuml(code, diagram_type)
+    assert all(value == [] for value in model.values())
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+import pytest
+from flask import Flask
+import db as db_module
+from db import db
+from models import Diagram
+from services import search
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(search, "_fts_ready", False)  # ensure_index() sets it for this app only
+    url = f"sqlite:///{tmp_path}/t.db"
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = db_module.engine_options(url)
+    db.init_app(app)
+    with app.app_context():
+        db_module.tune_engine(db.engine)
+        db.create_all()
+        if not search.ensure_index(db.engine):
+            pytest.skip("SQLite built without FTS5")
+        yield app
+
+
+def add(name, classes, age_days):
+    """Diagrams are added oldest first, so rowid order is age order."""
+    body = "\n".join(f"class {c}" for c in classes)
+    created = datetime(2026, 1, 1) - timedelta(days=age_days)
+    db.session.add(Diagram(id=name, name=name, diagram_type="class", created_at=created,
+                           plantuml_code=f"@startuml\n{body}\n@enduml"))
+    db.session.commit()
+
+
+def test_best_match_first_within_each_tier(app):
+    add("Book", [], 4)
+    add("Book catalog of the city library branch", [], 3)
+    add("Shelf", ["Book", "BookCopy", "BookLoan"], 2)
+    add("Shop", ["Book", "Customer", "Order", "Invoice", "Payment", "Shipment", "Warehouse"], 1)
+    hits = search.search("book", 10)
+    assert [(h.id, h.tier) for h in hits] == [
+        ("Book", 0), ("Book catalog of the city library branch", 0),  # older, but better matches
+        ("Shelf", 1), ("Shop", 1),
+    ]
+    assert [h.id for h in search.search("book", 2, offset=2)] == ["Shelf", "Shop"]
+
+
+def test_without_fts_names_are_matched_as_names(app, monkeypatch):
+    add("Book", [], 2)
+    add("Shop", ["Book"], 1)
+    monkeypatch.setattr(search, "_fts_ready", False)
+    assert [(h.id, h.tier) for h in search.search("book", 10)] == [("Book", 0)]
@@ -0,0 +1,85 @@
+import threading
+import time
+import pytest
+from flask import Flask
+import db as db_module
+from db import db
+from models import ConversationSession
+from services import similar
+from services.similar import shingles, jaccard, near_identical, SIMILAR_EXAMPLE_THRESHOLD
+
+BASE = ("An online shop has customers. Customers place orders. Each order contains products and a delivery "
+        "address. Products have a name, a price and a category. A customer has an email address and a password.")
+
+
+@pytest.mark.parametrize("query", [
+    BASE,
+    BASE.replace("has customers", "has many customers").replace("Each order", "Every order"),
+    BASE.upper(),
+])
+def test_rewording_is_reusable(query):
+    assert near_identical(shingles(query), shingles(BASE))
+
+
+@pytest.mark.parametrize("query", [
+    BASE + " Add a Supplier class.",
+    BASE + " Customers can write reviews.",
+    BASE.replace("Customers place orders", "Customers cannot place orders"),
+    BASE.replace(" A customer has an email address and a password.", ""),
+])
+def test_changed_description_is_not_reusable(query):
+    assert not near_identical(shingles(query), shingles(BASE))
+
+
+def test_changed_description_is_still_an_example():
+    query = shingles(BASE + " Add a Supplier class.")
+    assert jaccard(query, shingles(BASE)) >= SIMILAR_EXAMPLE_THRESHOLD
+
+# ----------------------------
+# Concurrent requests
+# ----------------------------
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, "SQLITE_BUSY_TIMEOUT_MS", 2000)
+    monkeypatch.setattr(similar, "_shared", similar._Shared())
+    url = f"sqlite:///{tmp_path}/t.db"
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {**db_module.engine_options(url), "connect_args": {"timeout": 2, "check_same_thread": False}}
+    db.init_app(app)
+    with app.app_context():
+        db_module.tune_engine(db.engine)
+        db.create_all()
+    return app
+
+
+def test_requests_with_pending_writes_do_not_block_each_other(app):
+    """Each thread holds uncommitted rows (as a request does) while it looks up and records descriptions."""
+    threads, errors = 8, []
+    barrier = threading.Barrier(threads)
+
+    def request(n):
+        with app.app_context():
+            try:
+                db.session.add(ConversationSession(id=f"s{n}"))
+                barrier.wait(5)
+                similar.reusable(f"{BASE} Request {n}.", "class")
+                similar.examples(f"{BASE} Request {n}.", "class")
+                similar.record(f"{BASE} Request {n}.", "class", {"classes": [], "relationships": []})
+                similar.stats()
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+                db.session.rollback()
+
+    started = time.monotonic()
+    workers = [threading.Thread(target=request, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert errors == []
+    assert time.monotonic() - started < 5
+    with app.app_context():
+        assert len(similar.find(BASE, "class", limit=threads)) == threads
@@ -0,0 +1,72 @@
+import threading
+import pytest
+from flask import Flask
+from db import db
+from services import singleflight
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/t.db"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def counting(result):
+    calls = []
+    def fn():
+        calls.append(1)
+        return result
+    return fn, calls
+
+
+def test_sequential_calls_each_run(app):
+    fn, calls = counting({"n": 1})
+    key = singleflight.make_key("test", "sequential")
+    assert singleflight.do(key, fn) == {"n": 1}
+    assert singleflight.do(key, fn) == {"n": 1}
+    assert len(calls) == 2
+    assert db.session.query(singleflight.InflightCall).filter_by(key=key).count() == 0
+
+
+def test_waiting_follower_gets_result_new_arrival_does_not(app, monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT_POLL_SECONDS", 0.01)
+    key = singleflight.make_key("test", "follower")
+    started, release, waiting = threading.Event(), threading.Event(), threading.Event()
+    calls = []
+    wait_remote = singleflight._wait_remote
+
+    def follow(*args):
+        waiting.set()
+        return wait_remote(*args)
+    monkeypatch.setattr(singleflight, "_wait_remote", follow)
+
+    def leader_fn():
+        calls.append("leader")
+        started.set()
+        release.wait(5)
+        return {"from": "leader"}
+
+    def run(fn, out):
+        with app.app_context():
+            out.append(singleflight._run_shared(key, fn))  # as if in another process
+
+    leader_out, follower_out = [], []
+    leader = threading.Thread(target=run, args=(leader_fn, leader_out))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=run, args=(lambda: calls.append("follower") or {"from": "follower"}, follower_out))
+    follower.start()
+    assert waiting.wait(5)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert leader_out == follower_out == [{"from": "leader"}]
+    assert calls == ["leader"]
+
+    late, late_calls = counting({"from": "late"})
+    assert singleflight._run_shared(key, late) == {"from": "late"}
+    assert len(late_calls) == 1
@@ -0,0 +1,243 @@
+import json
+import re
+from functools import lru_cache
+
+# A single left-to-right pass over a GPT reply. Each mode has its own step regex
+# that skips inert text at C speed and stops only at structural tokens, so the
+# Python loop runs once per brace / marker rather than once per character.
+# The inert run is matched atomically: an unclosed "{" must not make the engine
+# retry every way of splitting the text before it (exponential backtracking).
+# A lookahead is never re-entered once it has matched, so (?=(X))\1 is X as an
+# atomic group (possessive quantifiers would need Python 3.11).
+_TEXT_STEP = re.compile(r'```(\w*)|@startuml|\{(?=\s*["}])')   # JSON objects open with {" or {}
+_JSON_STEP = re.compile(
+    r'(?=((?:[^"{},`]+|"(?:[^"\\\n]|\\.)*"|,(?!\s*[\]}])|`(?!``))*))\1'   # inert: text, strings, ordinary commas
+    r'(?:(?P<open>\{)|(?P<close>\})|(?P<comma>,)(?=\s*[\]}])|(?P<quote>")|```)'  # {, }, trailing comma, lone quote, fence
+)
+
+_MARKER_TAIL = 9  # len("@startuml"); a marker may straddle a stream chunk boundary
+
+
+class _Scanner:
+    """
+    Incremental scanner state. Finds fenced blocks, @startuml...@enduml blocks and
+    balanced top-level JSON objects, repairing trailing commas while it goes.
+    """
+
+    def __init__(self):
+        self.pos = 0
+        self.mode = "text"          # text | plantuml | json
+        self.fence = None           # (lang, content_start) while inside ``` ... ```
+        self.uml_start = 0
+        self.obj_start = 0
+        self.obj_fence = None       # fence lang the current object started in
+        self.braces = []            # positions of the current object's open "{"s (its depth)
+        self.unclosed = set()       # "{" positions known never to close (final scans)
+        self.drop_commas = []       # trailing commas to remove from the current object
+        self.plantuml = []          # completed @startuml blocks
+        self.objects = []           # (json_text, fence_lang or None), valid JSON only
+        self.held = []              # the open block's text that rebase() cut off
+
+    def rebase(self, text, cut):
+        """
+        Forget text[:cut] (already scanned; cut <= self.pos): positions shift
+        down by cut, and an open block keeps its part in self.held, trailing
+        commas already removed. Streaming then only ever rescans new text.
+        """
+        if self.mode == "json":
+            cursor = self.obj_start
+            for comma in self.drop_commas:
+                if comma >= cut:
+                    break
+                self.held.append(text[cursor:comma])
+                cursor = comma + 1
+            self.held.append(text[cursor:cut])
+            self.drop_commas = [comma - cut for comma in self.drop_commas if comma >= cut]
+            self.braces = [brace - cut for brace in self.braces]
+            self.obj_start = 0
+        elif self.mode == "plantuml":
+            self.held.append(text[self.uml_start:cut])
+            self.uml_start = 0
+        if self.fence is not None:
+            self.fence = (self.fence[0], max(0, self.fence[1] - cut))
+        self.pos -= cut
+
+    def _abandon_object(self):
+        """
+        The open object never closes: give it up and keep looking right after
+        its "{". The "{"s still open are skipped from now on, so unbalanced
+        text is rescanned once, not once per brace.
+        """
+        self.unclosed.update(self.braces)
+        self.mode = "text"
+        self.held = []
+        return self.obj_start + 1
+
+    def _close_object(self, text, end):
+        pieces = self.held
+        self.held = []
+        cursor = self.obj_start
+        for comma in self.drop_commas:
+            pieces.append(text[cursor:comma])
+            cursor = comma + 1
+        pieces.append(text[cursor:end])
+        candidate = "".join(pieces)
+        self.mode = "text"
+        try:
+            json.loads(candidate)
+        except ValueError:
+            return None
+        found = (candidate, self.obj_fence)
+        self.objects.append(found)
+        return found
+
+    def scan(self, text, final=True):
+        """Consume text[self.pos:]; returns the blocks completed during this call."""
+        found = []
+        pos = self.pos
+        resume = None
+        size = len(text)
+
+        while True:
+            if pos >= size:
+                if final and self.mode == "json":
+                    pos = self._abandon_object()
+                    continue
+                break
+
+            if self.mode == "plantuml":
+                end = text.find("@enduml", pos)
+                if end < 0:
+                    break
+                end += len("@enduml")
+                block = "".join(self.held) + text[self.uml_start:end]
+                self.held = []
+                self.plantuml.append(block)
+                found.append(("plantuml", block))
+                self.mode = "text"
+                pos = end
+                continue
+
+            if self.mode == "json":
+                match = _JSON_STEP.match(text, pos)
+                if match is None:
+                    if not final:
+                        break  # the object may still close in a later chunk
+                    pos = self._abandon_object()
+                    continue
+                pos = match.end()
+                kind = match.lastgroup  # which structural token ended the step
+                if kind == "open":
+                    self.braces.append(match.start(kind))
+                elif kind == "close":
+                    self.braces.pop()
+                    if not self.braces:
+                        obj = self._close_object(text, pos)
+                        if obj:
+                            found.append(("json", obj[0]))
+                elif kind == "comma":
+                    # comma followed only by whitespace and a closer: drop it
+                    self.drop_commas.append(match.start(kind))
+                elif kind == "quote":
+                    # unterminated string inside an object
+                    if not final and "\n" not in text[match.start(kind):]:
+                        resume = match.start(kind)
+                        break
+                    self.mode = "text"
+                    self.held = []
+                else:
+                    # a fence closes (or opens) while the object is still open
+                    if self.fence is not None and self.obj_fence is not None:
+                        self.mode = "text"
+                        self.held = []
+                    self.fence = None if self.fence is not None else ("", pos)
+                continue
+
+            # text mode
+            match = _TEXT_STEP.search(text, pos)
+            if match is None:
+                break
+            token = match.group(0)
+            if token.startswith("```"):
+                if not final and match.end() == size:
+                    resume = match.start()  # the fence language may continue in the next chunk
+                    break
+                if self.fence is None:
+                    self.fence = (match.group(1).lower(), match.end())
+                else:
+                    self.fence = None
+            elif token == "@startuml":
+                self.mode = "plantuml"
+                self.uml_start = match.start()
+            elif match.start() not in self.unclosed:
+                self.mode = "json"
+                self.obj_start = match.start()
+                self.obj_fence = self.fence[0] if self.fence else None
+                self.braces = [match.start()]
+                self.drop_commas = []
+            pos = match.end()
+
+        if resume is not None:
+            self.pos = resume
+        elif final:
+            self.pos = size
+        elif self.mode == "text":
+            self.pos = max(pos, size - _MARKER_TAIL)
+        elif self.mode == "plantuml":
+            self.pos = max(pos, size - len("@enduml") + 1)
+        else:
+            self.pos = pos
+        return found
+
+
+@lru_cache(maxsize=8)
+def scan_reply(text: str) -> _Scanner:
+    """Run one pass over a complete reply (memoized: callers extract both block kinds)."""
+    scanner = _Scanner()
+    scanner.scan(text or "", final=True)
+    return scanner
+
+
+def extract_plantuml_blocks(text: str) -> str:
+    """Extract valid PlantUML (@startuml ... @enduml)."""
+    return "\n".join(scan_reply(text).plantuml)
+
+
+def extract_json_block(text: str):
+    """
+    Extract the JSON object from GPT output (fenced, inline, etc.), trailing commas repaired.
+    Preference: ```json fences, then any fence, then bare objects; largest first.
+    """
+    objects = scan_reply(text).objects
+    if not objects:
+        return None
+
+    def rank(obj):
+        candidate, lang = obj
+        return (lang == "json", lang is not None, len(candidate))
+
+    return max(objects, key=rank)[0]
+
+
+class StreamExtractor:
+    """
+    Incrementally scan a streamed GPT reply and report blocks as soon as they close:
+    ("plantuml", "@startuml ... @enduml") or ("json", "{...}").
+    Uses the same single-pass scanner as extract_json_block/extract_plantuml_blocks.
+    Only the not yet scanned tail is kept between chunks, so a reply costs
+    time linear in its length however finely it is chunked.
+    """
+
+    def __init__(self):
+        self._scanner = _Scanner()
+        self.buffer = ""
+
+    def feed(self, chunk: str):
+        """Append a chunk; return the list of blocks completed by it."""
+        self.buffer += chunk
+        found = self._scanner.scan(self.buffer, final=False)
+        cut = self._scanner.pos
+        if cut:
+            self._scanner.rebase(self.buffer, cut)
+            self.buffer = self.buffer[cut:]
+        return found
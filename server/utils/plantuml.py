@@ -1,178 +1,364 @@
+import os
+import difflib
+from functools import lru_cache
+from utils.uml_model import is_typed
+
+# Rendered fragments per element kind, keyed by the element's content
+FRAGMENT_CACHE_SIZE = int(os.getenv("PLANTUML_FRAGMENT_CACHE_SIZE", "65536"))
+
+def _fragment(render, *key):
+    """
+    One element's PlantUML lines (joined with "\\n"), cached by its content:
+    an element that did not change since any earlier render is not re-rendered.
+    Elements with unhashable content (malformed LLM output) render uncached.
+    """
+    try:
+        return render(*key)
+    except TypeError:
+        return render.__wrapped__(*key)
+
+# ----------------------------
+# CLASS DIAGRAM fragments
+# ----------------------------
+
+_CLASS_HEADER = "\n".join([
+    "skinparam classAttributeIconSize 0",
+    "skinparam class {",
+    "  BackgroundColor LightBlue",
+    "  BorderColor DarkBlue",
+    "  ArrowColor DarkBlue",
+    "}",
+    ""
+])
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _class(class_name, attributes, methods):
+    lines = [f"class {class_name} {{"]
+    for attr in attributes:
+        lines.append(f"  +{attr}")
+    if attributes and methods:
+        lines.append("  --")
+    for method in methods:
+        if "(" not in method:
+            method += "()"
+        lines.append(f"  +{method}")
+    lines.append("}")
+    lines.append("")
+    return "\n".join(lines)
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _relationship(from_class, to_class, rel_type, label):
+    if rel_type == "inheritance":
+        return f"{from_class} --|> {to_class}"
+    elif rel_type == "composition":
+        return f"{from_class} *-- {to_class} : {label}".strip()
+    elif rel_type == "aggregation":
+        return f"{from_class} o-- {to_class} : {label}".strip()
+    elif rel_type == "one-to-many":
+        return f'{from_class} "1" --> "*" {to_class} : {label}'.strip()
+    elif rel_type == "many-to-one":
+        return f'{from_class} "*" --> "1" {to_class} : {label}'.strip()
+    elif rel_type == "many-to-many":
+        return f'{from_class} "*" --> "*" {to_class} : {label}'.strip()
+    elif rel_type == "one-to-one":
+        return f'{from_class} "1" --> "1" {to_class} : {label}'.strip()
+    else:
+        if label:
+            return f"{from_class} --> {to_class} : {label}"
+        else:
+            return f"{from_class} --> {to_class}"
+
+def _class_fragments(model):
+    fragments = [_CLASS_HEADER]
+
+    # Classes
+    for cls in model.get("classes", []):
+        fragments.append(_fragment(
+            _class, cls["name"], tuple(cls.get("attributes", [])), tuple(cls.get("methods", []))
+        ))
+
+    # Relationships
+    for rel in model.get("relationships", []):
+        fragments.append(_fragment(
+            _relationship, rel["from"], rel["to"], rel.get("type", "association"), rel.get("label", "")
+        ))
+    return fragments
+
+def _typed_class_fragments(model):
+    # typed elements hold hashable, already normalized values: no .get() or _fragment() guard
+    fragments = [_CLASS_HEADER]
+    fragments.extend(_class(c.name, tuple(c.attributes), tuple(c.methods)) for c in model.classes)
+    fragments.extend(_relationship(r.source, r.target, r.type, r.label) for r in model.relationships)
+    return fragments
+
+# ----------------------------
+# USE CASE DIAGRAM fragments
+# ----------------------------
+
+_USECASE_HEADER = "\n".join([
+    "left to right direction",
+    "skinparam packageStyle rectangle",
+    "skinparam usecase {",
+    "  BackgroundColor LightYellow",
+    "  BorderColor DarkGoldenRod",
+    "}",
+    ""
+])
+
+def _uc_id(use_case):
+    return f"UC_{use_case.replace(' ', '_')}"
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _actor(actor):
+    return f"actor {actor}"
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _use_case(uc):
+    return f'  usecase "{uc}" as {_uc_id(uc)}'
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _association(actor, use_case):
+    return f"{actor} --> {_uc_id(use_case)}"
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _uc_link(from_uc, to_uc, stereotype):
+    return f"{_uc_id(from_uc)} ..> {_uc_id(to_uc)} : <<{stereotype}>>"
+
+def _usecase_fragments(model):
+    fragments = [_USECASE_HEADER]
+
+    actors = model.get("actors", [])
+    use_cases = model.get("use_cases", [])
+
+    # Actors
+    fragments.extend(_fragment(_actor, actor) for actor in actors)
+    if actors:
+        fragments.append("")
+
+    # Use Cases
+    if use_cases:
+        fragments.append("rectangle System {")
+        fragments.extend(_fragment(_use_case, uc) for uc in use_cases)
+        fragments.append("}")
+        fragments.append("")
+
+    # Associations
+    for assoc in model.get("associations", []):
+        actor = assoc.get("actor")
+        use_case = assoc.get("use_case")
+        if actor and use_case:
+            fragments.append(_fragment(_association, actor, use_case))
+
+    # Include/Extend
+    fragments.extend(_fragment(_uc_link, inc["from"], inc["to"], "include") for inc in model.get("includes", []))
+    fragments.extend(_fragment(_uc_link, ext["from"], ext["to"], "extend") for ext in model.get("extends", []))
+    return fragments
+
+def _typed_usecase_fragments(model):
+    fragments = [_USECASE_HEADER]
+    fragments.extend(_actor(actor) for actor in model.actors)
+    if model.actors:
+        fragments.append("")
+    if model.use_cases:
+        fragments.append("rectangle System {")
+        fragments.extend(_use_case(uc.name) for uc in model.use_cases)
+        fragments.append("}")
+        fragments.append("")
+    fragments.extend(_association(a.actor, a.use_case) for a in model.associations)
+    fragments.extend(_uc_link(link.source, link.target, "include") for link in model.includes)
+    fragments.extend(_uc_link(link.source, link.target, "extend") for link in model.extends)
+    return fragments
+
+# ----------------------------
+# SEQUENCE DIAGRAM fragments
+# ----------------------------
+
+_SEQUENCE_HEADER = "\n".join([
+    "skinparam sequence {",
+    "  ArrowColor DarkBlue",
+    "  ActorBorderColor DarkBlue",
+    "  LifeLineBorderColor DarkBlue",
+    "  ParticipantBorderColor DarkBlue",
+    "}",
+    ""
+])
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _participant(p):
+    if p.lower() in ["user", "admin", "customer", "client"]:
+        return f"actor {p}"
+    elif p.lower() in ["database", "db"]:
+        return f"database {p}"
+    else:
+        return f"participant {p}"
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _message(from_p, to_p, message, msg_type):
+    if msg_type == "async":
+        return f"{from_p} ->> {to_p} : {message}"
+    elif msg_type == "return":
+        return f"{from_p} -->> {to_p} : {message}"
+    elif msg_type == "create":
+        return f"{from_p} -> ** {to_p} : {message}"
+    elif msg_type == "destroy":
+        return f"{from_p} -> !! {to_p} : {message}"
+    else:
+        return f"{from_p} -> {to_p} : {message}"
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _activation(participant, deactivate):
+    if deactivate:
+        return f"activate {participant}\ndeactivate {participant}"
+    return f"activate {participant}"
+
+def _sequence_fragments(model):
+    fragments = [_SEQUENCE_HEADER]
+
+    participants = model.get("participants", [])
+
+    # Participants
+    fragments.extend(_fragment(_participant, p) for p in participants)
+    if participants:
+        fragments.append("")
+
+    # Messages
+    for msg in model.get("messages", []):
+        fragments.append(_fragment(
+            _message, msg.get("from", ""), msg.get("to", ""), msg.get("message", ""), msg.get("type", "sync")
+        ))
+
+    # Activations
+    for act in model.get("activations", []):
+        fragments.append(_fragment(_activation, act["participant"], bool(act.get("deactivate"))))
+    return fragments
+
+def _typed_sequence_fragments(model):
+    fragments = [_SEQUENCE_HEADER]
+    fragments.extend(f"{p.kind} {p.name}" for p in model.participants)
+    if model.participants:
+        fragments.append("")
+    fragments.extend(_message(m.source, m.target, m.text, m.type) for m in model.messages)
+    fragments.extend(_activation(a.participant, a.deactivate) for a in model.activations)
+    return fragments
+
+# ----------------------------
+# Generation
+# ----------------------------
+
+_FRAGMENTS = {
+    "class": _class_fragments,
+    "usecase": _usecase_fragments,
+    "sequence": _sequence_fragments,
+}
+
+# utils.uml_model models
+_TYPED_FRAGMENTS = {
+    "class": _typed_class_fragments,
+    "usecase": _typed_usecase_fragments,
+    "sequence": _typed_sequence_fragments,
+}
+
+_CACHED = (_class, _relationship, _actor, _use_case, _association, _uc_link, _participant, _message, _activation)
+
+def clear_fragment_cache():
+    for render in _CACHED:
+        render.cache_clear()
+
+def plantuml_fragments(model, diagram_type="class"):
+    """
+    The diagram as a list of fragments (one per element, plus fixed sections)
+    that join with "\\n". `model` is the JSON dict shape or a utils.uml_model model.
+    """
+    if is_typed(model):
+        if model.diagram_type == diagram_type:
+            return ["@startuml", *_TYPED_FRAGMENTS[diagram_type](model), "@enduml"]
+        model = model.to_dict()  # rendered as another type: same leniency as for dicts
+    build = _FRAGMENTS.get(diagram_type)
+    if build is None:
+        body = [f"note: Unsupported diagram type '{diagram_type}'"]
+    else:
+        body = build(model)
+    return ["@startuml", *body, "@enduml"]
+
 def generate_plantuml(model, diagram_type="class"):
     """
     Enhanced PlantUML generator for Class, Use Case, and Sequence diagrams.
     Handles attributes, methods, relationships, actors, use cases, associations, participants, and messages.
+    Each element's fragment is cached by content, so regenerating a large model
+    after a small edit only renders the elements that changed.
     """
-    lines = ["@startuml"]
-
-    # ----------------------------
-    # CLASS DIAGRAM
-    # ----------------------------
-    if diagram_type == "class":
-        lines.extend([
-            "skinparam classAttributeIconSize 0",
-            "skinparam class {",
-            "  BackgroundColor LightBlue",
-            "  BorderColor DarkBlue",
-            "  ArrowColor DarkBlue",
-            "}",
-            ""
-        ])
-
-        # Classes
-        for cls in model.get("classes", []):
-            class_name = cls["name"]
-            attributes = cls.get("attributes", [])
-            methods = cls.get("methods", [])
-
-            lines.append(f"class {class_name} {{")
-            for attr in attributes:
-                lines.append(f"  +{attr}")
-            if attributes and methods:
-                lines.append("  --")
-            for method in methods:
-                if "(" not in method:
-                    method += "()"
-                lines.append(f"  +{method}")
-            lines.append("}")
-            lines.append("")
-
-        # Relationships
-        for rel in model.get("relationships", []):
-            from_class = rel["from"]
-            to_class = rel["to"]
-            rel_type = rel.get("type", "association")
-            label = rel.get("label", "")
-
-            if rel_type == "inheritance":
-                lines.append(f"{from_class} --|> {to_class}")
-            elif rel_type == "composition":
-                lines.append(f"{from_class} *-- {to_class} : {label}".strip())
-            elif rel_type == "aggregation":
-                lines.append(f"{from_class} o-- {to_class} : {label}".strip())
-            elif rel_type == "one-to-many":
-                lines.append(f'{from_class} "1" --> "*" {to_class} : {label}'.strip())
-            elif rel_type == "many-to-one":
-                lines.append(f'{from_class} "*" --> "1" {to_class} : {label}'.strip())
-            elif rel_type == "many-to-many":
-                lines.append(f'{from_class} "*" --> "*" {to_class} : {label}'.strip())
-            elif rel_type == "one-to-one":
-                lines.append(f'{from_class} "1" --> "1" {to_class} : {label}'.strip())
-            else:
-                if label:
-                    lines.append(f"{from_class} --> {to_class} : {label}")
-                else:
-                    lines.append(f"{from_class} --> {to_class}")
-
-    # ----------------------------
-    # USE CASE DIAGRAM
-    # ----------------------------
-    elif diagram_type == "usecase":
-        lines.extend([
-            "left to right direction",
-            "skinparam packageStyle rectangle",
-            "skinparam usecase {",
-            "  BackgroundColor LightYellow",
-            "  BorderColor DarkGoldenRod",
-            "}",
-            ""
-        ])
-
-        actors = model.get("actors", [])
-        use_cases = model.get("use_cases", [])
-        associations = model.get("associations", [])
-        includes = model.get("includes", [])
-        extends = model.get("extends", [])
-
-        # Actors
-        for actor in actors:
-            lines.append(f"actor {actor}")
-        if actors:
-            lines.append("")
-
-        # Use Cases
-        if use_cases:
-            lines.append("rectangle System {")
-            for uc in use_cases:
-                uc_id = f"UC_{uc.replace(' ', '_')}"
-                lines.append(f'  usecase "{uc}" as {uc_id}')
-            lines.append("}")
-            lines.append("")
-
-        # Associations
-        for assoc in associations:
-            actor = assoc.get("actor")
-            use_case = assoc.get("use_case")
-            if actor and use_case:
-                uc_id = f"UC_{use_case.replace(' ', '_')}"
-                lines.append(f"{actor} --> {uc_id}")
-
-        # Include/Extend
-        for inc in includes:
-            from_uc = f"UC_{inc['from'].replace(' ', '_')}"
-            to_uc = f"UC_{inc['to'].replace(' ', '_')}"
-            lines.append(f"{from_uc} ..> {to_uc} : <<include>>")
-
-        for ext in extends:
-            from_uc = f"UC_{ext['from'].replace(' ', '_')}"
-            to_uc = f"UC_{ext['to'].replace(' ', '_')}"
-            lines.append(f"{from_uc} ..> {to_uc} : <<extend>>")
-
-    # ----------------------------
-    # SEQUENCE DIAGRAM
-    # ----------------------------
-    elif diagram_type == "sequence":
-        lines.extend([
-            "skinparam sequence {",
-            "  ArrowColor DarkBlue",
-            "  ActorBorderColor DarkBlue",
-            "  LifeLineBorderColor DarkBlue",
-            "  ParticipantBorderColor DarkBlue",
-            "}",
-            ""
-        ])
-
-        participants = model.get("participants", [])
-        messages = model.get("messages", [])
-        activations = model.get("activations", [])
-
-        # Participants
-        for p in participants:
-            if p.lower() in ["user", "admin", "customer", "client"]:
-                lines.append(f"actor {p}")
-            elif p.lower() in ["database", "db"]:
-                lines.append(f"database {p}")
-            else:
-                lines.append(f"participant {p}")
-        if participants:
-            lines.append("")
-
-        # Messages
-        for msg in messages:
-            from_p = msg.get("from", "")
-            to_p = msg.get("to", "")
-            message = msg.get("message", "")
-            msg_type = msg.get("type", "sync")
-
-            if msg_type == "async":
-                lines.append(f"{from_p} ->> {to_p} : {message}")
-            elif msg_type == "return":
-                lines.append(f"{from_p} -->> {to_p} : {message}")
-            elif msg_type == "create":
-                lines.append(f"{from_p} -> ** {to_p} : {message}")
-            elif msg_type == "destroy":
-                lines.append(f"{from_p} -> !! {to_p} : {message}")
-            else:
-                lines.append(f"{from_p} -> {to_p} : {message}")
-
-        # Activations
-        for act in activations:
-            lines.append(f"activate {act['participant']}")
-            if act.get("deactivate"):
-                lines.append(f"deactivate {act['participant']}")
+    return "\n".join(plantuml_fragments(model, diagram_type))
 
-    else:
-        lines.append(f"note: Unsupported diagram type '{diagram_type}'")
+# ----------------------------
+# Line diff
+# ----------------------------
 
-    lines.append("@enduml")
-    return "\n".join(lines)
+_BLOCK = 4096
+
+def _common_prefix(a, b, limit):
+    """Length of the common prefix of a and b (at most limit): 4 KB block compares, then a binary search."""
+    start = 0
+    while start + _BLOCK <= limit and a[start:start + _BLOCK] == b[start:start + _BLOCK]:
+        start += _BLOCK
+    lo, hi = start, min(start + _BLOCK, limit)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[start:mid] == b[start:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix(a, b, limit):
+    # the prefix of the reversed strings, without reversing them
+    start = 0
+    while start + _BLOCK <= limit and a[len(a) - start - _BLOCK:len(a) - start] == b[len(b) - start - _BLOCK:len(b) - start]:
+        start += _BLOCK
+    lo, hi = start, min(start + _BLOCK, limit)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - start] == b[len(b) - mid:len(b) - start]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def plantuml_line_diff(old_text, new_text):
+    """
+    Hunks turning old_text into new_text line by line, for clients that hold
+    the previous text: [[start, delete, [lines to insert]], ...], with `start`
+    a 0-based line index into old_text, ascending. Empty when unchanged.
+    """
+    if old_text == new_text:
+        return []
+    # Common head/tail first, on the raw strings: an edit to one element
+    # leaves only the lines around it to split and compare.
+    limit = min(len(old_text), len(new_text))
+    head = _common_prefix(old_text, new_text, limit)
+    tail = _common_suffix(old_text, new_text, limit - head)
+
+    cut = old_text.rfind("\n", 0, head) + 1           # lines before `cut` are equal
+    end = old_text.find("\n", len(old_text) - tail)  # lines after `end` are equal
+    if end == -1:
+        end = len(old_text)
+    shift = len(new_text) - len(old_text)
+    old_mid = old_text[cut:end].split("\n")
+    new_mid = new_text[cut:end + shift].split("\n")
+    prefix = old_text.count("\n", 0, cut)
+
+    matcher = difflib.SequenceMatcher(None, old_mid, new_mid, autojunk=False)
+    return [
+        [prefix + i1, i2 - i1, new_mid[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"
+    ]
+
+def apply_line_diff(old_text, hunks):
+    """Inverse of plantuml_line_diff: old_text plus its hunks gives the new text."""
+    lines = old_text.split("\n")
+    out, pos = [], 0
+    for start, delete, insert in hunks:
+        out.extend(lines[pos:start])
+        out.extend(insert)
+        pos = start + delete
+    out.extend(lines[pos:])
+    return "\n".join(out)
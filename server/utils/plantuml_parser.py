@@ -0,0 +1,328 @@
+import re
+
+# ----------------------------
+# Shared helpers
+# ----------------------------
+
+_SKIP_PREFIXES = (
+    "@startuml", "@enduml", "'", "left to right direction", "top to bottom direction",
+    "hide ", "show ", "title ", "note ", "end note", "autonumber", "header ", "footer ",
+)
+
+_NAME = r'"[^"]+"|[\w.]+'
+
+def _unquote(name: str) -> str:
+    name = name.strip()
+    if len(name) >= 2 and name[0] == name[-1] == '"':
+        return name[1:-1]
+    return name
+
+def _content_lines(code: str):
+    """Yield meaningful lines, skipping skinparam blocks, comments and directives."""
+    skin_depth = 0
+    for raw in (code or "").splitlines():
+        line = raw.strip()
+        if skin_depth:
+            skin_depth += line.count("{") - line.count("}")
+            continue
+        if not line or line.startswith(_SKIP_PREFIXES):
+            continue
+        if line.startswith("skinparam"):
+            skin_depth = max(line.count("{") - line.count("}"), 0)
+            continue
+        yield line
+
+def _split_label(rest: str) -> str:
+    """Return the label after ':' (generator emits 'A *-- B :' for empty labels)."""
+    rest = rest.strip()
+    if rest.startswith(":"):
+        return rest[1:].strip()
+    return ""
+
+# ----------------------------
+# CLASS DIAGRAM
+# ----------------------------
+
+_CLASS_DECL = re.compile(
+    r'^(?:abstract\s+class|abstract|class|interface|enum|entity)\s+(' + _NAME + r')'
+    r'(?:\s+as\s+([\w.]+))?(?:\s*<<[^>]*>>)?\s*(\{)?\s*(\})?\s*$'
+)
+
+_CLASS_REL = re.compile(
+    r'^(' + _NAME + r')\s*(?:"([^"]*)"\s*)?'
+    r'(<\|--|--\|>|<\|\.\.|\.\.\|>|\*--|--\*|o--|--o|-->|<--|\.\.>|<\.\.|--|\.\.)'
+    r'\s*(?:"([^"]*)"\s*)?(' + _NAME + r')\s*(.*)$'
+)
+
+_MANY = {"*", "0..*", "1..*", "many", "n"}
+
+def _multiplicity_type(left: str, right: str) -> str:
+    if left is None or right is None:
+        return "association"
+    l = "*" if left.strip() in _MANY else left.strip()
+    r = "*" if right.strip() in _MANY else right.strip()
+    return {
+        ("1", "*"): "one-to-many",
+        ("*", "1"): "many-to-one",
+        ("*", "*"): "many-to-many",
+        ("1", "1"): "one-to-one",
+    }.get((l, r), "association")
+
+_METHOD_SHAPE = re.compile(r'^(?:\{\w+\}\s*)?[\w<>\[\]]+\s*\(.*\)')
+
+def _strip_visibility(member: str) -> str:
+    if member[:1] in "+-#~":
+        return member[1:].strip()
+    return member
+
+def _parse_class(code: str) -> dict:
+    classes = []
+    by_name = {}
+    relationships = []
+    current = None
+    seen_separator = False
+    members = []
+
+    def close_block():
+        if current is None:
+            return
+        if seen_separator:
+            return
+        # No separator: classify by shape (methods always carry parentheses)
+        for member in members:
+            if _METHOD_SHAPE.match(member):
+                current["methods"].append(member)
+            else:
+                current["attributes"].append(member)
+
+    def ensure_class(name):
+        if name not in by_name:
+            cls = {"name": name, "attributes": [], "methods": []}
+            by_name[name] = cls
+            classes.append(cls)
+        return by_name[name]
+
+    for line in _content_lines(code):
+        if current is not None:
+            if line == "}":
+                close_block()
+                current = None
+                continue
+            if line in ("--", "..", "==", "__"):
+                if not seen_separator:
+                    current["attributes"].extend(members)
+                    members = []
+                    seen_separator = True
+                continue
+            member = _strip_visibility(line)
+            if seen_separator:
+                current["methods"].append(member)
+            else:
+                members.append(member)
+            continue
+
+        decl = _CLASS_DECL.match(line)
+        if decl:
+            # an alias is what relationships refer to (and a name generate_plantuml can write back)
+            cls = ensure_class(decl.group(2) or _unquote(decl.group(1)))
+            if decl.group(3) and not decl.group(4):
+                current = cls
+                seen_separator = False
+                members = []
+            continue
+
+        rel = _CLASS_REL.match(line)
+        if rel:
+            left, left_mult, arrow, right_mult, right, rest = rel.groups()
+            left, right = _unquote(left), _unquote(right)
+            label = _split_label(rest)
+
+            if arrow in ("--|>", "..|>"):
+                rel_type, src, dst = "inheritance", left, right
+            elif arrow in ("<|--", "<|.."):
+                rel_type, src, dst = "inheritance", right, left
+            elif arrow == "*--":
+                rel_type, src, dst = "composition", left, right
+            elif arrow == "--*":
+                rel_type, src, dst = "composition", right, left
+            elif arrow == "o--":
+                rel_type, src, dst = "aggregation", left, right
+            elif arrow == "--o":
+                rel_type, src, dst = "aggregation", right, left
+            elif arrow in ("<--", "<.."):
+                rel_type, src, dst = _multiplicity_type(right_mult, left_mult), right, left
+            else:
+                rel_type, src, dst = _multiplicity_type(left_mult, right_mult), left, right
+
+            ensure_class(src)
+            ensure_class(dst)
+            relationships.append({"from": src, "to": dst, "type": rel_type, "label": label})
+
+    close_block()
+    return {"classes": classes, "relationships": relationships}
+
+# ----------------------------
+# USE CASE DIAGRAM
+# ----------------------------
+
+_ACTOR_DECL = re.compile(r'^actor\s+(?::([^:]+):|("[^"]+"|[\w.]+))(?:\s+as\s+([\w.]+))?')
+_USECASE_DECL = re.compile(
+    r'^(?:usecase\s+)?(?:"([^"]+)"|\(([^)]+)\)|([\w.]+))(?:\s+as\s+([\w.]+))?\s*$'
+)
+_UC_ARROW = re.compile(
+    r'^(\([^)]+\)|' + _NAME + r')\s*(-+>|<-+|-+|\.+>|<\.+)\s*(\([^)]+\)|' + _NAME + r')\s*(.*)$'
+)
+
+def _parse_usecase(code: str) -> dict:
+    actors = []
+    actor_ids = {}
+    use_cases = []
+    uc_ids = {}
+    associations = []
+    includes = []
+    extends = []
+
+    def add_use_case(label, alias=None):
+        if label not in use_cases:
+            use_cases.append(label)
+        uc_ids[alias or label] = label
+        uc_ids[f"UC_{label.replace(' ', '_')}"] = label
+        return label
+
+    def resolve_uc(token):
+        if token.startswith("(") and token.endswith(")"):
+            return add_use_case(token[1:-1].strip())
+        return uc_ids.get(_unquote(token))
+
+    for line in _content_lines(code):
+        if line.startswith(("rectangle", "package", "frame")) or line in ("{", "}"):
+            continue
+
+        actor = _ACTOR_DECL.match(line)
+        if actor:
+            display = (actor.group(1) or _unquote(actor.group(2) or "")).strip()
+            alias = actor.group(3) or display
+            if alias not in actors:
+                actors.append(alias)
+            actor_ids[alias] = alias
+            actor_ids[display] = alias
+            continue
+
+        arrow = _UC_ARROW.match(line)
+        if arrow:
+            left, op, right, rest = arrow.groups()
+            label = _split_label(rest).lower()
+            if "include" in label or "extend" in label:
+                src, dst = resolve_uc(left), resolve_uc(right)
+                if op.startswith("<"):
+                    src, dst = dst, src
+                if src and dst:
+                    (includes if "include" in label else extends).append({"from": src, "to": dst})
+                continue
+
+            left_actor = actor_ids.get(_unquote(left))
+            right_actor = actor_ids.get(_unquote(right))
+            if left_actor and not right_actor:
+                uc = resolve_uc(right)
+                if uc:
+                    associations.append({"actor": left_actor, "use_case": uc})
+            elif right_actor and not left_actor:
+                uc = resolve_uc(left)
+                if uc:
+                    associations.append({"actor": right_actor, "use_case": uc})
+            continue
+
+        decl = _USECASE_DECL.match(line)
+        if decl and (line.startswith(("usecase", "(", '"'))):
+            label = (decl.group(1) or decl.group(2) or decl.group(3)).strip()
+            add_use_case(label, decl.group(4))
+
+    return {
+        "actors": actors,
+        "use_cases": use_cases,
+        "associations": associations,
+        "includes": includes,
+        "extends": extends,
+    }
+
+# ----------------------------
+# SEQUENCE DIAGRAM
+# ----------------------------
+
+_PARTICIPANT_DECL = re.compile(
+    r'^(?:participant|actor|database|boundary|control|entity|collections|queue)\s+'
+    r'("[^"]+"|[\w.]+)(?:\s+as\s+([\w.]+))?'
+)
+_MESSAGE = re.compile(
+    r'^(' + _NAME + r')\s*(-->>|->>|-->|->)\s*(\*\*|!!)?\s*(' + _NAME + r')\s*(?::\s?(.*))?$'
+)
+
+def _parse_sequence(code: str) -> dict:
+    participants = []
+    declared = False
+    messages = []
+    activations = []
+    last_activate = None
+
+    for line in _content_lines(code):
+        decl = _PARTICIPANT_DECL.match(line)
+        if decl:
+            name = decl.group(2) or _unquote(decl.group(1))
+            if name not in participants:
+                participants.append(name)
+            declared = True
+            last_activate = None
+            continue
+
+        if line.startswith("activate "):
+            last_activate = {"participant": line.split(None, 1)[1].strip()}
+            activations.append(last_activate)
+            continue
+        if line.startswith("deactivate "):
+            name = line.split(None, 1)[1].strip()
+            if last_activate and last_activate["participant"] == name and "deactivate" not in last_activate:
+                last_activate["deactivate"] = True
+            last_activate = None
+            continue
+
+        msg = _MESSAGE.match(line)
+        if msg:
+            src, arrow, marker, dst, text = msg.groups()
+            src, dst = _unquote(src), _unquote(dst)
+            if marker == "**":
+                msg_type = "create"
+            elif marker == "!!":
+                msg_type = "destroy"
+            elif arrow == "->>":
+                msg_type = "async"
+            elif arrow in ("-->>", "-->"):
+                msg_type = "return"
+            else:
+                msg_type = "sync"
+            messages.append({"from": src, "to": dst, "message": (text or "").strip(), "type": msg_type})
+            last_activate = None
+
+    # Undeclared participants only matter when the source declares none at all
+    if not declared:
+        for msg in messages:
+            for name in (msg["from"], msg["to"]):
+                if name not in participants:
+                    participants.append(name)
+
+    return {"participants": participants, "messages": messages, "activations": activations}
+
+# ----------------------------
+# Entry point
+# ----------------------------
+
+def parse_plantuml(code, diagram_type="class"):
+    """
+    Parse PlantUML back into the JSON model shape consumed by generate_plantuml.
+    Round-trips losslessly with generate_plantuml for well-formed models and
+    tolerates the common variations GPT produces.
+    """
+    if diagram_type == "usecase":
+        return _parse_usecase(code)
+    if diagram_type == "sequence":
+        return _parse_sequence(code)
+    return _parse_class(code)
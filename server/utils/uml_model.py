@@ -0,0 +1,318 @@
+import sys
+
+# Compact, indexed models for the three diagram types. The JSON dict shape
+# (see services.parser) stays the wire and storage format: from_dict() and
+# Model.to_dict() convert at the edges. Names are interned, so the many
+# references to one class/actor/participant share a single string, and the
+# per-model indexes answer name and adjacency lookups without scanning.
+
+def _str(value):
+    """Interned str for a name or member; '' when missing."""
+    if value is None:
+        return ""
+    return sys.intern(value if isinstance(value, str) else str(value))
+
+def _items(model, key):
+    values = model.get(key) if isinstance(model, dict) else None
+    return values if isinstance(values, list) else []
+
+# ----------------------------
+# CLASS DIAGRAM
+# ----------------------------
+
+class UMLClass:
+    __slots__ = ("name", "attributes", "methods")
+
+    def __init__(self, name, attributes=(), methods=()):
+        self.name = _str(name)
+        self.attributes = [_str(a) for a in attributes]
+        self.methods = [_str(m) for m in methods]
+
+    def to_dict(self):
+        return {"name": self.name, "attributes": list(self.attributes), "methods": list(self.methods)}
+
+
+class Relationship:
+    __slots__ = ("source", "target", "type", "label")
+
+    def __init__(self, source, target, type="association", label=""):
+        self.source = _str(source)
+        self.target = _str(target)
+        self.type = _str(type or "association")
+        self.label = _str(label)
+
+    def to_dict(self):
+        return {"from": self.source, "to": self.target, "type": self.type, "label": self.label}
+
+
+class ClassModel:
+    """Classes by name; relationships by source and by target class."""
+    __slots__ = ("classes", "relationships", "_by_name", "_outgoing", "_incoming")
+    diagram_type = "class"
+
+    def __init__(self, classes=(), relationships=()):
+        self.classes, self.relationships = [], []
+        self._by_name, self._outgoing, self._incoming = {}, {}, {}
+        for cls in classes:
+            self.add_class(cls)
+        for rel in relationships:
+            self.add_relationship(rel)
+
+    def add_class(self, cls):
+        self.classes.append(cls)
+        self._by_name.setdefault(cls.name, cls)  # duplicates: the first one wins, as in a scan
+        return cls
+
+    def add_relationship(self, rel):
+        self.relationships.append(rel)
+        self._outgoing.setdefault(rel.source, []).append(rel)
+        self._incoming.setdefault(rel.target, []).append(rel)
+        return rel
+
+    def get(self, name):
+        return self._by_name.get(name)
+
+    def outgoing(self, name):
+        return self._outgoing.get(name, ())
+
+    def incoming(self, name):
+        return self._incoming.get(name, ())
+
+    @classmethod
+    def from_dict(cls, model):
+        return cls(
+            (UMLClass(c["name"], c.get("attributes") or (), c.get("methods") or ())
+             for c in _items(model, "classes") if isinstance(c, dict) and c.get("name")),
+            (Relationship(r["from"], r["to"], r.get("type"), r.get("label"))
+             for r in _items(model, "relationships") if isinstance(r, dict) and r.get("from") and r.get("to"))
+        )
+
+    def to_dict(self):
+        return {
+            "classes": [c.to_dict() for c in self.classes],
+            "relationships": [r.to_dict() for r in self.relationships],
+        }
+
+# ----------------------------
+# USE CASE DIAGRAM
+# ----------------------------
+
+def use_case_id(name):
+    """PlantUML alias of a use case: "Borrow book" -> UC_Borrow_book."""
+    return sys.intern(f"UC_{name.replace(' ', '_')}")
+
+
+class UseCase:
+    __slots__ = ("name", "id")
+
+    def __init__(self, name):
+        self.name = _str(name)
+        self.id = use_case_id(self.name)  # computed once, not per render or lookup
+
+
+class Association:
+    __slots__ = ("actor", "use_case")
+
+    def __init__(self, actor, use_case):
+        self.actor = _str(actor)
+        self.use_case = _str(use_case)
+
+    def to_dict(self):
+        return {"actor": self.actor, "use_case": self.use_case}
+
+
+class UseCaseLink:
+    """An include or extend, from one use case to another."""
+    __slots__ = ("source", "target")
+
+    def __init__(self, source, target):
+        self.source = _str(source)
+        self.target = _str(target)
+
+    def to_dict(self):
+        return {"from": self.source, "to": self.target}
+
+
+class UseCaseModel:
+    """Actors and use cases by name, use cases by PlantUML id, associations by actor and by use case."""
+    __slots__ = ("actors", "use_cases", "associations", "includes", "extends",
+                 "_actors", "_use_cases", "_by_id", "_by_actor", "_by_use_case")
+    diagram_type = "usecase"
+
+    def __init__(self, actors=(), use_cases=(), associations=(), includes=(), extends=()):
+        self.actors, self.use_cases, self.associations = [], [], []
+        self._actors, self._use_cases, self._by_id, self._by_actor, self._by_use_case = {}, {}, {}, {}, {}
+        for actor in actors:
+            self.add_actor(actor)
+        for use_case in use_cases:
+            self.add_use_case(use_case)
+        for association in associations:
+            self.add_association(association)
+        self.includes = list(includes)
+        self.extends = list(extends)
+
+    def add_actor(self, name):
+        name = _str(name)
+        self.actors.append(name)
+        self._actors.setdefault(name, name)
+        return name
+
+    def add_use_case(self, use_case):
+        self.use_cases.append(use_case)
+        self._use_cases.setdefault(use_case.name, use_case)
+        self._by_id.setdefault(use_case.id, use_case)
+        return use_case
+
+    def add_association(self, association):
+        self.associations.append(association)
+        self._by_actor.setdefault(association.actor, []).append(association)
+        self._by_use_case.setdefault(association.use_case, []).append(association)
+        return association
+
+    def has_actor(self, name):
+        return name in self._actors
+
+    def use_case(self, name):
+        return self._use_cases.get(name)
+
+    def by_id(self, uc_id):
+        return self._by_id.get(uc_id)
+
+    def id_of(self, name):
+        """Alias of a use case, also for names only referenced by links (LLM output is not always consistent)."""
+        use_case = self._use_cases.get(name)
+        return use_case.id if use_case is not None else use_case_id(name)
+
+    def associations_of(self, actor):
+        return self._by_actor.get(actor, ())
+
+    def actors_of(self, use_case):
+        return [a.actor for a in self._by_use_case.get(use_case, ())]
+
+    @classmethod
+    def from_dict(cls, model):
+        def links(key):
+            return (UseCaseLink(l["from"], l["to"]) for l in _items(model, key)
+                    if isinstance(l, dict) and l.get("from") and l.get("to"))
+        return cls(
+            (a for a in _items(model, "actors") if a),
+            (UseCase(uc) for uc in _items(model, "use_cases") if uc),
+            (Association(a["actor"], a["use_case"]) for a in _items(model, "associations")
+             if isinstance(a, dict) and a.get("actor") and a.get("use_case")),
+            links("includes"),
+            links("extends")
+        )
+
+    def to_dict(self):
+        return {
+            "actors": list(self.actors),
+            "use_cases": [uc.name for uc in self.use_cases],
+            "associations": [a.to_dict() for a in self.associations],
+            "includes": [l.to_dict() for l in self.includes],
+            "extends": [l.to_dict() for l in self.extends],
+        }
+
+# ----------------------------
+# SEQUENCE DIAGRAM
+# ----------------------------
+
+_PARTICIPANT_KINDS = {"user": "actor", "admin": "actor", "customer": "actor", "client": "actor",
+                      "database": "database", "db": "database"}
+
+
+class Participant:
+    __slots__ = ("name", "kind")
+
+    def __init__(self, name):
+        self.name = _str(name)
+        self.kind = _PARTICIPANT_KINDS.get(self.name.lower(), "participant")  # PlantUML keyword
+
+
+class Message:
+    __slots__ = ("source", "target", "text", "type")
+
+    def __init__(self, source, target, text="", type="sync"):
+        self.source = _str(source)
+        self.target = _str(target)
+        self.text = _str(text)
+        self.type = _str(type or "sync")
+
+    def to_dict(self):
+        return {"from": self.source, "to": self.target, "message": self.text, "type": self.type}
+
+
+class Activation:
+    __slots__ = ("participant", "deactivate")
+
+    def __init__(self, participant, deactivate=False):
+        self.participant = _str(participant)
+        self.deactivate = bool(deactivate)
+
+    def to_dict(self):
+        return {"participant": self.participant, "deactivate": self.deactivate}
+
+
+class SequenceModel:
+    """Participants by name; the messages each participant sends or receives, in order."""
+    __slots__ = ("participants", "messages", "activations", "_participants", "_by_participant")
+    diagram_type = "sequence"
+
+    def __init__(self, participants=(), messages=(), activations=()):
+        self.participants, self.messages = [], []
+        self._participants, self._by_participant = {}, {}
+        for participant in participants:
+            self.add_participant(participant)
+        for message in messages:
+            self.add_message(message)
+        self.activations = list(activations)
+
+    def add_participant(self, participant):
+        self.participants.append(participant)
+        self._participants.setdefault(participant.name, participant)
+        return participant
+
+    def add_message(self, message):
+        self.messages.append(message)
+        self._by_participant.setdefault(message.source, []).append(message)
+        if message.target != message.source:
+            self._by_participant.setdefault(message.target, []).append(message)
+        return message
+
+    def participant(self, name):
+        return self._participants.get(name)
+
+    def messages_of(self, name):
+        return self._by_participant.get(name, ())
+
+    @classmethod
+    def from_dict(cls, model):
+        return cls(
+            (Participant(p) for p in _items(model, "participants") if p),
+            (Message(m.get("from"), m.get("to"), m.get("message"), m.get("type"))
+             for m in _items(model, "messages") if isinstance(m, dict)),
+            (Activation(a["participant"], a.get("deactivate")) for a in _items(model, "activations")
+             if isinstance(a, dict) and a.get("participant"))
+        )
+
+    def to_dict(self):
+        return {
+            "participants": [p.name for p in self.participants],
+            "messages": [m.to_dict() for m in self.messages],
+            "activations": [a.to_dict() for a in self.activations],
+        }
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+MODELS = {"class": ClassModel, "usecase": UseCaseModel, "sequence": SequenceModel}
+
+def from_dict(model, diagram_type="class"):
+    """Typed model from the JSON dict shape; malformed elements are skipped."""
+    build = MODELS.get(diagram_type)
+    if build is None:
+        raise ValueError(f"Unsupported diagram type '{diagram_type}'")
+    return build.from_dict(model or {})
+
+def is_typed(model):
+    return isinstance(model, (ClassModel, UseCaseModel, SequenceModel))